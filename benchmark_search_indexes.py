@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Search Index Benchmark Script
+Before/after EXPLAIN ANALYZE for trigram GIN indexes (migration 005)
+on a large synthetic products_semantic catalog
+"""
+
+import os
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Load environment variables
+load_dotenv()
+
+BENCH_SCHEMA = "bench_search_indexes"
+
+# Sentetik katalog - gerçek ürün adlarına benzer kombinasyonlar
+SYNTHETIC_CATALOG_SQL = """
+CREATE TABLE products_semantic (
+    id SERIAL PRIMARY KEY,
+    product_code TEXT NOT NULL,
+    product_name TEXT NOT NULL,
+    price NUMERIC(10,2),
+    stock_quantity INTEGER DEFAULT 0,
+    description TEXT,
+    specifications TEXT,
+    category TEXT,
+    brand TEXT
+);
+
+INSERT INTO products_semantic
+    (product_code, product_name, price, stock_quantity, description, specifications, category, brand)
+SELECT
+    lpad((g % 99)::text, 2, '0') || chr(65 + (g % 26)) || lpad(g::text, 6, '0'),
+    (ARRAY['PNÖMATİK SİLİNDİR', 'HİDROLİK SİLİNDİR', 'SELENOİD VALF', 'KÜRESEL VANA',
+           'MFRY ŞARTLANDIRICI', 'MR REGÜLATÖR', 'Y YAĞLAYICI', 'RAKOR', 'HORTUM'])[1 + g % 9]
+        || ' ' || (ARRAY[32, 40, 50, 63, 80, 100, 125])[1 + g % 7]
+        || 'X' || (ARRAY[50, 100, 160, 200, 250, 300])[1 + (g / 7) % 6]
+        || ' ' || (ARRAY['5/2', '3/2', '1/4', '1/8', '1/2', '3/8'])[1 + (g / 11) % 6]
+        || ' ' || (ARRAY['MANYETİK', 'YASTIKLI', 'SENSÖRLÜ', 'PASLANMAZ', 'NAMUR', 'STANDART'])[1 + (g / 13) % 6],
+    round((random() * 5000)::numeric, 2),
+    (random() * 100)::int,
+    (ARRAY['Çift etkili', 'Tek etkili', 'Pilot kontrollü', 'Manuel', 'Otomatik'])[1 + g % 5]
+        || ' model ' || g,
+    'Basınç: ' || (g % 16) || ' bar; Malzeme: ' || (ARRAY['ALÜMİNYUM', 'PİRİNÇ', 'PASLANMAZ'])[1 + g % 3],
+    (ARRAY['Silindir', 'Valf', 'Şartlandırıcı', 'Bağlantı'])[1 + g % 4],
+    (ARRAY['FESTO', 'SMC', 'CAMOZZI', 'JANATICS'])[1 + g % 4]
+FROM generate_series(1, {rows}) AS g;
+"""
+
+INDEX_SQL = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX idx_products_code_trgm ON products_semantic USING GIN (product_code gin_trgm_ops);
+CREATE INDEX idx_products_name_trgm ON products_semantic USING GIN (product_name gin_trgm_ops);
+CREATE INDEX idx_products_description_trgm ON products_semantic USING GIN (description gin_trgm_ops);
+CREATE INDEX idx_products_specifications_trgm ON products_semantic USING GIN (specifications gin_trgm_ops);
+CREATE INDEX idx_products_category_trgm ON products_semantic USING GIN (category gin_trgm_ops);
+ANALYZE products_semantic;
+"""
+
+# search_products_smart_direct / valve_bul / find_air_preparation_units sorgu şekilleri
+BENCH_QUERIES = {
+    "smart_search": (
+        """
+        SELECT id, product_code, product_name, price, stock_quantity
+        FROM products_semantic
+        WHERE product_code ILIKE %(p)s OR product_name ILIKE %(p)s
+           OR description ILIKE %(p)s OR specifications ILIKE %(p)s
+        ORDER BY CASE WHEN product_code ILIKE %(exact)s THEN 1 ELSE 2 END, stock_quantity DESC
+        LIMIT 50
+        """,
+        {"p": "%KÜRESEL VANA%", "exact": "KÜRESEL VANA"}
+    ),
+    "valve_extras": (
+        """
+        SELECT id, product_code, product_name
+        FROM products_semantic p
+        WHERE (p.category ILIKE '%%valf%%' OR p.product_name ILIKE '%%valf%%')
+          AND p.stock_quantity > 0
+          AND p.product_name ~ %(tip)s
+          AND (p.product_name ILIKE %(e1)s OR p.description ILIKE %(e1)s OR p.specifications ILIKE %(e1)s)
+        """,
+        {"tip": "5/2", "e1": "%NAMUR%"}
+    ),
+    "air_preparation": (
+        """
+        SELECT id, product_code, product_name
+        FROM products_semantic p
+        WHERE p.product_name ~ %(size)s
+          AND p.product_name ~ %(type)s
+        ORDER BY p.stock_quantity DESC NULLS LAST, p.product_name
+        """,
+        {"size": "1/2", "type": "MFRY|M\\(FR\\)Y"}
+    ),
+}
+
+
+def run_explain(cursor, sql: str, params: dict, repeat: int) -> dict:
+    """EXPLAIN ANALYZE çalıştır - en iyi süre ve plan özetini döndür"""
+    best_ms = None
+    plan_lines = []
+    for _ in range(repeat):
+        cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql, params)
+        plan_lines = [row[0] for row in cursor.fetchall()]
+        for line in plan_lines:
+            if line.startswith("Execution Time:"):
+                ms = float(line.split(":")[1].replace("ms", "").strip())
+                best_ms = ms if best_ms is None else min(best_ms, ms)
+    scan_nodes = [line.strip() for line in plan_lines if "Scan" in line]
+    return {"best_ms": best_ms or 0.0, "scans": scan_nodes}
+
+
+def benchmark_search_indexes(rows: int, repeat: int) -> bool:
+    """Sentetik katalog oluştur, index öncesi/sonrası planları karşılaştır"""
+    import psycopg2
+
+    conn = psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        database=os.getenv('DB_NAME', 'eticaret_db'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'masterkey'),
+        port=os.getenv('DB_PORT', 5432)
+    )
+    conn.autocommit = True
+    cursor = conn.cursor()
+
+    print("=" * 50)
+    print("Trigram Search Index Benchmark")
+    print("=" * 50)
+
+    try:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+        cursor.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+        cursor.execute(f"SET search_path TO {BENCH_SCHEMA}, public")
+
+        print(f"[BENCH] Creating synthetic catalog: {rows} rows...")
+        start = time.time()
+        cursor.execute(SYNTHETIC_CATALOG_SQL.format(rows=int(rows)))
+        cursor.execute("ANALYZE products_semantic")
+        print(f"[BENCH] Catalog ready in {time.time() - start:.1f}s")
+
+        before = {name: run_explain(cursor, sql, params, repeat) for name, (sql, params) in BENCH_QUERIES.items()}
+
+        print("[BENCH] Creating trigram GIN indexes...")
+        start = time.time()
+        cursor.execute(INDEX_SQL)
+        print(f"[BENCH] Indexes ready in {time.time() - start:.1f}s")
+
+        after = {name: run_explain(cursor, sql, params, repeat) for name, (sql, params) in BENCH_QUERIES.items()}
+
+        print()
+        print(f"{'Query':<18} {'Before (ms)':>12} {'After (ms)':>12} {'Speedup':>9}")
+        print("-" * 54)
+        for name in BENCH_QUERIES:
+            b, a = before[name]["best_ms"], after[name]["best_ms"]
+            speedup = f"{b / a:.1f}x" if a else "-"
+            print(f"{name:<18} {b:>12.2f} {a:>12.2f} {speedup:>9}")
+
+        print()
+        for name in BENCH_QUERIES:
+            print(f"[PLAN] {name}")
+            print(f"  before: {before[name]['scans'][:2]}")
+            print(f"  after:  {after[name]['scans'][:2]}")
+
+        return True
+
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+        return False
+
+    finally:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trigram GIN index before/after benchmark")
+    parser.add_argument("--rows", type=int, default=500000, help="Synthetic catalog size")
+    parser.add_argument("--repeat", type=int, default=3, help="EXPLAIN ANALYZE runs per query (best is reported)")
+    args = parser.parse_args()
+
+    success = benchmark_search_indexes(args.rows, args.repeat)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tool Schema Benchmark Script
+Per-turn CPU cost of building the chat completion payload for the five
+Swarm agents: upstream Swarm (function_to_json every call) vs B2BSwarm
+(schemas and system message compiled once per agent)
+"""
+
+import os
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+
+# src/core modülleri için
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src', 'core'))
+
+# Load environment variables
+load_dotenv()
+
+
+class PayloadCapture:
+    """chat.completions.create yerine geçer - ağ çağrısı yok, sadece payload hazırlığı ölçülür"""
+
+    def __init__(self):
+        self.chat = self
+        self.completions = self
+
+    def create(self, **params):
+        return params
+
+
+def bench(swarm_client, agents, iterations):
+    """Her agent için iterations kez get_chat_completion - process CPU süresi (ms/turn)"""
+    history = [{"role": "user", "content": "100x200 silindir"}]
+    start = time.process_time()
+    for _ in range(iterations):
+        for agent in agents:
+            swarm_client.get_chat_completion(
+                agent=agent, history=history, context_variables={},
+                model_override=None, stream=False, debug=False
+            )
+    elapsed = time.process_time() - start
+    return elapsed * 1000 / (iterations * len(agents))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-turn tool schema / payload build cost")
+    parser.add_argument('--iterations', type=int, default=2000, help='Turns per agent')
+    args = parser.parse_args()
+
+    from swarm import Swarm
+    from swarm_client import B2BSwarm
+    import swarm_b2b_system as b2b
+
+    agents = [b2b.intent_analyzer, b2b.customer_manager, b2b.product_specialist,
+              b2b.sales_expert, b2b.order_manager]
+    tool_count = sum(len(agent.functions) for agent in agents)
+    print(f"Agents: {len(agents)}, tools: {tool_count}, iterations: {args.iterations}")
+
+    upstream = Swarm(client=PayloadCapture())
+    cached = B2BSwarm(client=PayloadCapture())
+    cached.warm_agent_payloads(agents)
+
+    # Isınma
+    bench(upstream, agents, 50)
+    bench(cached, agents, 50)
+
+    upstream_ms = bench(upstream, agents, args.iterations)
+    cached_ms = bench(cached, agents, args.iterations)
+
+    print(f"Upstream Swarm : {upstream_ms:.4f} ms CPU / turn")
+    print(f"B2BSwarm cached: {cached_ms:.4f} ms CPU / turn")
+    print(f"Saved          : {upstream_ms - cached_ms:.4f} ms CPU / turn "
+          f"({upstream_ms / cached_ms if cached_ms else float('inf'):.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
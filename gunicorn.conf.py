@@ -0,0 +1,52 @@
+"""
+Gunicorn config - Swarm B2B production server (Linux)
+Usage: gunicorn -c gunicorn.conf.py
+
+- preload_app: SwarmB2BSystem / agent şemaları master'da bir kez hazırlanır
+- pre_fork / post_fork: DB havuzu worker başına yeniden açılır (bağlantılar fork'la paylaşılmaz)
+- worker_exit: lane kuyrukları ve callback teslimleri boşaltılır (graceful drain)
+"""
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+pythonpath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src', 'core')
+wsgi_app = "wsgi:app"
+
+bind = f"{os.getenv('WEB_HOST', '0.0.0.0')}:{os.getenv('WEB_PORT', 3007)}"
+workers = int(os.getenv('WEB_WORKERS', 1))
+# /process-message senkron modda lane sonucunu bekler - thread'li worker gerekir
+worker_class = "gthread"
+threads = int(os.getenv('WEB_THREADS', 16))
+preload_app = True
+
+# Swarm run'ları uzun sürebilir; SIGTERM sonrası kuyruktakiler için DRAIN_TIMEOUT kadar süre tanı
+timeout = int(os.getenv('WEB_TIMEOUT', 180))
+graceful_timeout = int(os.getenv('DRAIN_TIMEOUT', 30)) + 5
+
+
+def when_ready(server):
+    if workers > 1 and os.getenv('STATE_BACKEND', 'memory').lower() != 'postgres':
+        server.log.warning("Conversation state is per-process: with WEB_WORKERS > 1 set STATE_BACKEND=postgres "
+                           "so the same customer can reach any worker")
+
+
+def pre_fork(server, worker):
+    # Master'ın preload sırasında açtığı bağlantılar worker'lara miras kalmasın
+    from wsgi import db
+    db.close_pool()
+
+
+def post_fork(server, worker):
+    from wsgi import db, start_workers
+    db.connect()
+    start_workers()
+    server.log.info(f"[SERVER] Worker {worker.pid} ready")
+
+
+def worker_exit(server, worker):
+    from wsgi import db, drain_workers
+    drain_workers()
+    db.close_pool()
@@ -0,0 +1,159 @@
+-- Migration 004: Precomputed cylinder dimension columns
+-- Date: 2026-10-16
+-- Description: Stores cylinder çap/strok as maintained, indexed columns so that
+--              cylinder searches no longer run regexp_replace/string_to_array
+--              on every row of products_semantic
+
+BEGIN;
+
+-- Ürün adından ilk iki sayıyı çıkar (4 haneden uzun sayılar ölçü değildir)
+-- Eski find_cylinder_with_extras içindeki first_num/second_num ifadesinin aynısı
+CREATE OR REPLACE FUNCTION extract_cylinder_dimensions(
+    p_product_name TEXT,
+    OUT cap INTEGER,
+    OUT strok INTEGER
+)
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+DECLARE
+    v_numbers TEXT[];
+BEGIN
+    v_numbers := string_to_array(
+        regexp_replace(regexp_replace(p_product_name, '[^0-9]+', ' ', 'g'), '^ +| +$', '', 'g'),
+        ' '
+    );
+    cap := CASE WHEN length(v_numbers[1]) <= 4 THEN v_numbers[1]::INT ELSE NULL END;
+    strok := CASE WHEN length(v_numbers[2]) <= 4 THEN v_numbers[2]::INT ELSE NULL END;
+END;
+$$;
+
+-- Yeni kolonlar
+ALTER TABLE products_semantic
+ADD COLUMN IF NOT EXISTS is_cylinder BOOLEAN NOT NULL DEFAULT FALSE,
+ADD COLUMN IF NOT EXISTS cylinder_cap INTEGER,
+ADD COLUMN IF NOT EXISTS cylinder_strok INTEGER;
+
+-- Trigger: ürün adı değiştiğinde ölçüleri yeniden hesapla
+CREATE OR REPLACE FUNCTION products_semantic_cylinder_dimensions()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.is_cylinder := (NEW.product_name ILIKE '%SIL%' OR NEW.product_name ILIKE '%SİL%')
+                       AND NEW.product_name ~ '[0-9]';
+
+    IF NEW.is_cylinder THEN
+        SELECT d.cap, d.strok INTO NEW.cylinder_cap, NEW.cylinder_strok
+        FROM extract_cylinder_dimensions(NEW.product_name) d;
+    ELSE
+        NEW.cylinder_cap := NULL;
+        NEW.cylinder_strok := NULL;
+    END IF;
+
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_products_cylinder_dimensions ON products_semantic;
+CREATE TRIGGER trg_products_cylinder_dimensions
+    BEFORE INSERT OR UPDATE OF product_name ON products_semantic
+    FOR EACH ROW
+    EXECUTE FUNCTION products_semantic_cylinder_dimensions();
+
+-- Backfill mevcut satırlar
+UPDATE products_semantic p
+SET is_cylinder = (p.product_name ILIKE '%SIL%' OR p.product_name ILIKE '%SİL%')
+                  AND p.product_name ~ '[0-9]';
+
+UPDATE products_semantic p
+SET (cylinder_cap, cylinder_strok) = (
+    SELECT d.cap, d.strok FROM extract_cylinder_dimensions(p.product_name) d
+)
+WHERE p.is_cylinder;
+
+-- Composite btree index - sadece silindir satırları
+CREATE INDEX IF NOT EXISTS idx_products_cylinder_dims
+    ON products_semantic (cylinder_cap, cylinder_strok)
+    WHERE is_cylinder;
+
+-- Sadece strok ile yapılan aramalar için
+CREATE INDEX IF NOT EXISTS idx_products_cylinder_strok
+    ON products_semantic (cylinder_strok)
+    WHERE is_cylinder;
+
+-- find_cylinder_with_extras: ölçüleri kolonlardan oku
+-- Ölçü filtreleri sadece parametre verildiğinde eklenir (dynamic SQL),
+-- böylece "cap IS NULL OR ..." generic plan'ı indeksi devre dışı bırakmaz
+CREATE OR REPLACE FUNCTION find_cylinder_with_extras(
+    cap INTEGER DEFAULT NULL,
+    strok INTEGER DEFAULT NULL,
+    extra1 TEXT DEFAULT NULL,
+    extra2 TEXT DEFAULT NULL,
+    extra3 TEXT DEFAULT NULL,
+    extra4 TEXT DEFAULT NULL
+)
+RETURNS TABLE(
+    id INTEGER,
+    product_code TEXT,
+    product_name TEXT,
+    price NUMERIC,
+    stock_quantity INTEGER,
+    description TEXT,
+    specifications TEXT,
+    category TEXT,
+    brand TEXT
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_sql TEXT;
+    v_extras TEXT[] := ARRAY[extra1, extra2, extra3, extra4];
+BEGIN
+    v_sql := 'SELECT p.id, p.product_code, p.product_name, p.price, p.stock_quantity,
+                     p.description, p.specifications, p.category, p.brand
+              FROM products_semantic p
+              WHERE p.is_cylinder';
+
+    IF cap IS NOT NULL THEN
+        v_sql := v_sql || ' AND p.cylinder_cap = $1';
+    END IF;
+
+    IF strok IS NOT NULL THEN
+        v_sql := v_sql || ' AND p.cylinder_strok = $2';
+    END IF;
+
+    -- Extra kontrolleri ($3..$6)
+    FOR i IN 1..4 LOOP
+        IF v_extras[i] IS NOT NULL THEN
+            v_sql := v_sql || format(
+                ' AND (p.product_name ILIKE ''%%'' || $%1$s || ''%%''
+                       OR p.description ILIKE ''%%'' || $%1$s || ''%%''
+                       OR p.specifications ILIKE ''%%'' || $%1$s || ''%%'')',
+                i + 2
+            );
+        END IF;
+    END LOOP;
+
+    v_sql := v_sql || ' ORDER BY p.stock_quantity DESC';
+
+    RETURN QUERY EXECUTE v_sql USING cap, strok, extra1, extra2, extra3, extra4;
+END;
+$$;
+
+ANALYZE products_semantic;
+
+COMMIT;
+
+-- Rollback script (for reference - save separately if needed)
+-- BEGIN;
+-- DROP TRIGGER IF EXISTS trg_products_cylinder_dimensions ON products_semantic;
+-- DROP FUNCTION IF EXISTS products_semantic_cylinder_dimensions();
+-- DROP INDEX IF EXISTS idx_products_cylinder_dims;
+-- DROP INDEX IF EXISTS idx_products_cylinder_strok;
+-- ALTER TABLE products_semantic
+-- DROP COLUMN IF EXISTS is_cylinder,
+-- DROP COLUMN IF EXISTS cylinder_cap,
+-- DROP COLUMN IF EXISTS cylinder_strok;
+-- DROP FUNCTION IF EXISTS extract_cylinder_dimensions(TEXT);
+-- COMMIT;
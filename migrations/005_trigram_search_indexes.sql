@@ -0,0 +1,251 @@
+-- Migration 005: Trigram GIN indexes for free-text product search
+-- Date: 2026-10-16
+-- Description: Adds pg_trgm GIN indexes on the columns searched with
+--              ILIKE '%term%' / regex, and rewrites valve_bul and
+--              find_air_preparation_units so optional filters are only added
+--              when given. The old "param IS NULL OR ..." shape forces a
+--              generic plan that can never use an index.
+-- Benchmark:   python benchmark_search_indexes.py (before/after EXPLAIN)
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Her kolon için ayrı index: product_code/name/description/specifications
+-- üzerindeki OR'lu ILIKE'lar BitmapOr ile birleştirilebilsin
+CREATE INDEX IF NOT EXISTS idx_products_code_trgm
+    ON products_semantic USING GIN (product_code gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_products_name_trgm
+    ON products_semantic USING GIN (product_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_products_description_trgm
+    ON products_semantic USING GIN (description gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_products_specifications_trgm
+    ON products_semantic USING GIN (specifications gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_products_category_trgm
+    ON products_semantic USING GIN (category gin_trgm_ops);
+
+-- valve_bul: aynı sonuç, sadece verilen filtreler sorguya eklenir
+CREATE OR REPLACE FUNCTION valve_bul(
+    tip VARCHAR DEFAULT NULL,
+    baglanti_boyutu VARCHAR DEFAULT NULL,
+    extra1 TEXT DEFAULT NULL,
+    extra2 TEXT DEFAULT NULL,
+    extra3 TEXT DEFAULT NULL,
+    extra4 TEXT DEFAULT NULL
+)
+RETURNS TABLE(
+    id INTEGER,
+    product_code TEXT,
+    product_name TEXT,
+    price NUMERIC,
+    stock_quantity INTEGER,
+    description TEXT,
+    specifications TEXT,
+    category TEXT,
+    brand TEXT
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_sql TEXT;
+    v_extras TEXT[] := ARRAY[extra1, extra2, extra3, extra4];
+BEGIN
+    v_sql := 'SELECT p.id, p.product_code, p.product_name, p.price, p.stock_quantity,
+                     p.description, p.specifications, p.category, p.brand
+              FROM products_semantic p
+              WHERE (p.category ILIKE ''%valf%'' OR p.category ILIKE ''%valve%'' OR
+                     p.product_name ILIKE ''%valf%'' OR p.product_name ILIKE ''%valve%'')
+                AND p.stock_quantity > 0';
+
+    -- Tip parametresi kontrolü (5/2, 3/2, vb.)
+    IF tip IS NOT NULL THEN
+        v_sql := v_sql || ' AND (p.product_name ~ $1 OR p.description ~ $1 OR p.specifications ~ $1)';
+    END IF;
+
+    -- Bağlantı boyutu kontrolü (1/4, 1/8, vb.)
+    IF baglanti_boyutu IS NOT NULL THEN
+        v_sql := v_sql || ' AND (p.product_name ~ $2 OR p.description ~ $2 OR p.specifications ~ $2)';
+    END IF;
+
+    -- Extra kontrolleri ($3..$6)
+    FOR i IN 1..4 LOOP
+        IF v_extras[i] IS NOT NULL THEN
+            v_sql := v_sql || format(
+                ' AND (p.product_name ILIKE ''%%'' || $%1$s || ''%%''
+                       OR p.description ILIKE ''%%'' || $%1$s || ''%%''
+                       OR p.specifications ILIKE ''%%'' || $%1$s || ''%%'')',
+                i + 2
+            );
+        END IF;
+    END LOOP;
+
+    -- Relevance scoring
+    v_sql := v_sql || '
+        ORDER BY
+            CASE
+                WHEN $1 IS NOT NULL AND p.product_name ILIKE (''%'' || $1 || ''%'') THEN 1
+                WHEN $1 IS NOT NULL AND p.description ILIKE (''%'' || $1 || ''%'') THEN 2
+                ELSE 3
+            END,
+            CASE
+                WHEN $2 IS NOT NULL AND p.product_name ILIKE (''%'' || $2 || ''%'') THEN 1
+                WHEN $2 IS NOT NULL AND p.description ILIKE (''%'' || $2 || ''%'') THEN 2
+                ELSE 3
+            END,
+            p.stock_quantity DESC,
+            p.price ASC';
+
+    RETURN QUERY EXECUTE v_sql USING tip, baglanti_boyutu, extra1, extra2, extra3, extra4;
+END;
+$$;
+
+-- find_air_preparation_units: aynı parse mantığı, index kullanabilen WHERE
+CREATE OR REPLACE FUNCTION find_air_preparation_units(
+    p_query TEXT DEFAULT NULL,           -- Genel arama metni
+    p_unit_type TEXT DEFAULT NULL,       -- MR, FRY, MFRY, Y vb.
+    p_connection_size TEXT DEFAULT NULL, -- 1/4, 1/2, 3/8, 3/4, 1/8
+    p_keywords TEXT DEFAULT NULL         -- REGÜLATÖR, YAĞLAYICI vb.
+)
+RETURNS TABLE (
+    id INTEGER,
+    product_code TEXT,
+    product_name TEXT,
+    price NUMERIC,
+    stock_quantity INTEGER,
+    unit_type TEXT,
+    connection_size TEXT,
+    description TEXT
+) AS $$
+DECLARE
+    v_parsed_size TEXT;
+    v_parsed_type TEXT;
+    v_parsed_keywords TEXT;
+    v_type_pattern TEXT;
+    v_keyword_pattern TEXT;
+    v_sql TEXT;
+BEGIN
+    -- Eğer sadece p_query gelirse, onu parse et
+    IF p_query IS NOT NULL AND p_unit_type IS NULL AND p_connection_size IS NULL THEN
+        p_query := UPPER(TRIM(p_query));
+
+        -- Ölçü algılama
+        IF p_query ~ '1/8' THEN v_parsed_size := '1/8';
+        ELSIF p_query ~ '1/4' THEN v_parsed_size := '1/4';
+        ELSIF p_query ~ '1/2' THEN v_parsed_size := '1/2';
+        ELSIF p_query ~ '3/8' THEN v_parsed_size := '3/8';
+        ELSIF p_query ~ '3/4' THEN v_parsed_size := '3/4';
+        END IF;
+
+        -- Tip algılama
+        IF p_query ~ '\sMR\s|^MR\s|\sMR$|^MR$' THEN v_parsed_type := 'MR';
+        ELSIF p_query ~ 'FRY' THEN v_parsed_type := 'FRY';
+        ELSIF p_query ~ 'MFRY|M\(FR\)Y' THEN v_parsed_type := 'MFRY';
+        ELSIF p_query ~ '\sY\s|^Y\s|\sY$|^Y$' THEN v_parsed_type := 'Y';
+        END IF;
+
+        -- Anahtar kelime algılama
+        IF p_query ~ 'REGÜLATÖR|REGULATÖR' THEN v_parsed_keywords := 'REGÜLATÖR';
+        ELSIF p_query ~ 'YAĞLAYICI' THEN v_parsed_keywords := 'YAĞLAYICI';
+        ELSIF p_query ~ 'ŞARTLANDIRICI' THEN v_parsed_keywords := 'ŞARTLANDIRICI';
+        END IF;
+
+        -- Parse edilenleri parametrelere ata
+        IF v_parsed_size IS NOT NULL THEN p_connection_size := v_parsed_size; END IF;
+        IF v_parsed_type IS NOT NULL THEN p_unit_type := v_parsed_type; END IF;
+        IF v_parsed_keywords IS NOT NULL THEN p_keywords := v_parsed_keywords; END IF;
+    END IF;
+
+    -- Parametreleri büyük harfe çevir
+    IF p_unit_type IS NOT NULL THEN p_unit_type := UPPER(TRIM(p_unit_type)); END IF;
+    IF p_keywords IS NOT NULL THEN p_keywords := UPPER(TRIM(p_keywords)); END IF;
+
+    v_sql := 'SELECT
+        p.id,
+        p.product_code,
+        p.product_name,
+        p.price,
+        p.stock_quantity,
+        CASE
+            WHEN p.product_name ~ ''MFRY|M\(FR\)Y'' THEN ''MFRY''
+            WHEN p.product_name ~ ''MFR|M\(FR\)'' AND p.product_name !~ ''Y'' THEN ''MFR''
+            WHEN p.product_name ~ ''\sMR\s'' THEN ''MR''
+            WHEN p.product_name ~ ''FRY'' THEN ''FRY''
+            WHEN p.product_name ~ ''\sY\s'' THEN ''Y''
+            WHEN p.product_name ~ ''REGÜLATÖR|REGULATÖR'' THEN ''REGULATOR''
+            WHEN p.product_name ~ ''YAĞLAYICI'' THEN ''YAGLAYICI''
+            ELSE ''SARTLANDIRICI''
+        END AS unit_type,
+        CASE
+            WHEN p.product_name ~ ''1/8'' THEN ''1/8''
+            WHEN p.product_name ~ ''1/4'' THEN ''1/4''
+            WHEN p.product_name ~ ''1/2'' THEN ''1/2''
+            WHEN p.product_name ~ ''3/8'' THEN ''3/8''
+            WHEN p.product_name ~ ''3/4'' THEN ''3/4''
+            ELSE NULL
+        END AS connection_size,
+        p.description
+    FROM products_semantic p
+    WHERE TRUE';
+
+    -- 1. Ölçü filtresi
+    IF p_connection_size IS NOT NULL THEN
+        v_sql := v_sql || ' AND p.product_name ~ $1';
+    END IF;
+
+    -- 2. Tip filtresi
+    IF p_unit_type IS NOT NULL THEN
+        v_type_pattern := CASE p_unit_type
+            WHEN 'MR' THEN '\sMR\s|^MR\s'
+            WHEN 'FRY' THEN 'FRY'
+            WHEN 'MFRY' THEN 'MFRY|M\(FR\)Y'
+            WHEN 'MFR' THEN 'MFR|M\(FR\)'
+            WHEN 'Y' THEN '\sY\s|^Y\s'
+            ELSE NULL
+        END;
+        IF v_type_pattern IS NULL THEN
+            v_sql := v_sql || ' AND FALSE';
+        ELSE
+            v_sql := v_sql || ' AND p.product_name ~ $2';
+        END IF;
+    END IF;
+
+    -- 3. Anahtar kelime filtresi
+    IF p_keywords IS NOT NULL THEN
+        v_keyword_pattern := CASE
+            WHEN p_keywords ~ 'REGÜLATÖR|REGULATÖR' THEN 'REGÜLATÖR|REGULATÖR|REG'
+            WHEN p_keywords ~ 'YAĞLAYICI' THEN 'YAĞLAYICI|YAĞ'
+            WHEN p_keywords ~ 'ŞARTLANDIRICI' THEN 'ŞARTLANDIRICI|ŞART'
+            WHEN p_keywords ~ 'FILTRE' THEN 'FILTRE|FİLTRE'
+            ELSE NULL
+        END;
+        IF v_keyword_pattern IS NULL THEN
+            v_sql := v_sql || ' AND p.product_name ILIKE ''%'' || $4 || ''%''';
+        ELSE
+            v_sql := v_sql || ' AND p.product_name ~ $3';
+        END IF;
+    END IF;
+
+    -- 4. Genel kategori filtresi - parametre varsa sadece hava hazırlama ürünleri
+    IF p_unit_type IS NOT NULL OR p_keywords IS NOT NULL OR p_connection_size IS NOT NULL THEN
+        v_sql := v_sql || ' AND p.product_name ~ ''MR|FRY|MFRY|MFR|\sY\s|REGÜLATÖR|REGULATÖR|YAĞLAYICI|ŞARTLANDIRICI|FILTRE''';
+    END IF;
+
+    v_sql := v_sql || ' ORDER BY p.stock_quantity DESC NULLS LAST, p.product_name';
+
+    RETURN QUERY EXECUTE v_sql USING p_connection_size, v_type_pattern, v_keyword_pattern, p_keywords;
+END;
+$$ LANGUAGE plpgsql;
+
+ANALYZE products_semantic;
+
+COMMIT;
+
+-- Rollback script (for reference - save separately if needed)
+-- Functions: re-run migrations/003_valve_bul_extras.sql and sql/sartlandirici_search_fixed.sql
+-- BEGIN;
+-- DROP INDEX IF EXISTS idx_products_code_trgm;
+-- DROP INDEX IF EXISTS idx_products_name_trgm;
+-- DROP INDEX IF EXISTS idx_products_description_trgm;
+-- DROP INDEX IF EXISTS idx_products_specifications_trgm;
+-- DROP INDEX IF EXISTS idx_products_category_trgm;
+-- COMMIT;
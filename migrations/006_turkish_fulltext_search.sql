@@ -0,0 +1,72 @@
+-- Migration 006: Turkish full-text search for general product queries
+-- Date: 2026-10-16
+-- Description: Adds a weighted tsvector column (search_tsv) maintained by
+--              trigger and backed by a GIN index, using a Turkish text search
+--              configuration that also folds accents so "kuresel" matches
+--              "KÜRESEL". Used by DatabaseManager.search_products_fulltext.
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- turkish_products: Turkish stemmer + unaccent (ç/ğ/ı/ö/ş/ü -> c/g/i/o/s/u)
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'turkish_products') THEN
+        CREATE TEXT SEARCH CONFIGURATION turkish_products (COPY = pg_catalog.turkish);
+        ALTER TEXT SEARCH CONFIGURATION turkish_products
+            ALTER MAPPING FOR asciiword, asciihword, hword_asciipart, hword, hword_part, word
+            WITH unaccent, turkish_stem;
+    END IF;
+END;
+$$;
+
+ALTER TABLE products_semantic
+ADD COLUMN IF NOT EXISTS search_tsv TSVECTOR;
+
+-- Ağırlıklar: ürün adı/kodu A, kategori B, açıklama C, özellikler D
+CREATE OR REPLACE FUNCTION products_semantic_search_tsv()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.search_tsv :=
+        setweight(to_tsvector('turkish_products', coalesce(NEW.product_name, '')), 'A') ||
+        setweight(to_tsvector('turkish_products', coalesce(NEW.product_code, '')), 'A') ||
+        setweight(to_tsvector('turkish_products', coalesce(NEW.category, '')), 'B') ||
+        setweight(to_tsvector('turkish_products', coalesce(NEW.description, '')), 'C') ||
+        setweight(to_tsvector('turkish_products', coalesce(NEW.specifications, '')), 'D');
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_products_search_tsv ON products_semantic;
+CREATE TRIGGER trg_products_search_tsv
+    BEFORE INSERT OR UPDATE OF product_name, product_code, category, description, specifications
+    ON products_semantic
+    FOR EACH ROW
+    EXECUTE FUNCTION products_semantic_search_tsv();
+
+-- Backfill mevcut satırlar
+UPDATE products_semantic SET search_tsv =
+    setweight(to_tsvector('turkish_products', coalesce(product_name, '')), 'A') ||
+    setweight(to_tsvector('turkish_products', coalesce(product_code, '')), 'A') ||
+    setweight(to_tsvector('turkish_products', coalesce(category, '')), 'B') ||
+    setweight(to_tsvector('turkish_products', coalesce(description, '')), 'C') ||
+    setweight(to_tsvector('turkish_products', coalesce(specifications, '')), 'D');
+
+CREATE INDEX IF NOT EXISTS idx_products_search_tsv
+    ON products_semantic USING GIN (search_tsv);
+
+ANALYZE products_semantic;
+
+COMMIT;
+
+-- Rollback script (for reference - save separately if needed)
+-- BEGIN;
+-- DROP TRIGGER IF EXISTS trg_products_search_tsv ON products_semantic;
+-- DROP FUNCTION IF EXISTS products_semantic_search_tsv();
+-- DROP INDEX IF EXISTS idx_products_search_tsv;
+-- ALTER TABLE products_semantic DROP COLUMN IF EXISTS search_tsv;
+-- DROP TEXT SEARCH CONFIGURATION IF EXISTS turkish_products;
+-- COMMIT;
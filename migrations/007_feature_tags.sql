@@ -0,0 +1,442 @@
+-- Migration 007: Normalized feature tags
+-- Date: 2026-10-16
+-- Description: Products get canonical feature tags (MANYETIK, YASTIKLI,
+--              SENSORLU, PASLANMAZ...) in a GIN-indexed text[] column, filled
+--              by trigger from a data-driven synonym table. Cylinder, valve and
+--              air preparation searches resolve extras through the same table
+--              and filter with a single "feature_tags @> ARRAY[...]" predicate
+--              instead of synonyms x columns ILIKE ORs.
+--              Extras that are not in the dictionary still fall back to ILIKE.
+
+BEGIN;
+
+-- Eş anlamlı sözlüğü: synonym -> canonical tag
+-- synonym değerleri fold_feature_text() ile normalize edilmiş (büyük harf, ASCII) tutulur.
+-- Ürün metni synonym'i içeriyorsa tag atanır; kullanıcı kelimesi synonym ile başlıyorsa tag'e çözülür.
+CREATE TABLE IF NOT EXISTS feature_tag_synonyms (
+    synonym TEXT PRIMARY KEY,
+    tag TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_feature_tag_synonyms_tag ON feature_tag_synonyms (tag);
+
+INSERT INTO feature_tag_synonyms (synonym, tag) VALUES
+    -- Silindir
+    ('MANYETIK', 'MANYETIK'),
+    ('MANYET', 'MANYETIK'),
+    ('MAGNETIK', 'MANYETIK'),
+    ('MAGNET', 'MANYETIK'),
+    ('MAG', 'MANYETIK'),
+    ('YASTIKLI', 'YASTIKLI'),
+    ('YASTIK', 'YASTIKLI'),
+    ('YAST', 'YASTIKLI'),
+    ('CUSHION', 'YASTIKLI'),
+    ('SENSORLU', 'SENSORLU'),
+    ('SENSOR', 'SENSORLU'),
+    ('SENS', 'SENSORLU'),
+    ('MIL', 'MIL'),
+    ('ROD', 'MIL'),
+    -- Genel malzeme / sertifika
+    ('PASLANMAZ', 'PASLANMAZ'),
+    ('INOX', 'PASLANMAZ'),
+    ('STAINLESS', 'PASLANMAZ'),
+    ('ATEX', 'ATEX'),
+    -- Valf
+    ('NAMUR', 'NAMUR'),
+    ('SELENOID', 'SELENOID'),
+    ('SOLENOID', 'SELENOID'),
+    ('PILOT', 'PILOT'),
+    -- Hava hazırlama
+    ('REGULATOR', 'REGULATOR'),
+    ('REG', 'REGULATOR'),
+    ('YAGLAYICI', 'YAGLAYICI'),
+    ('YAG', 'YAGLAYICI'),
+    ('SARTLANDIRICI', 'SARTLANDIRICI'),
+    ('SART', 'SARTLANDIRICI'),
+    ('FILTRE', 'FILTRE'),
+    ('FILTER', 'FILTRE')
+ON CONFLICT (synonym) DO NOTHING;
+
+-- Türkçe karakterleri katla: "Manyetİk", "MANYETİK", "manyetik" -> MANYETIK
+-- Son translate, Türkçe locale'de upper('i') = 'İ' durumuna karşı
+CREATE OR REPLACE FUNCTION fold_feature_text(p_text TEXT)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT translate(upper(translate(coalesce(p_text, ''), 'çğıöşüÇĞİÖŞÜ', 'cgiosuCGIOSU')), 'İ', 'I');
+$$;
+
+-- Kullanıcı kelimesini canonical tag'e çevir (en uzun eşleşen synonym kazanır), yoksa NULL
+CREATE OR REPLACE FUNCTION resolve_feature_tag(p_term TEXT)
+RETURNS TEXT
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT s.tag
+    FROM feature_tag_synonyms s
+    WHERE fold_feature_text(trim(p_term)) LIKE s.synonym || '%'
+    ORDER BY length(s.synonym) DESC
+    LIMIT 1;
+$$;
+
+-- Ürün metninden tag listesi
+CREATE OR REPLACE FUNCTION compute_feature_tags(
+    p_product_name TEXT,
+    p_description TEXT,
+    p_specifications TEXT
+)
+RETURNS TEXT[]
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT coalesce(array_agg(DISTINCT s.tag ORDER BY s.tag), '{}')
+    FROM feature_tag_synonyms s
+    WHERE fold_feature_text(concat_ws(' ', p_product_name, p_description, p_specifications))
+          LIKE '%' || s.synonym || '%';
+$$;
+
+ALTER TABLE products_semantic
+ADD COLUMN IF NOT EXISTS feature_tags TEXT[] NOT NULL DEFAULT '{}';
+
+-- Trigger: ürün metni değiştiğinde tag'leri yeniden hesapla
+CREATE OR REPLACE FUNCTION products_semantic_feature_tags()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.feature_tags := compute_feature_tags(NEW.product_name, NEW.description, NEW.specifications);
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_products_feature_tags ON products_semantic;
+CREATE TRIGGER trg_products_feature_tags
+    BEFORE INSERT OR UPDATE OF product_name, description, specifications ON products_semantic
+    FOR EACH ROW
+    EXECUTE FUNCTION products_semantic_feature_tags();
+
+-- Sözlük değiştiğinde tüm ürünleri yeniden etiketle: SELECT refresh_feature_tags();
+CREATE OR REPLACE FUNCTION refresh_feature_tags()
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    UPDATE products_semantic p
+    SET feature_tags = compute_feature_tags(p.product_name, p.description, p.specifications)
+    WHERE p.feature_tags IS DISTINCT FROM compute_feature_tags(p.product_name, p.description, p.specifications);
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$;
+
+-- Backfill mevcut satırlar
+SELECT refresh_feature_tags();
+
+CREATE INDEX IF NOT EXISTS idx_products_feature_tags
+    ON products_semantic USING GIN (feature_tags);
+
+-- find_cylinder_with_extras: sözlükte olan extras tek @> ile, diğerleri ILIKE ile
+CREATE OR REPLACE FUNCTION find_cylinder_with_extras(
+    cap INTEGER DEFAULT NULL,
+    strok INTEGER DEFAULT NULL,
+    extra1 TEXT DEFAULT NULL,
+    extra2 TEXT DEFAULT NULL,
+    extra3 TEXT DEFAULT NULL,
+    extra4 TEXT DEFAULT NULL
+)
+RETURNS TABLE(
+    id INTEGER,
+    product_code TEXT,
+    product_name TEXT,
+    price NUMERIC,
+    stock_quantity INTEGER,
+    description TEXT,
+    specifications TEXT,
+    category TEXT,
+    brand TEXT
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_sql TEXT;
+    v_extras TEXT[] := ARRAY[extra1, extra2, extra3, extra4];
+    v_tags TEXT[] := '{}';
+    v_tag TEXT;
+BEGIN
+    v_sql := 'SELECT p.id, p.product_code, p.product_name, p.price, p.stock_quantity,
+                     p.description, p.specifications, p.category, p.brand
+              FROM products_semantic p
+              WHERE p.is_cylinder';
+
+    IF cap IS NOT NULL THEN
+        v_sql := v_sql || ' AND p.cylinder_cap = $1';
+    END IF;
+
+    IF strok IS NOT NULL THEN
+        v_sql := v_sql || ' AND p.cylinder_strok = $2';
+    END IF;
+
+    -- Extra kontrolleri: tag ($7) veya ILIKE ($3..$6)
+    FOR i IN 1..4 LOOP
+        IF v_extras[i] IS NOT NULL THEN
+            v_tag := resolve_feature_tag(v_extras[i]);
+            IF v_tag IS NOT NULL THEN
+                v_tags := array_append(v_tags, v_tag);
+            ELSE
+                v_sql := v_sql || format(
+                    ' AND (p.product_name ILIKE ''%%'' || $%1$s || ''%%''
+                           OR p.description ILIKE ''%%'' || $%1$s || ''%%''
+                           OR p.specifications ILIKE ''%%'' || $%1$s || ''%%'')',
+                    i + 2
+                );
+            END IF;
+        END IF;
+    END LOOP;
+
+    IF cardinality(v_tags) > 0 THEN
+        v_sql := v_sql || ' AND p.feature_tags @> $7';
+    END IF;
+
+    v_sql := v_sql || ' ORDER BY p.stock_quantity DESC';
+
+    RETURN QUERY EXECUTE v_sql USING cap, strok, extra1, extra2, extra3, extra4, v_tags;
+END;
+$$;
+
+-- valve_bul: aynı filtreler, extras tag üzerinden
+CREATE OR REPLACE FUNCTION valve_bul(
+    tip VARCHAR DEFAULT NULL,
+    baglanti_boyutu VARCHAR DEFAULT NULL,
+    extra1 TEXT DEFAULT NULL,
+    extra2 TEXT DEFAULT NULL,
+    extra3 TEXT DEFAULT NULL,
+    extra4 TEXT DEFAULT NULL
+)
+RETURNS TABLE(
+    id INTEGER,
+    product_code TEXT,
+    product_name TEXT,
+    price NUMERIC,
+    stock_quantity INTEGER,
+    description TEXT,
+    specifications TEXT,
+    category TEXT,
+    brand TEXT
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_sql TEXT;
+    v_extras TEXT[] := ARRAY[extra1, extra2, extra3, extra4];
+    v_tags TEXT[] := '{}';
+    v_tag TEXT;
+BEGIN
+    v_sql := 'SELECT p.id, p.product_code, p.product_name, p.price, p.stock_quantity,
+                     p.description, p.specifications, p.category, p.brand
+              FROM products_semantic p
+              WHERE (p.category ILIKE ''%valf%'' OR p.category ILIKE ''%valve%'' OR
+                     p.product_name ILIKE ''%valf%'' OR p.product_name ILIKE ''%valve%'')
+                AND p.stock_quantity > 0';
+
+    -- Tip parametresi kontrolü (5/2, 3/2, vb.)
+    IF tip IS NOT NULL THEN
+        v_sql := v_sql || ' AND (p.product_name ~ $1 OR p.description ~ $1 OR p.specifications ~ $1)';
+    END IF;
+
+    -- Bağlantı boyutu kontrolü (1/4, 1/8, vb.)
+    IF baglanti_boyutu IS NOT NULL THEN
+        v_sql := v_sql || ' AND (p.product_name ~ $2 OR p.description ~ $2 OR p.specifications ~ $2)';
+    END IF;
+
+    -- Extra kontrolleri: tag ($7) veya ILIKE ($3..$6)
+    FOR i IN 1..4 LOOP
+        IF v_extras[i] IS NOT NULL THEN
+            v_tag := resolve_feature_tag(v_extras[i]);
+            IF v_tag IS NOT NULL THEN
+                v_tags := array_append(v_tags, v_tag);
+            ELSE
+                v_sql := v_sql || format(
+                    ' AND (p.product_name ILIKE ''%%'' || $%1$s || ''%%''
+                           OR p.description ILIKE ''%%'' || $%1$s || ''%%''
+                           OR p.specifications ILIKE ''%%'' || $%1$s || ''%%'')',
+                    i + 2
+                );
+            END IF;
+        END IF;
+    END LOOP;
+
+    IF cardinality(v_tags) > 0 THEN
+        v_sql := v_sql || ' AND p.feature_tags @> $7';
+    END IF;
+
+    -- Relevance scoring
+    v_sql := v_sql || '
+        ORDER BY
+            CASE
+                WHEN $1 IS NOT NULL AND p.product_name ILIKE (''%'' || $1 || ''%'') THEN 1
+                WHEN $1 IS NOT NULL AND p.description ILIKE (''%'' || $1 || ''%'') THEN 2
+                ELSE 3
+            END,
+            CASE
+                WHEN $2 IS NOT NULL AND p.product_name ILIKE (''%'' || $2 || ''%'') THEN 1
+                WHEN $2 IS NOT NULL AND p.description ILIKE (''%'' || $2 || ''%'') THEN 2
+                ELSE 3
+            END,
+            p.stock_quantity DESC,
+            p.price ASC';
+
+    RETURN QUERY EXECUTE v_sql USING tip, baglanti_boyutu, extra1, extra2, extra3, extra4, v_tags;
+END;
+$$;
+
+-- find_air_preparation_units: anahtar kelime filtresi tag üzerinden
+CREATE OR REPLACE FUNCTION find_air_preparation_units(
+    p_query TEXT DEFAULT NULL,           -- Genel arama metni
+    p_unit_type TEXT DEFAULT NULL,       -- MR, FRY, MFRY, Y vb.
+    p_connection_size TEXT DEFAULT NULL, -- 1/4, 1/2, 3/8, 3/4, 1/8
+    p_keywords TEXT DEFAULT NULL         -- REGÜLATÖR, YAĞLAYICI vb.
+)
+RETURNS TABLE (
+    id INTEGER,
+    product_code TEXT,
+    product_name TEXT,
+    price NUMERIC,
+    stock_quantity INTEGER,
+    unit_type TEXT,
+    connection_size TEXT,
+    description TEXT
+) AS $$
+DECLARE
+    v_parsed_size TEXT;
+    v_parsed_type TEXT;
+    v_parsed_keywords TEXT;
+    v_type_pattern TEXT;
+    v_keyword_tag TEXT;
+    v_sql TEXT;
+BEGIN
+    -- Eğer sadece p_query gelirse, onu parse et
+    IF p_query IS NOT NULL AND p_unit_type IS NULL AND p_connection_size IS NULL THEN
+        p_query := UPPER(TRIM(p_query));
+
+        -- Ölçü algılama
+        IF p_query ~ '1/8' THEN v_parsed_size := '1/8';
+        ELSIF p_query ~ '1/4' THEN v_parsed_size := '1/4';
+        ELSIF p_query ~ '1/2' THEN v_parsed_size := '1/2';
+        ELSIF p_query ~ '3/8' THEN v_parsed_size := '3/8';
+        ELSIF p_query ~ '3/4' THEN v_parsed_size := '3/4';
+        END IF;
+
+        -- Tip algılama
+        IF p_query ~ '\sMR\s|^MR\s|\sMR$|^MR$' THEN v_parsed_type := 'MR';
+        ELSIF p_query ~ 'FRY' THEN v_parsed_type := 'FRY';
+        ELSIF p_query ~ 'MFRY|M\(FR\)Y' THEN v_parsed_type := 'MFRY';
+        ELSIF p_query ~ '\sY\s|^Y\s|\sY$|^Y$' THEN v_parsed_type := 'Y';
+        END IF;
+
+        -- Anahtar kelime algılama
+        IF p_query ~ 'REGÜLATÖR|REGULATÖR' THEN v_parsed_keywords := 'REGÜLATÖR';
+        ELSIF p_query ~ 'YAĞLAYICI' THEN v_parsed_keywords := 'YAĞLAYICI';
+        ELSIF p_query ~ 'ŞARTLANDIRICI' THEN v_parsed_keywords := 'ŞARTLANDIRICI';
+        END IF;
+
+        -- Parse edilenleri parametrelere ata
+        IF v_parsed_size IS NOT NULL THEN p_connection_size := v_parsed_size; END IF;
+        IF v_parsed_type IS NOT NULL THEN p_unit_type := v_parsed_type; END IF;
+        IF v_parsed_keywords IS NOT NULL THEN p_keywords := v_parsed_keywords; END IF;
+    END IF;
+
+    -- Parametreleri büyük harfe çevir
+    IF p_unit_type IS NOT NULL THEN p_unit_type := UPPER(TRIM(p_unit_type)); END IF;
+    IF p_keywords IS NOT NULL THEN p_keywords := UPPER(TRIM(p_keywords)); END IF;
+
+    v_sql := 'SELECT
+        p.id,
+        p.product_code,
+        p.product_name,
+        p.price,
+        p.stock_quantity,
+        CASE
+            WHEN p.product_name ~ ''MFRY|M\(FR\)Y'' THEN ''MFRY''
+            WHEN p.product_name ~ ''MFR|M\(FR\)'' AND p.product_name !~ ''Y'' THEN ''MFR''
+            WHEN p.product_name ~ ''\sMR\s'' THEN ''MR''
+            WHEN p.product_name ~ ''FRY'' THEN ''FRY''
+            WHEN p.product_name ~ ''\sY\s'' THEN ''Y''
+            WHEN p.product_name ~ ''REGÜLATÖR|REGULATÖR'' THEN ''REGULATOR''
+            WHEN p.product_name ~ ''YAĞLAYICI'' THEN ''YAGLAYICI''
+            ELSE ''SARTLANDIRICI''
+        END AS unit_type,
+        CASE
+            WHEN p.product_name ~ ''1/8'' THEN ''1/8''
+            WHEN p.product_name ~ ''1/4'' THEN ''1/4''
+            WHEN p.product_name ~ ''1/2'' THEN ''1/2''
+            WHEN p.product_name ~ ''3/8'' THEN ''3/8''
+            WHEN p.product_name ~ ''3/4'' THEN ''3/4''
+            ELSE NULL
+        END AS connection_size,
+        p.description
+    FROM products_semantic p
+    WHERE TRUE';
+
+    -- 1. Ölçü filtresi
+    IF p_connection_size IS NOT NULL THEN
+        v_sql := v_sql || ' AND p.product_name ~ $1';
+    END IF;
+
+    -- 2. Tip filtresi
+    IF p_unit_type IS NOT NULL THEN
+        v_type_pattern := CASE p_unit_type
+            WHEN 'MR' THEN '\sMR\s|^MR\s'
+            WHEN 'FRY' THEN 'FRY'
+            WHEN 'MFRY' THEN 'MFRY|M\(FR\)Y'
+            WHEN 'MFR' THEN 'MFR|M\(FR\)'
+            WHEN 'Y' THEN '\sY\s|^Y\s'
+            ELSE NULL
+        END;
+        IF v_type_pattern IS NULL THEN
+            v_sql := v_sql || ' AND FALSE';
+        ELSE
+            v_sql := v_sql || ' AND p.product_name ~ $2';
+        END IF;
+    END IF;
+
+    -- 3. Anahtar kelime filtresi - sözlükte varsa tag, yoksa ILIKE
+    IF p_keywords IS NOT NULL THEN
+        v_keyword_tag := resolve_feature_tag(p_keywords);
+        IF v_keyword_tag IS NULL THEN
+            v_sql := v_sql || ' AND p.product_name ILIKE ''%'' || $4 || ''%''';
+        ELSE
+            v_sql := v_sql || ' AND p.feature_tags @> ARRAY[$3]';
+        END IF;
+    END IF;
+
+    -- 4. Genel kategori filtresi - parametre varsa sadece hava hazırlama ürünleri
+    IF p_unit_type IS NOT NULL OR p_keywords IS NOT NULL OR p_connection_size IS NOT NULL THEN
+        v_sql := v_sql || ' AND p.product_name ~ ''MR|FRY|MFRY|MFR|\sY\s|REGÜLATÖR|REGULATÖR|YAĞLAYICI|ŞARTLANDIRICI|FILTRE''';
+    END IF;
+
+    v_sql := v_sql || ' ORDER BY p.stock_quantity DESC NULLS LAST, p.product_name';
+
+    RETURN QUERY EXECUTE v_sql USING p_connection_size, v_type_pattern, v_keyword_tag, p_keywords;
+END;
+$$ LANGUAGE plpgsql;
+
+ANALYZE products_semantic;
+
+COMMIT;
+
+-- Rollback script (for reference - save separately if needed)
+-- Functions: re-run migrations/004_cylinder_dimension_columns.sql and 005_trigram_search_indexes.sql
+-- BEGIN;
+-- DROP TRIGGER IF EXISTS trg_products_feature_tags ON products_semantic;
+-- DROP FUNCTION IF EXISTS products_semantic_feature_tags();
+-- DROP FUNCTION IF EXISTS refresh_feature_tags();
+-- DROP INDEX IF EXISTS idx_products_feature_tags;
+-- ALTER TABLE products_semantic DROP COLUMN IF EXISTS feature_tags;
+-- DROP FUNCTION IF EXISTS compute_feature_tags(TEXT, TEXT, TEXT);
+-- DROP FUNCTION IF EXISTS resolve_feature_tag(TEXT);
+-- DROP FUNCTION IF EXISTS fold_feature_text(TEXT);
+-- DROP TABLE IF EXISTS feature_tag_synonyms;
+-- COMMIT;
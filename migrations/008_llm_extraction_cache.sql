@@ -0,0 +1,32 @@
+-- Migration 008: Persistent cache for LLM parameter extraction
+-- Date: 2026-10-16
+-- Description: Stores extract_cylinder_params_with_ai / extract_valve_params_with_ai
+--              results keyed by normalized query + prompt/model version so they
+--              survive restarts. Used by src/core/extraction_cache.py
+--              (LLM_CACHE_BACKEND=postgres).
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS llm_extraction_cache (
+    cache_key TEXT PRIMARY KEY,          -- sha256(kind|prompt_version|model|normalized_query)
+    kind TEXT,                           -- cylinder / valve
+    query TEXT,                          -- normalize edilmiş sorgu (debug için)
+    result JSONB NOT NULL,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_hit_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+-- TTL temizliği ve LRU boyut sınırı için
+CREATE INDEX IF NOT EXISTS idx_llm_extraction_cache_expires
+    ON llm_extraction_cache (expires_at);
+CREATE INDEX IF NOT EXISTS idx_llm_extraction_cache_last_hit
+    ON llm_extraction_cache (last_hit_at DESC);
+
+COMMIT;
+
+-- Rollback script (for reference - save separately if needed)
+-- BEGIN;
+-- DROP TABLE IF EXISTS llm_extraction_cache;
+-- COMMIT;
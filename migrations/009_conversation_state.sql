@@ -0,0 +1,29 @@
+-- Migration 009: Shared conversation state store
+-- Date: 2026-10-16
+-- Description: Backing table for src/core/state_store.py (STATE_BACKEND=postgres).
+--              Conversation memory, extracted context, selected product and product
+--              list sessions survive restarts and are shared between worker processes.
+--              Writes are batched by the application (write-behind upsert).
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS conversation_state (
+    namespace TEXT NOT NULL,             -- conversation / extracted_context / selected_product / product_list
+    key TEXT NOT NULL,                   -- whatsapp_number veya session_id
+    value JSONB NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMPTZ,              -- NULL = süresiz
+    PRIMARY KEY (namespace, key)
+);
+
+-- Süresi dolan satırların periyodik temizliği için
+CREATE INDEX IF NOT EXISTS idx_conversation_state_expires
+    ON conversation_state (expires_at)
+    WHERE expires_at IS NOT NULL;
+
+COMMIT;
+
+-- Rollback script (for reference - save separately if needed)
+-- BEGIN;
+-- DROP TABLE IF EXISTS conversation_state;
+-- COMMIT;
@@ -0,0 +1,211 @@
+-- Migration 010: Exact feature tag matching and negated extras
+-- Date: 2026-10-16
+-- Description: resolve_feature_tag() (migration 007) matched the user's word by
+--              synonym prefix, so negated Turkish words resolved to the positive
+--              tag: "yastıksız" -> YASTIKLI, "sensörsüz" -> SENSORLU,
+--              "manyetiksiz" -> MANYETIK. Synonyms are now matched as whole words;
+--              a synonym + -sız/-siz/-suz/-süz resolves through
+--              resolve_excluded_feature_tag() and becomes an exclusion
+--              ("NOT feature_tags && ...") instead of a required tag.
+
+BEGIN;
+
+-- Kullanıcı kelimesini canonical tag'e çevir - sadece tam synonym eşleşmesi, yoksa NULL
+CREATE OR REPLACE FUNCTION resolve_feature_tag(p_term TEXT)
+RETURNS TEXT
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT s.tag
+    FROM feature_tag_synonyms s
+    WHERE s.synonym = fold_feature_text(trim(p_term));
+$$;
+
+-- Olumsuz kelime (synonym + SIZ/SUZ, katlanmış hali) -> hariç tutulacak tag, yoksa NULL
+-- "yastıksız" -> YASTIK + SIZ -> YASTIKLI, "sensörsüz" -> SENSOR + SUZ -> SENSORLU
+CREATE OR REPLACE FUNCTION resolve_excluded_feature_tag(p_term TEXT)
+RETURNS TEXT
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT s.tag
+    FROM feature_tag_synonyms s
+    WHERE fold_feature_text(trim(p_term)) ~ '(SIZ|SUZ)$'
+      AND s.synonym = regexp_replace(fold_feature_text(trim(p_term)), '(SIZ|SUZ)$', '');
+$$;
+
+-- find_cylinder_with_extras: olumsuz extras tag'i hariç tutar
+CREATE OR REPLACE FUNCTION find_cylinder_with_extras(
+    cap INTEGER DEFAULT NULL,
+    strok INTEGER DEFAULT NULL,
+    extra1 TEXT DEFAULT NULL,
+    extra2 TEXT DEFAULT NULL,
+    extra3 TEXT DEFAULT NULL,
+    extra4 TEXT DEFAULT NULL
+)
+RETURNS TABLE(
+    id INTEGER,
+    product_code TEXT,
+    product_name TEXT,
+    price NUMERIC,
+    stock_quantity INTEGER,
+    description TEXT,
+    specifications TEXT,
+    category TEXT,
+    brand TEXT
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_sql TEXT;
+    v_extras TEXT[] := ARRAY[extra1, extra2, extra3, extra4];
+    v_tags TEXT[] := '{}';
+    v_excluded TEXT[] := '{}';
+    v_tag TEXT;
+BEGIN
+    v_sql := 'SELECT p.id, p.product_code, p.product_name, p.price, p.stock_quantity,
+                     p.description, p.specifications, p.category, p.brand
+              FROM products_semantic p
+              WHERE p.is_cylinder';
+
+    IF cap IS NOT NULL THEN
+        v_sql := v_sql || ' AND p.cylinder_cap = $1';
+    END IF;
+
+    IF strok IS NOT NULL THEN
+        v_sql := v_sql || ' AND p.cylinder_strok = $2';
+    END IF;
+
+    -- Extra kontrolleri: tag ($7), olumsuz tag ($8, "yastıksız") veya ILIKE ($3..$6)
+    FOR i IN 1..4 LOOP
+        IF v_extras[i] IS NOT NULL THEN
+            v_tag := resolve_feature_tag(v_extras[i]);
+            IF v_tag IS NOT NULL THEN
+                v_tags := array_append(v_tags, v_tag);
+            ELSIF resolve_excluded_feature_tag(v_extras[i]) IS NOT NULL THEN
+                v_excluded := array_append(v_excluded, resolve_excluded_feature_tag(v_extras[i]));
+            ELSE
+                v_sql := v_sql || format(
+                    ' AND (p.product_name ILIKE ''%%'' || $%1$s || ''%%''
+                           OR p.description ILIKE ''%%'' || $%1$s || ''%%''
+                           OR p.specifications ILIKE ''%%'' || $%1$s || ''%%'')',
+                    i + 2
+                );
+            END IF;
+        END IF;
+    END LOOP;
+
+    IF cardinality(v_tags) > 0 THEN
+        v_sql := v_sql || ' AND p.feature_tags @> $7';
+    END IF;
+
+    IF cardinality(v_excluded) > 0 THEN
+        v_sql := v_sql || ' AND NOT (p.feature_tags && $8)';
+    END IF;
+
+    v_sql := v_sql || ' ORDER BY p.stock_quantity DESC';
+
+    RETURN QUERY EXECUTE v_sql USING cap, strok, extra1, extra2, extra3, extra4, v_tags, v_excluded;
+END;
+$$;
+
+-- valve_bul: aynı olumsuz extras desteği
+CREATE OR REPLACE FUNCTION valve_bul(
+    tip VARCHAR DEFAULT NULL,
+    baglanti_boyutu VARCHAR DEFAULT NULL,
+    extra1 TEXT DEFAULT NULL,
+    extra2 TEXT DEFAULT NULL,
+    extra3 TEXT DEFAULT NULL,
+    extra4 TEXT DEFAULT NULL
+)
+RETURNS TABLE(
+    id INTEGER,
+    product_code TEXT,
+    product_name TEXT,
+    price NUMERIC,
+    stock_quantity INTEGER,
+    description TEXT,
+    specifications TEXT,
+    category TEXT,
+    brand TEXT
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_sql TEXT;
+    v_extras TEXT[] := ARRAY[extra1, extra2, extra3, extra4];
+    v_tags TEXT[] := '{}';
+    v_excluded TEXT[] := '{}';
+    v_tag TEXT;
+BEGIN
+    v_sql := 'SELECT p.id, p.product_code, p.product_name, p.price, p.stock_quantity,
+                     p.description, p.specifications, p.category, p.brand
+              FROM products_semantic p
+              WHERE (p.category ILIKE ''%valf%'' OR p.category ILIKE ''%valve%'' OR
+                     p.product_name ILIKE ''%valf%'' OR p.product_name ILIKE ''%valve%'')
+                AND p.stock_quantity > 0';
+
+    -- Tip parametresi kontrolü (5/2, 3/2, vb.)
+    IF tip IS NOT NULL THEN
+        v_sql := v_sql || ' AND (p.product_name ~ $1 OR p.description ~ $1 OR p.specifications ~ $1)';
+    END IF;
+
+    -- Bağlantı boyutu kontrolü (1/4, 1/8, vb.)
+    IF baglanti_boyutu IS NOT NULL THEN
+        v_sql := v_sql || ' AND (p.product_name ~ $2 OR p.description ~ $2 OR p.specifications ~ $2)';
+    END IF;
+
+    -- Extra kontrolleri: tag ($7), olumsuz tag ($8, "yastıksız") veya ILIKE ($3..$6)
+    FOR i IN 1..4 LOOP
+        IF v_extras[i] IS NOT NULL THEN
+            v_tag := resolve_feature_tag(v_extras[i]);
+            IF v_tag IS NOT NULL THEN
+                v_tags := array_append(v_tags, v_tag);
+            ELSIF resolve_excluded_feature_tag(v_extras[i]) IS NOT NULL THEN
+                v_excluded := array_append(v_excluded, resolve_excluded_feature_tag(v_extras[i]));
+            ELSE
+                v_sql := v_sql || format(
+                    ' AND (p.product_name ILIKE ''%%'' || $%1$s || ''%%''
+                           OR p.description ILIKE ''%%'' || $%1$s || ''%%''
+                           OR p.specifications ILIKE ''%%'' || $%1$s || ''%%'')',
+                    i + 2
+                );
+            END IF;
+        END IF;
+    END LOOP;
+
+    IF cardinality(v_tags) > 0 THEN
+        v_sql := v_sql || ' AND p.feature_tags @> $7';
+    END IF;
+
+    IF cardinality(v_excluded) > 0 THEN
+        v_sql := v_sql || ' AND NOT (p.feature_tags && $8)';
+    END IF;
+
+    -- Relevance scoring
+    v_sql := v_sql || '
+        ORDER BY
+            CASE
+                WHEN $1 IS NOT NULL AND p.product_name ILIKE (''%'' || $1 || ''%'') THEN 1
+                WHEN $1 IS NOT NULL AND p.description ILIKE (''%'' || $1 || ''%'') THEN 2
+                ELSE 3
+            END,
+            CASE
+                WHEN $2 IS NOT NULL AND p.product_name ILIKE (''%'' || $2 || ''%'') THEN 1
+                WHEN $2 IS NOT NULL AND p.description ILIKE (''%'' || $2 || ''%'') THEN 2
+                ELSE 3
+            END,
+            p.stock_quantity DESC,
+            p.price ASC';
+
+    RETURN QUERY EXECUTE v_sql USING tip, baglanti_boyutu, extra1, extra2, extra3, extra4, v_tags, v_excluded;
+END;
+$$;
+
+COMMIT;
+
+-- Rollback script (for reference - save separately if needed)
+-- Functions: re-run the function definitions in migrations/007_feature_tags.sql
+-- BEGIN;
+-- DROP FUNCTION IF EXISTS resolve_excluded_feature_tag(TEXT);
+-- COMMIT;
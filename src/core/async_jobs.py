@@ -0,0 +1,175 @@
+"""
+Async Jobs - /process-message için asenkron mod
+İstek lane'e eklenir ve hemen 202 + job_id döner; Swarm cevabı hazır olunca
+bot'un callback URL'ine POST edilir (exponential backoff ile tekrar denenir).
+Job durumu /jobs/<job_id> ile sorgulanabilir
+"""
+
+import os
+import time
+import uuid
+import random
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional
+
+
+class AsyncJobManager:
+    """Job kayıtları + callback teslimi (sınırlı thread havuzu, tekrar denemeli)"""
+
+    def __init__(self, submit: Callable, callback_url: str = None, max_attempts: int = None,
+                 backoff_seconds: float = None, job_ttl_seconds: float = None, delivery_workers: int = None):
+        self.submit_fn = submit  # submit(message, whatsapp_number) -> Future (MessageDispatcher.submit)
+        self.callback_url = callback_url or os.getenv('SWARM_CALLBACK_URL', 'http://localhost:3001/swarm-callback')
+        self.callback_token = os.getenv('SWARM_CALLBACK_TOKEN', '')
+        self.max_attempts = max_attempts if max_attempts is not None else int(os.getenv('CALLBACK_MAX_ATTEMPTS', 5))
+        self.backoff_seconds = (backoff_seconds if backoff_seconds is not None
+                                else float(os.getenv('CALLBACK_BACKOFF_SECONDS', 1.0)))
+        self.job_ttl_seconds = (job_ttl_seconds if job_ttl_seconds is not None
+                                else float(os.getenv('ASYNC_JOB_TTL', 3600)))
+
+        workers = delivery_workers if delivery_workers is not None else int(os.getenv('CALLBACK_WORKERS', 4))
+        self._delivery_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="callback")
+        self._jobs = {}  # job_id -> job dict
+        self._lock = threading.Lock()
+        self._deliveries_in_flight = 0
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "delivered": 0,
+                       "delivery_failed": 0, "delivery_retries": 0}
+
+    def submit(self, message: str, whatsapp_number: str) -> Dict[str, Any]:
+        """Mesajı kuyruğa al ve job kaydını döndür (LaneFullError çağırana geçer)
+
+        Cevap her zaman yapılandırılmış SWARM_CALLBACK_URL'e gider - istekle gelen URL
+        kabul edilmez (SSRF, X-Callback-Token'ın yabancı adrese sızması)"""
+        self._prune_expired()
+
+        future = self.submit_fn(message, whatsapp_number)
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "whatsapp_number": whatsapp_number,
+            "status": "queued",
+            "created_at": time.time(),
+            "finished_at": None,
+            "response": None,
+            "error": None,
+            "callback_attempts": 0,
+            "callback_delivered": False,
+            "callback_error": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._stats["submitted"] += 1
+
+        future.add_done_callback(lambda f: self._on_done(job_id, f))
+        return self.get_job(job_id)
+
+    def _on_done(self, job_id: str, future):
+        """Lane worker thread'inde çalışır - teslimatı havuza bırak ki lane beklemesin"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["finished_at"] = time.time()
+            if future.exception() is None:
+                job["status"] = "completed"
+                job["response"] = str(future.result())
+                self._stats["completed"] += 1
+            else:
+                job["status"] = "failed"
+                job["error"] = str(future.exception())
+                self._stats["failed"] += 1
+            self._deliveries_in_flight += 1
+        self._delivery_executor.submit(self._deliver_tracked, job_id)
+
+    def _deliver_tracked(self, job_id: str):
+        try:
+            self._deliver(job_id)
+        finally:
+            with self._lock:
+                self._deliveries_in_flight -= 1
+
+    def _deliver(self, job_id: str):
+        """Callback POST - bağlantı hatası, 429 ve 5xx'te exponential backoff + jitter ile tekrar"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            url = self.callback_url
+            payload = {
+                "job_id": job_id,
+                "whatsapp_number": job["whatsapp_number"],
+                "success": job["status"] == "completed",
+                "response": job["response"],
+                "error": job["error"],
+            }
+
+        headers = {"X-Callback-Token": self.callback_token} if self.callback_token else {}
+        last_error = None
+        for attempt in range(1, self.max_attempts + 1):
+            with self._lock:
+                job["callback_attempts"] = attempt
+            try:
+                response = requests.post(url, json=payload, headers=headers, timeout=10)
+                if response.status_code < 400:
+                    with self._lock:
+                        job["callback_delivered"] = True
+                        job["callback_error"] = None
+                        self._stats["delivered"] += 1
+                    print(f"[CALLBACK] Job {job_id} delivered (attempt {attempt})")
+                    return
+                last_error = f"HTTP {response.status_code}"
+                if response.status_code != 429 and response.status_code < 500:
+                    break  # Kalıcı hata - tekrar deneme anlamsız
+            except requests.RequestException as e:
+                last_error = str(e)
+
+            if attempt < self.max_attempts:
+                delay = self.backoff_seconds * (2 ** (attempt - 1)) * (1 + random.random() * 0.25)
+                print(f"[CALLBACK] Job {job_id} attempt {attempt} failed ({last_error}), retry in {delay:.1f}s")
+                with self._lock:
+                    job["callback_error"] = last_error
+                    self._stats["delivery_retries"] += 1
+                time.sleep(delay)
+
+        with self._lock:
+            job["callback_error"] = last_error
+            self._stats["delivery_failed"] += 1
+        print(f"[CALLBACK] Job {job_id} delivery failed: {last_error}")
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job durumunun kopyası (/jobs/<job_id> için)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _prune_expired(self):
+        """TTL'i dolmuş bitmiş job'ları sil"""
+        cutoff = time.time() - self.job_ttl_seconds
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job["finished_at"] and job["finished_at"] < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def drain(self, timeout: float) -> bool:
+        """Bekleyen callback teslimlerinin bitmesini bekle - graceful shutdown için"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                in_flight = self._deliveries_in_flight
+            if in_flight == 0:
+                return True
+            time.sleep(0.1)
+        print(f"[CALLBACK] Drain timeout - {in_flight} deliveries unfinished")
+        return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["deliveries_in_flight"] = self._deliveries_in_flight
+            stats["pending"] = sum(1 for job in self._jobs.values() if job["finished_at"] is None)
+            stats["tracked_jobs"] = len(self._jobs)
+        stats["callback_url"] = self.callback_url
+        return stats
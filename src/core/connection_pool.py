@@ -0,0 +1,103 @@
+"""
+PostgreSQL Connection Pool - Thread-safe bağlantı havuzu
+Flask threaded=True altında her istek kendi bağlantısını alır ve geri verir
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any
+
+from psycopg2 import pool as pg_pool
+from psycopg2 import extensions as pg_extensions
+
+
+class ConnectionPool:
+    """ThreadedConnectionPool üzerine bekleme süresi metrikli, bloklayan checkout katmanı"""
+
+    def __init__(self, minconn: int = None, maxconn: int = None, timeout: float = None, **connect_kwargs):
+        self.minconn = minconn if minconn is not None else int(os.getenv('DB_POOL_MIN', 2))
+        self.maxconn = maxconn if maxconn is not None else int(os.getenv('DB_POOL_MAX', 10))
+        self.timeout = timeout if timeout is not None else float(os.getenv('DB_POOL_TIMEOUT', 5))
+
+        self._pool = pg_pool.ThreadedConnectionPool(self.minconn, self.maxconn, **connect_kwargs)
+
+        # psycopg2 havuzu doluyken beklemez, PoolError fırlatır - semaphore ile sıraya al
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "discarded": 0,
+            "in_use": 0,
+            "peak_in_use": 0,
+            "wait_total_ms": 0.0,
+            "wait_max_ms": 0.0
+        }
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        """Havuzdan bağlantı al; başarıda commit, hatada rollback yapıp geri ver"""
+        wait_timeout = self.timeout if timeout is None else timeout
+        wait_start = time.perf_counter()
+
+        if not self._slots.acquire(timeout=wait_timeout):
+            with self._stats_lock:
+                self._stats["timeouts"] += 1
+            raise pg_pool.PoolError(f"Connection pool exhausted (waited {wait_timeout}s, max={self.maxconn})")
+
+        waited_ms = (time.perf_counter() - wait_start) * 1000
+        try:
+            conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._stats_lock:
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self._stats["in_use"])
+            self._stats["wait_total_ms"] += waited_ms
+            self._stats["wait_max_ms"] = max(self._stats["wait_max_ms"], waited_ms)
+
+        discard = False
+        try:
+            yield conn
+            if not conn.closed:
+                conn.commit()
+        except Exception:
+            # Başarısız transaction bir sonraki isteğe sızmasın
+            try:
+                if not conn.closed:
+                    conn.rollback()
+            except Exception:
+                discard = True
+            raise
+        finally:
+            if conn.closed or conn.get_transaction_status() == pg_extensions.TRANSACTION_STATUS_UNKNOWN:
+                discard = True
+            self._pool.putconn(conn, close=discard)
+            with self._stats_lock:
+                self._stats["in_use"] -= 1
+                if discard:
+                    self._stats["discarded"] += 1
+            self._slots.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Havuz metrikleri - /db-status endpoint'i için"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        checkouts = stats["checkouts"]
+        stats["wait_avg_ms"] = round(stats["wait_total_ms"] / checkouts, 3) if checkouts else 0.0
+        stats["wait_total_ms"] = round(stats["wait_total_ms"], 3)
+        stats["wait_max_ms"] = round(stats["wait_max_ms"], 3)
+        stats["min_size"] = self.minconn
+        stats["max_size"] = self.maxconn
+        stats["timeout_seconds"] = self.timeout
+        return stats
+
+    def closeall(self):
+        """Tüm bağlantıları kapat"""
+        if not self._pool.closed:
+            self._pool.closeall()
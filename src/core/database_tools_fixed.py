@@ -6,12 +6,17 @@ Uses direct SQL queries instead of conflicting functions
 
 import os
 import psycopg2
+from contextlib import contextmanager
 from typing import Dict, List, Any
 from dotenv import load_dotenv
 import openai
 import json
 import time
 import locale
+import hashlib
+from connection_pool import ConnectionPool
+from extraction_cache import ExtractionCache
+from query_parsers import parse_cylinder_query, parse_valve_query, ParserStats, PARSER_MIN_CONFIDENCE
 
 # Load .env from project root
 env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.env')
@@ -45,13 +50,114 @@ def turkish_upper(text: str) -> str:
             result += char.upper()
     return result
 
+# LLM parametre çıkarma prompt'ları - metin değişirse PROMPT_VERSION da değişir ve cache geçersizleşir
+VALVE_PARAMS_PROMPT = """Aşağıdaki valf arama sorgusundan parametreleri çıkar.
+            
+Sorgu: "{query}"
+
+Çıkarman gereken parametreler:
+- tip: Valf tipi (5/2, 3/2, 5/3, 2/2 gibi kesirli sayılar) veya null
+- baglanti: Bağlantı boyutu (1/8, 1/4, 3/8, 1/2 gibi kesirli sayılar) veya null
+- extras: TÜM tanımlayıcı ifadeler listesi (maksimum 4 adet)
+
+KURALLAR:
+1. TİP ve BAĞLANTI HARİÇ her tanımlayıcı kelime extras'a gider
+2. Valf tanımlayıcı ifadeler: pnömatik, hidrolik, namur, paslanmaz, pirinç, alüminyum,
+   atex, ex-proof, yüksek basınç, vakum, hızlı, yavaş, manyetik, manuel, otomatik,
+   flanşlı, dişli, rakorlu, push-in, hortum, selenoid, bobin, pilot, kontrollü,
+   susturucu, egzoz, sessiz, yaylı, çift bobin, tek bobin, bistable, monostable, vs...
+3. Sıfat ve özellik belirten HER kelime tanımlayıcıdır
+4. TÜRKÇE EKLER HARIÇ: lı, li, lu, lü, lik, lık (bunlar kelime köküne aittir)
+
+Örnek dönüşümler:
+- "5/2 pnömatik valf 1/8" -> tip:"5/2", baglanti:"1/8", extras:["pnömatik"]
+- "3/2 namur paslanmaz valf" -> tip:"3/2", baglanti:null, extras:["namur","paslanmaz"]
+- "5/2 valf 1/4 selenoid kontrollü" -> tip:"5/2", baglanti:"1/4", extras:["selenoid","kontrollü"]
+- "atex sertifikalı 5/3 valf hidrolik" -> tip:"5/3", baglanti:null, extras:["atex","sertifikalı","hidrolik"]
+- "1/8 bağlantı 5/2 hızlı valf" -> tip:"5/2", baglanti:"1/8", extras:["hızlı"]
+
+ÇOK ÖNEMLİ: 
+- İlk kesirli sayı genelde TİP'tir (5/2, 3/2 gibi)
+- İkinci kesirli sayı veya "bağlantı" ile gelen kesir BAĞLANTI'dır
+- Diğer TÜM tanımlayıcı kelimeler extras'a ekle!
+
+Sadece JSON döndür, başka açıklama yapma."""
+
+CYLINDER_PARAMS_PROMPT = """Aşağıdaki silindir arama sorgusundan parametreleri çıkar.
+            
+Sorgu: "{query}"
+
+Çıkarman gereken parametreler:
+- cap (çap): Sayısal değer veya null
+- strok: Sayısal değer veya null  
+- extras: TÜM tanımlayıcı ifadeler listesi
+
+KURALLAR:
+1. ÇAP ve STROK HARİÇ her tanımlayıcı kelime extras'a gider
+2. Tanımlayıcı ifadeler: manyetik, yastık, yastıklı, sensör, sensörlü, mafsallı, bağlantı, çift etkili,
+   tek etkili, paslanmaz, flanşlı, vida, pnömatik, hidrolik, hızlı, krom,
+   döner, sabit, ayarlanabilir, kompakt, uzun, kısa, cushion, YAST, vs...
+3. Sıfat ve özellik belirten HER kelime tanımlayıcıdır
+4. TÜRKÇE EKLER HARIÇ: lık, lük, li, lı, lu, lü (sadece çap/strok ekleridir)
+
+Örnek dönüşümler:
+- "100 lük mafsal bağlantılı silindir" -> cap:100, strok:null, extras:["mafsal","bağlantılı"]
+- "100 çap silindir manyetik özellikli" -> cap:100, strok:null, extras:["manyetik"]
+- "63 çap çift etkili pnömatik silindir" -> cap:63, strok:null, extras:["çift","etkili","pnömatik"]
+- "100x200 paslanmaz silindir sensörlü" -> cap:100, strok:200, extras:["paslanmaz","sensörlü"]
+- "80 lük silindir flanşlı bağlantı vida" -> cap:80, strok:null, extras:["flanşlı","bağlantı","vida"]
+- "100 lük ISO silindir" -> cap:100, strok:null, extras:["ISO"]
+- "100x200 yastıklı silindir" -> cap:100, strok:200, extras:["yastıklı"]
+- "40x50 yastık silindir" -> cap:40, strok:50, extras:["yastık"]
+
+ÇOK ÖNEMLİ: 
+- Sayısal değerler dışında kalan HER tanımlayıcı kelimeyi extras'a ekle!
+- ANCAK Türkçe çap/strok eklerini (lık,lük,li,lı,lu,lü) extras'a EKLEME!
+
+Sadece JSON döndür, başka açıklama yapma:
+{{"cap": null_veya_sayi, "strok": null_veya_sayi, "extras": []}}"""
+
+VALVE_PROMPT_VERSION = hashlib.md5(VALVE_PARAMS_PROMPT.encode('utf-8')).hexdigest()[:8]
+CYLINDER_PROMPT_VERSION = hashlib.md5(CYLINDER_PARAMS_PROMPT.encode('utf-8')).hexdigest()[:8]
+
+# Genel aramada anlam taşımayan sohbet kelimeleri - tsquery'ye eklenmez
+FULLTEXT_NOISE_WORDS = {
+    'arıyorum', 'ariyorum', 'istiyorum', 'lazım', 'lazim', 'var', 'mı', 'mi', 'mu', 'mü',
+    'fiyat', 'fiyatı', 'fiyati', 'ne', 'kadar', 'ürün', 'urun', 'stokta', 'için', 'icin',
+    'bana', 'bir', 've', 'tane', 'adet'
+}
+
+def build_product_tsquery(query: str, operator: str = '&') -> str:
+    """
+    Kullanıcı cümlesini turkish_products config'i için tsquery metnine çevir.
+    Kelimeler prefix eşleşir (vana -> vanalar), ölçüler (1/2, 100x200, 63) sadece
+    ad/kod/kategori (A/B ağırlıklı) alanlarında aranır.
+    Örn: "paslanmaz küresel vana 1/2" -> "paslanmaz:* & küresel:* & vana:* & '1/2':AB"
+    """
+    import re
+    terms = []
+    for token in re.findall(r'\d+/\d+|\d+[xX]\d+|[^\W_]+', query.lower()):
+        if token in FULLTEXT_NOISE_WORDS or token in terms:
+            continue
+        if token[0].isdigit():
+            terms.append(f"'{token}':AB")
+        elif len(token) >= 2:
+            terms.append(f"{token}:*")
+    return f" {operator} ".join(terms)
+
 class DatabaseManager:
     """PostgreSQL bağlantı ve işlemler - Optimized for Task 3.2"""
     
     def __init__(self):
-        self.connection = None
+        self.pool = None
         self.connect()
         
+        # Kural tabanlı parser isabet / LLM fallback sayaçları
+        self.parser_stats = ParserStats()
+        
+        # LLM parametre çıkarma cache'i (bellek LRU + Postgres, migration 008)
+        self.extraction_cache = ExtractionCache(cursor_factory=self.get_cursor if self.pool else None)
+        
         # SQL fonksiyonlarını kontrol et ve yükle
         self.check_sql_functions()
         
@@ -65,27 +171,59 @@ class DatabaseManager:
         """SQL fonksiyonlarını kontrol et ve eksik olanları yükle"""
         try:
             from sql_functions_manager import SQLFunctionsManager
-            manager = SQLFunctionsManager(self.connection)
-            manager.check_and_load_all_functions()
+            with self.get_connection() as conn:
+                manager = SQLFunctionsManager(conn)
+                manager.check_and_load_all_functions()
         except Exception as e:
             print(f"[SQL WARNING] Fonksiyon kontrolü yapılamadı: {e}")
             # Hata olsa bile devam et
     
     def connect(self):
-        """Veritabanına bağlan"""
+        """Veritabanı bağlantı havuzunu oluştur (DB_POOL_MIN / DB_POOL_MAX / DB_POOL_TIMEOUT)"""
         try:
-            self.connection = psycopg2.connect(
+            self.pool = ConnectionPool(
                 host=os.getenv('DB_HOST', 'localhost'),
                 database=os.getenv('DB_NAME', 'eticaret_db'),
                 user=os.getenv('DB_USER', 'postgres'),
                 password=os.getenv('DB_PASSWORD', 'masterkey'),
                 port=os.getenv('DB_PORT', 5432)
             )
-            print("[DB] PostgreSQL bağlantısı başarılı")
+            print(f"[DB] PostgreSQL bağlantı havuzu hazır (min={self.pool.minconn}, max={self.pool.maxconn})")
             return True
         except Exception as e:
             print(f"[DB Error] {e}")
             return False
+
+    def close_pool(self):
+        """Havuzu kapat - fork öncesi master process'te (bağlantılar worker'lara miras kalmasın)"""
+        if self.pool:
+            self.pool.closeall()
+            self.pool = None
+            print("[DB] Connection pool closed")
+
+    @contextmanager
+    def get_connection(self):
+        """Havuzdan istek süresince bağlantı al - çıkışta commit/rollback ve iade"""
+        if not self.pool:
+            raise psycopg2.OperationalError("Database connection pool not initialized")
+        with self.pool.connection() as conn:
+            yield conn
+
+    @contextmanager
+    def get_cursor(self):
+        """Havuzdan alınan bağlantı üzerinde cursor aç ve iş bitince kapat"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Bağlantı havuzu metrikleri (checkout, bekleme süresi, timeout)"""
+        if not self.pool:
+            return {"status": "disconnected"}
+        return self.pool.get_stats()
     
     def find_numeric_values(self, product_name: str) -> Dict[str, int]:
         """Ürün adından çap ve strok değerlerini çıkar"""
@@ -100,90 +238,89 @@ class DatabaseManager:
             "strok": int(numbers[1])   # İkinci sayı = Strok  
         }
     
+    def _build_extras_filter(self, cursor, extras: List[str]):
+        """
+        Extras'ı feature_tag_synonyms sözlüğüyle (migration 007) canonical tag'lere çevir.
+        Sözlükteki extras tek "feature_tags @> %s" koşulu olur, olumsuzları ("yastıksız",
+        migration 010) "NOT feature_tags && %s" ile hariç tutulur, bilinmeyenler ILIKE'a düşer.
+        """
+        terms = [extra.strip() for extra in (extras or []) if extra and extra.strip()]
+        if not terms:
+            return "", []
+        
+        # valve_bul / find_cylinder_with_extras ile aynı çözümleme (tam synonym eşleşmesi)
+        cursor.execute(
+            "SELECT resolve_feature_tag(term), resolve_excluded_feature_tag(term) FROM unnest(%s::text[]) AS term",
+            (terms,))
+        resolved = cursor.fetchall()
+        
+        tags = []
+        excluded = []
+        conditions = []
+        params = []
+        for term, (tag, excluded_tag) in zip(terms, resolved):
+            if tag:
+                if tag not in tags:
+                    tags.append(tag)
+            elif excluded_tag:
+                if excluded_tag not in excluded:
+                    excluded.append(excluded_tag)
+            else:
+                pattern = f'%{turkish_upper(term)}%'
+                conditions.append("(product_name ILIKE %s OR description ILIKE %s OR specifications ILIKE %s)")
+                params.extend([pattern, pattern, pattern])
+        
+        if excluded:
+            conditions.insert(0, "NOT (feature_tags && %s::text[])")
+            params.insert(0, excluded)
+        if tags:
+            conditions.insert(0, "feature_tags @> %s::text[]")
+            params.insert(0, tags)
+        
+        return f"AND {' AND '.join(conditions)}", params
+    
     def find_cylinder_direct(self, cap: int = None, strok: int = None, extras: List[str] = None, limit: int = 100) -> List[Dict]:
         """Direct SQL implementation of find_cylinder with extra specifications support"""
-        if not self.connection:
+        if not self.pool:
             return []
         
         try:
-            cursor = self.connection.cursor()
-            
-            # Build extra specifications filter
-            extra_conditions = []
-            extra_params = []
-            
-            if extras and isinstance(extras, list):
-                for extra in extras:
-                    if extra and extra.strip():
-                        # Normalize extra specification
-                        extra_norm = extra.strip().lower()
-                        
-                        # Map common terms with comprehensive search patterns
-                        if extra_norm in ['magnet', 'manyetik', 'magnetik', 'mag', 'manyetık', 'magnetli', 'manyetikli']:
-                            search_terms = ['%MAG%', '%MANYET%', '%MAGNET%', '%MANYETIK%', '%MAGNETIK%']
-                        elif extra_norm in ['yastık', 'yastik', 'cushion', 'yastıklı', 'yastikli']:
-                            search_terms = ['%YAST%', '%CUSHION%', '%YASTIK%']
-                        elif extra_norm in ['sensör', 'sensor', 'sens', 'sensörlü', 'sensorlu']:
-                            search_terms = ['%SENS%', '%SENSOR%', '%SENSÖR%']
-                        elif extra_norm in ['mil', 'rod', 'milli']:
-                            search_terms = ['%MIL%', '%ROD%']
-                        else:
-                            # Generic search for any extra term - try both original and uppercase
-                            search_terms = [f'%{extra_norm.upper()}%', f'%{extra.upper()}%']
-                        
-                        # Add OR conditions for this extra specification
-                        term_conditions = []
-                        for term in search_terms:
-                            term_conditions.extend([
-                                "product_name ILIKE %s",
-                                "description ILIKE %s",
-                                "specifications ILIKE %s"
-                            ])
-                            extra_params.extend([term, term, term])
-                        
-                        if term_conditions:
-                            extra_conditions.append(f"({' OR '.join(term_conditions)})")
-            
-            # Direct SQL query with number extraction and extra specifications
-            extra_where_clause = ""
-            if extra_conditions:
-                extra_where_clause = f"AND ({' AND '.join(extra_conditions)})"
-            
-            sql = f"""
-            WITH number_extract AS (
-                SELECT 
-                  id, product_code, product_name, price, stock_quantity,
-                  description, specifications, category, brand,
-                  -- Extract first two numbers from product name
-                  CASE WHEN length((string_to_array(regexp_replace(regexp_replace(product_name, '[^0-9]+', ' ', 'g'), '^ +| +$', '', 'g'), ' '))[1]) <= 4 
-                       THEN (string_to_array(regexp_replace(regexp_replace(product_name, '[^0-9]+', ' ', 'g'), '^ +| +$', '', 'g'), ' '))[1]::INT 
-                       ELSE NULL END AS first_num,
-                  CASE WHEN length((string_to_array(regexp_replace(regexp_replace(product_name, '[^0-9]+', ' ', 'g'), '^ +| +$', '', 'g'), ' '))[2]) <= 4 
-                       THEN (string_to_array(regexp_replace(regexp_replace(product_name, '[^0-9]+', ' ', 'g'), '^ +| +$', '', 'g'), ' '))[2]::INT 
-                       ELSE NULL END AS second_num
+            # Precomputed dimension columns (migration 004) - index lookup instead of per-row regexp
+            # Ölçü filtresi sadece değer verildiğinde eklenir ki idx_products_cylinder_dims kullanılsın
+            dimension_conditions = []
+            dimension_params = []
+            if cap is not None:
+                dimension_conditions.append("cylinder_cap = %s")
+                dimension_params.append(cap)
+            if strok is not None:
+                dimension_conditions.append("cylinder_strok = %s")
+                dimension_params.append(strok)
+            
+            dimension_where_clause = ""
+            if dimension_conditions:
+                dimension_where_clause = f"AND {' AND '.join(dimension_conditions)}"
+            
+            with self.get_cursor() as cursor:
+                extra_where_clause, extra_params = self._build_extras_filter(cursor, extras)
+                
+                sql = f"""
+                SELECT id, product_code, product_name, price, 
+                       stock_quantity, description, specifications, 
+                       category, brand, cylinder_cap, cylinder_strok
                 FROM products_semantic
                 WHERE 
-                  (product_name ILIKE %s OR product_name ILIKE %s)
-                  AND regexp_replace(product_name, '[^0-9]+', ' ', 'g') ~ '[0-9]'
-                  {extra_where_clause}
-            )
-            SELECT id, product_code, product_name, price, 
-                   stock_quantity, description, specifications, 
-                   category, brand, first_num, second_num
-            FROM number_extract
-            WHERE 
-                (%s IS NULL OR first_num = %s)
-                AND (%s IS NULL OR second_num = %s)
-            ORDER BY stock_quantity DESC
-            LIMIT %s
-            """
-            
-            # Combine all parameters
-            all_params = ['%SIL%', '%SİL%'] + extra_params + [cap, cap, strok, strok, limit]
-            
-            cursor.execute(sql, all_params)
-            results = cursor.fetchall()
-            cursor.close()
+                    is_cylinder
+                    {dimension_where_clause}
+                    {extra_where_clause}
+                ORDER BY stock_quantity DESC
+                LIMIT %s
+                """
+                
+                # Combine all parameters
+                all_params = dimension_params + extra_params + [limit]
+                
+                cursor.execute(sql, all_params)
+                results = cursor.fetchall()
             
             # Format results
             products = []
@@ -220,11 +357,10 @@ class DatabaseManager:
     
     def find_products_by_price_direct(self, min_price: float = 0, max_price: float = 999999, limit: int = 50) -> List[Dict]:
         """Direct price range search"""
-        if not self.connection:
+        if not self.pool:
             return []
         
         try:
-            cursor = self.connection.cursor()
             sql = """
             SELECT id, product_code, product_name, price, stock_quantity,
                    description, specifications, category, brand
@@ -234,9 +370,9 @@ class DatabaseManager:
             LIMIT %s
             """
             
-            cursor.execute(sql, (min_price, max_price, limit))
-            results = cursor.fetchall()
-            cursor.close()
+            with self.get_cursor() as cursor:
+                cursor.execute(sql, (min_price, max_price, limit))
+                results = cursor.fetchall()
             
             products = []
             for row in results:
@@ -260,19 +396,18 @@ class DatabaseManager:
     
     def find_similar_products_direct(self, product_code: str, limit: int = 10) -> List[Dict]:
         """Direct similar products search"""
-        if not self.connection:
+        if not self.pool:
             return []
         
         try:
-            cursor = self.connection.cursor()
-            
             # Get target product info
-            cursor.execute("""
-                SELECT category, brand FROM products_semantic 
-                WHERE product_code = %s LIMIT 1
-            """, (product_code,))
+            with self.get_cursor() as cursor:
+                cursor.execute("""
+                    SELECT category, brand FROM products_semantic 
+                    WHERE product_code = %s LIMIT 1
+                """, (product_code,))
+                target_row = cursor.fetchone()
             
-            target_row = cursor.fetchone()
             if not target_row:
                 return []
             
@@ -295,10 +430,10 @@ class DatabaseManager:
             LIMIT %s
             """
             
-            cursor.execute(sql, (product_code, target_category, target_brand, 
-                                target_category, target_brand, target_category, limit))
-            results = cursor.fetchall()
-            cursor.close()
+            with self.get_cursor() as cursor:
+                cursor.execute(sql, (product_code, target_category, target_brand, 
+                                    target_category, target_brand, target_category, limit))
+                results = cursor.fetchall()
             
             products = []
             for row in results:
@@ -322,12 +457,10 @@ class DatabaseManager:
     
     def search_products_smart_direct(self, search_term: str, limit: int = 50) -> List[Dict]:
         """Direct smart search implementation"""
-        if not self.connection:
+        if not self.pool:
             return []
         
         try:
-            cursor = self.connection.cursor()
-            
             # Direkt ürün kodu araması için önce exact match kontrol et
             exact_match_sql = """
             SELECT product_code, product_name,
@@ -339,8 +472,9 @@ class DatabaseManager:
             GROUP BY product_code, product_name, description, specifications, category, brand
             """
 
-            cursor.execute(exact_match_sql, (search_term,))
-            exact_results = cursor.fetchall()
+            with self.get_cursor() as cursor:
+                cursor.execute(exact_match_sql, (search_term,))
+                exact_results = cursor.fetchall()
 
             if exact_results:
                 # Exact match bulundu - tek ürün olarak döndür
@@ -363,6 +497,8 @@ class DatabaseManager:
                 return products
 
             # Exact match yok, normal arama yap
+            # Her OR kolu kendi trigram GIN index'ine sahip (migration 005) -> BitmapOr,
+            # tek bir index'siz kolon bile tüm sorguyu seq scan'e düşürür
             sql = """
             SELECT id, product_code, product_name, price, stock_quantity,
                    description, specifications, category, brand
@@ -380,9 +516,9 @@ class DatabaseManager:
 
             pattern = f'%{search_term}%'
             exact_code_pattern = search_term  # For exact code match priority
-            cursor.execute(sql, (pattern, pattern, pattern, pattern, exact_code_pattern, limit))
-            results = cursor.fetchall()
-            cursor.close()
+            with self.get_cursor() as cursor:
+                cursor.execute(sql, (pattern, pattern, pattern, pattern, exact_code_pattern, limit))
+                results = cursor.fetchall()
 
             products = []
             for row in results:
@@ -410,9 +546,60 @@ class DatabaseManager:
             print(f"[DB Error] search_products_smart_direct: {e}")
             return []
     
+    def search_products_fulltext(self, query: str, limit: int = 50) -> List[Dict]:
+        """Ranked Turkish full-text search on search_tsv (migration 006)"""
+        if not self.pool:
+            return []
+        
+        try:
+            sql = """
+            WITH q AS (SELECT to_tsquery('turkish_products', %s) AS tsq)
+            SELECT p.id, p.product_code, p.product_name, p.price, p.stock_quantity,
+                   p.description, p.specifications, p.category, p.brand,
+                   ts_rank('{0.1, 0.2, 0.4, 1.0}', p.search_tsv, q.tsq) AS rank
+            FROM products_semantic p, q
+            WHERE p.search_tsv @@ q.tsq
+            ORDER BY rank DESC, p.stock_quantity DESC
+            LIMIT %s
+            """
+            
+            # Önce tüm terimler (AND), sonuç yoksa herhangi biri (OR) - sıralamayı ts_rank belirler
+            results = []
+            for operator in ('&', '|'):
+                tsquery = build_product_tsquery(query, operator)
+                if not tsquery:
+                    return []
+                with self.get_cursor() as cursor:
+                    cursor.execute(sql, (tsquery, limit))
+                    results = cursor.fetchall()
+                if results:
+                    print(f"[DB] Full-text tsquery: {tsquery} -> {len(results)} results")
+                    break
+            
+            products = []
+            for row in results:
+                products.append({
+                    'id': row[0],
+                    'product_code': row[1],
+                    'product_name': row[2],
+                    'price': float(row[3]) if row[3] else 0.0,
+                    'stock_quantity': int(row[4]) if row[4] else 0,
+                    'description': row[5] or '',
+                    'specifications': row[6] or '',
+                    'category': row[7] or '',
+                    'brand': row[8] or '',
+                    'rank': float(row[9]) if row[9] else 0.0
+                })
+            
+            return products
+            
+        except Exception as e:
+            print(f"[DB Error] search_products_fulltext: {e}")
+            return []
+    
     def search_products_optimized(self, query: str) -> Dict[str, Any]:
         """Enhanced search using direct SQL - Task 3.2 optimized"""
-        if not self.connection:
+        if not self.pool:
             return {"error": "Database connection failed", "count": 0, "products": []}
         
         try:
@@ -422,8 +609,8 @@ class DatabaseManager:
             if 'silindir' in query.lower():
                 print(f"[DB] Cylinder search detected: '{query}'")
                 
-                # Extract parameters using AI
-                params = self.extract_cylinder_params_with_ai(query)
+                # Extract parameters (rule-based fast path, AI fallback)
+                params = self.extract_cylinder_params(query)
                 cap = params.get('cap')
                 strok = params.get('strok')
                 extras = params.get('extras', [])
@@ -436,8 +623,6 @@ class DatabaseManager:
                 if is_stock_filter:
                     # Use SQL find_cylinder_in_stock with extras
                     print(f"[DB] Using SQL find_cylinder_in_stock with extras")
-                    cursor = self.connection.cursor()
-                    
                     # Use extras directly but convert to Turkish uppercase for database matching
                     sql_extras = [turkish_upper(extra) for extra in extras] if extras else []
                     
@@ -445,10 +630,10 @@ class DatabaseManager:
                     while len(sql_extras) < 4:
                         sql_extras.append(None)
                     
-                    cursor.execute("SELECT * FROM find_cylinder_with_extras(%s, %s, %s, %s, %s, %s) WHERE stock_quantity >= %s", 
-                                 (cap, strok, sql_extras[0], sql_extras[1], sql_extras[2], sql_extras[3], 1))
-                    sql_results = cursor.fetchall()
-                    cursor.close()
+                    with self.get_cursor() as cursor:
+                        cursor.execute("SELECT * FROM find_cylinder_with_extras(%s, %s, %s, %s, %s, %s) WHERE stock_quantity >= %s", 
+                                     (cap, strok, sql_extras[0], sql_extras[1], sql_extras[2], sql_extras[3], 1))
+                        sql_results = cursor.fetchall()
                     
                     # Format SQL results
                     products_data = []
@@ -468,8 +653,6 @@ class DatabaseManager:
                 else:
                     # Use SQL find_cylinder with extras for regular searches
                     print(f"[DB] Using SQL find_cylinder with extras")
-                    cursor = self.connection.cursor()
-                    
                     # Use extras directly but convert to Turkish uppercase for database matching
                     sql_extras = [turkish_upper(extra) for extra in extras] if extras else []
                     
@@ -477,10 +660,10 @@ class DatabaseManager:
                     while len(sql_extras) < 4:
                         sql_extras.append(None)
                     
-                    cursor.execute("SELECT * FROM find_cylinder_with_extras(%s, %s, %s, %s, %s, %s)", 
-                                 (cap, strok, sql_extras[0], sql_extras[1], sql_extras[2], sql_extras[3]))
-                    sql_results = cursor.fetchall()
-                    cursor.close()
+                    with self.get_cursor() as cursor:
+                        cursor.execute("SELECT * FROM find_cylinder_with_extras(%s, %s, %s, %s, %s, %s)", 
+                                     (cap, strok, sql_extras[0], sql_extras[1], sql_extras[2], sql_extras[3]))
+                        sql_results = cursor.fetchall()
                     
                     # Format SQL results  
                     products_data = []
@@ -528,17 +711,32 @@ class DatabaseManager:
                 }
             else:
                 # General search
-                products = self.search_products_smart_direct(query, 50)
+                # Tek kelime (ürün kodu vb.) -> exact match + trigram ILIKE
+                # Çok kelimeli cümle -> ranked full-text, bulunamazsa ILIKE'a düş
+                if len(query.split()) > 1:
+                    products = self.search_products_fulltext(query, 50)
+                    algorithm = "Turkish Full-Text Search"
+                    if not products:
+                        products = self.search_products_smart_direct(query, 50)
+                        algorithm = "Direct SQL General Search"
+                else:
+                    products = self.search_products_smart_direct(query, 50)
+                    algorithm = "Direct SQL General Search"
                 
                 formatted_products = []
                 for p in products:
-                    formatted_products.append({
+                    formatted_product = {
                         "code": p['product_code'],
                         "name": p['product_name'], 
                         "price": int(p['price']),
                         "stock": p['stock_quantity'],
                         "description": p['description']
-                    })
+                    }
+                    # Direkt ürün kodu akışı için exact match bilgisini koru
+                    for field in ['is_exact_match', 'price_range']:
+                        if field in p and p[field] is not None:
+                            formatted_product[field] = p[field]
+                    formatted_products.append(formatted_product)
                 
                 processing_time = time.time() - start_time
                 print(f"[DB] General search completed in {processing_time:.3f}s - {len(formatted_products)} products")
@@ -548,7 +746,7 @@ class DatabaseManager:
                     "count": len(formatted_products),
                     "products": formatted_products,
                     "query": query,
-                    "algorithm": "Direct SQL General Search",
+                    "algorithm": algorithm,
                     "processing_time": processing_time
                 }
                 
@@ -562,43 +760,32 @@ class DatabaseManager:
                 "processing_time": processing_time
             }
     
+    def extract_valve_params(self, query: str) -> Dict[str, Any]:
+        """Önce kural tabanlı parser - güven skoru düşükse AI ile çıkar"""
+        params = parse_valve_query(query)
+        if params['confidence'] >= PARSER_MIN_CONFIDENCE:
+            self.parser_stats.record('valve', hit=True)
+            print(f"[PARSER] Valve rule hit (confidence={params['confidence']}): {params}")
+            return params
+        
+        self.parser_stats.record('valve', hit=False)
+        print(f"[PARSER] Valve low confidence ({params['confidence']}) - falling back to AI")
+        return self.extract_valve_params_with_ai(query)
+    
     def extract_valve_params_with_ai(self, query: str) -> Dict[str, Any]:
         """AI kullanarak valf parametrelerini çıkar"""
+        model = os.getenv('OPENROUTER_MODEL', 'openai/gpt-4o-mini')
+        cache_key = self.extraction_cache.make_key('valve', query, VALVE_PROMPT_VERSION, model)
+        cached = self.extraction_cache.get(cache_key)
+        if cached is not None:
+            print(f"[LLM CACHE] Valve params cache hit: {cached}")
+            return cached
+        
         try:
-            prompt = f"""Aşağıdaki valf arama sorgusundan parametreleri çıkar.
-            
-Sorgu: "{query}"
-
-Çıkarman gereken parametreler:
-- tip: Valf tipi (5/2, 3/2, 5/3, 2/2 gibi kesirli sayılar) veya null
-- baglanti: Bağlantı boyutu (1/8, 1/4, 3/8, 1/2 gibi kesirli sayılar) veya null
-- extras: TÜM tanımlayıcı ifadeler listesi (maksimum 4 adet)
-
-KURALLAR:
-1. TİP ve BAĞLANTI HARİÇ her tanımlayıcı kelime extras'a gider
-2. Valf tanımlayıcı ifadeler: pnömatik, hidrolik, namur, paslanmaz, pirinç, alüminyum,
-   atex, ex-proof, yüksek basınç, vakum, hızlı, yavaş, manyetik, manuel, otomatik,
-   flanşlı, dişli, rakorlu, push-in, hortum, selenoid, bobin, pilot, kontrollü,
-   susturucu, egzoz, sessiz, yaylı, çift bobin, tek bobin, bistable, monostable, vs...
-3. Sıfat ve özellik belirten HER kelime tanımlayıcıdır
-4. TÜRKÇE EKLER HARIÇ: lı, li, lu, lü, lik, lık (bunlar kelime köküne aittir)
-
-Örnek dönüşümler:
-- "5/2 pnömatik valf 1/8" -> tip:"5/2", baglanti:"1/8", extras:["pnömatik"]
-- "3/2 namur paslanmaz valf" -> tip:"3/2", baglanti:null, extras:["namur","paslanmaz"]
-- "5/2 valf 1/4 selenoid kontrollü" -> tip:"5/2", baglanti:"1/4", extras:["selenoid","kontrollü"]
-- "atex sertifikalı 5/3 valf hidrolik" -> tip:"5/3", baglanti:null, extras:["atex","sertifikalı","hidrolik"]
-- "1/8 bağlantı 5/2 hızlı valf" -> tip:"5/2", baglanti:"1/8", extras:["hızlı"]
-
-ÇOK ÖNEMLİ: 
-- İlk kesirli sayı genelde TİP'tir (5/2, 3/2 gibi)
-- İkinci kesirli sayı veya "bağlantı" ile gelen kesir BAĞLANTI'dır
-- Diğer TÜM tanımlayıcı kelimeler extras'a ekle!
-
-Sadece JSON döndür, başka açıklama yapma."""
+            prompt = VALVE_PARAMS_PROMPT.format(query=query)
 
             response = self.openai_client.chat.completions.create(
-                model=os.getenv('OPENROUTER_MODEL', 'openai/gpt-4o-mini'),
+                model=model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0
             )
@@ -618,7 +805,9 @@ Sadece JSON döndür, başka açıklama yapma."""
             # Varsayılan değerler
             if 'extras' not in params:
                 params['extras'] = []
-                
+            
+            # Sadece başarılı cevaplar cache'lenir - hata fallback'i bir sonraki istekte tekrar denenir
+            self.extraction_cache.set(cache_key, params, kind='valve', query=query)
             return params
             
         except Exception as e:
@@ -630,45 +819,40 @@ Sadece JSON döndür, başka açıklama yapma."""
                 "extras": []
             }
     
+    def extract_cylinder_params(self, query: str) -> Dict[str, Any]:
+        """Önce kural tabanlı parser - güven skoru düşükse AI ile çıkar"""
+        params = parse_cylinder_query(query)
+        if params['confidence'] >= PARSER_MIN_CONFIDENCE:
+            self.parser_stats.record('cylinder', hit=True)
+            print(f"[PARSER] Cylinder rule hit (confidence={params['confidence']}): {params}")
+            return params
+        
+        self.parser_stats.record('cylinder', hit=False)
+        print(f"[PARSER] Cylinder low confidence ({params['confidence']}) - falling back to AI")
+        return self.extract_cylinder_params_with_ai(query)
+    
+    def get_parser_stats(self) -> Dict[str, Any]:
+        """Kural tabanlı parser isabet oranı ve tasarruf edilen LLM çağrıları"""
+        return self.parser_stats.get_stats()
+    
+    def get_extraction_cache_stats(self) -> Dict[str, Any]:
+        """LLM parametre çıkarma cache'i hit oranı"""
+        return self.extraction_cache.get_stats()
+    
     def extract_cylinder_params_with_ai(self, query: str) -> Dict[str, Any]:
         """AI kullanarak silindir parametrelerini çıkar"""
+        model = os.getenv('OPENROUTER_MODEL', 'openai/gpt-4o-mini')
+        cache_key = self.extraction_cache.make_key('cylinder', query, CYLINDER_PROMPT_VERSION, model)
+        cached = self.extraction_cache.get(cache_key)
+        if cached is not None:
+            print(f"[LLM CACHE] Cylinder params cache hit: {cached}")
+            return cached
+        
         try:
-            prompt = f"""Aşağıdaki silindir arama sorgusundan parametreleri çıkar.
-            
-Sorgu: "{query}"
-
-Çıkarman gereken parametreler:
-- cap (çap): Sayısal değer veya null
-- strok: Sayısal değer veya null  
-- extras: TÜM tanımlayıcı ifadeler listesi
-
-KURALLAR:
-1. ÇAP ve STROK HARİÇ her tanımlayıcı kelime extras'a gider
-2. Tanımlayıcı ifadeler: manyetik, yastık, yastıklı, sensör, sensörlü, mafsallı, bağlantı, çift etkili,
-   tek etkili, paslanmaz, flanşlı, vida, pnömatik, hidrolik, hızlı, krom,
-   döner, sabit, ayarlanabilir, kompakt, uzun, kısa, cushion, YAST, vs...
-3. Sıfat ve özellik belirten HER kelime tanımlayıcıdır
-4. TÜRKÇE EKLER HARIÇ: lık, lük, li, lı, lu, lü (sadece çap/strok ekleridir)
-
-Örnek dönüşümler:
-- "100 lük mafsal bağlantılı silindir" -> cap:100, strok:null, extras:["mafsal","bağlantılı"]
-- "100 çap silindir manyetik özellikli" -> cap:100, strok:null, extras:["manyetik"]
-- "63 çap çift etkili pnömatik silindir" -> cap:63, strok:null, extras:["çift","etkili","pnömatik"]
-- "100x200 paslanmaz silindir sensörlü" -> cap:100, strok:200, extras:["paslanmaz","sensörlü"]
-- "80 lük silindir flanşlı bağlantı vida" -> cap:80, strok:null, extras:["flanşlı","bağlantı","vida"]
-- "100 lük ISO silindir" -> cap:100, strok:null, extras:["ISO"]
-- "100x200 yastıklı silindir" -> cap:100, strok:200, extras:["yastıklı"]
-- "40x50 yastık silindir" -> cap:40, strok:50, extras:["yastık"]
-
-ÇOK ÖNEMLİ: 
-- Sayısal değerler dışında kalan HER tanımlayıcı kelimeyi extras'a ekle!
-- ANCAK Türkçe çap/strok eklerini (lık,lük,li,lı,lu,lü) extras'a EKLEME!
-
-Sadece JSON döndür, başka açıklama yapma:
-{{"cap": null_veya_sayi, "strok": null_veya_sayi, "extras": []}}"""
+            prompt = CYLINDER_PARAMS_PROMPT.format(query=query)
 
             response = self.openai_client.chat.completions.create(
-                model=os.getenv('OPENROUTER_MODEL', 'openai/gpt-4o-mini'),
+                model=model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0
             )
@@ -687,7 +871,9 @@ Sadece JSON döndür, başka açıklama yapma:
             # Varsayılan değerler
             if 'extras' not in params:
                 params['extras'] = []
-                
+            
+            # Sadece başarılı cevaplar cache'lenir - hata fallback'i bir sonraki istekte tekrar denenir
+            self.extraction_cache.set(cache_key, params, kind='cylinder', query=query)
             return params
             
         except Exception as e:
@@ -701,19 +887,18 @@ Sadece JSON döndür, başka açıklama yapma:
     
     def get_stock_info(self, product_code: str) -> Dict[str, Any]:
         """Stok bilgisi al - Task 3.2 optimized"""
-        if not self.connection:
+        if not self.pool:
             return {"error": "Database connection failed"}
         
         try:
-            cursor = self.connection.cursor()
             sql = """
             SELECT product_code, product_name, stock_quantity, price
             FROM products_semantic 
             WHERE product_code = %s
             """
-            cursor.execute(sql, (product_code,))
-            row = cursor.fetchone()
-            cursor.close()
+            with self.get_cursor() as cursor:
+                cursor.execute(sql, (product_code,))
+                row = cursor.fetchone()
             
             if row:
                 return {
@@ -743,19 +928,19 @@ Sadece JSON döndür, başka açıklama yapma:
     def get_connection_status(self) -> Dict[str, Any]:
         """Get connection status for validation"""
         try:
-            if not self.connection:
+            if not self.pool:
                 return {"status": "disconnected", "error": "No connection"}
             
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT 1")
-            cursor.fetchone()
-            cursor.close()
+            with self.get_cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
             
             return {
                 "status": "connected",
                 "host": os.getenv('DB_HOST', 'localhost'),
                 "port": os.getenv('DB_PORT', 5432),
-                "database": os.getenv('DB_NAME', 'eticaret_db')
+                "database": os.getenv('DB_NAME', 'eticaret_db'),
+                "pool": self.get_pool_stats()
             }
             
         except Exception as e:
@@ -819,9 +1004,9 @@ Sadece JSON döndür, başka açıklama yapma:
         return results
     
     def __del__(self):
-        """Bağlantıyı kapat"""
-        if self.connection:
-            self.connection.close()
+        """Havuzdaki bağlantıları kapat"""
+        if self.pool:
+            self.pool.closeall()
 
 # Global database instance for Task 3.2
 db = DatabaseManager()
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""
+LLM Extraction Cache - LLM parametre çıkarma sonuçları için LRU + TTL cache
+temperature=0 olduğundan aynı sorgu + prompt + model her zaman aynı sonucu verir.
+İki katman: process içi LRU (OrderedDict) ve restart'tan sağ çıkan Postgres
+tablosu (migration 008, LLM_CACHE_BACKEND=postgres)
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional
+
+
+def normalize_query(query: str) -> str:
+    """Cache anahtarı için sorgu normalizasyonu: Türkçe küçük harf, tek boşluk, sondaki noktalama yok"""
+    text = (query or '').replace('I', 'ı').replace('İ', 'i').lower()
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text.rstrip('?!.,;: ')
+
+
+class ExtractionCache:
+    """Bellek içi LRU katmanı + opsiyonel Postgres katmanı, TTL ve boyut sınırlı"""
+
+    # Postgres katmanında her N yazmada bir süresi dolmuş / fazla satırları temizle
+    PRUNE_EVERY_WRITES = 100
+
+    def __init__(self, cursor_factory: Callable = None, max_size: int = None, ttl_seconds: float = None,
+                 persistent_max_size: int = None, backend: str = None):
+        self.max_size = max_size if max_size is not None else int(os.getenv('LLM_CACHE_SIZE', 1000))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('LLM_CACHE_TTL', 7 * 24 * 3600))
+        self.persistent_max_size = (persistent_max_size if persistent_max_size is not None
+                                    else int(os.getenv('LLM_CACHE_PERSIST_MAX', 50000)))
+        self.backend = (backend or os.getenv('LLM_CACHE_BACKEND', 'postgres')).lower()
+
+        # cursor_factory: DatabaseManager.get_cursor gibi bir context manager
+        self._cursor_factory = cursor_factory if self.backend == 'postgres' else None
+
+        self._entries = OrderedDict()  # key -> (expires_at, result_json)
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self._stats = {
+            "memory_hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "expired": 0,
+            "persistent_errors": 0
+        }
+
+    @staticmethod
+    def make_key(kind: str, query: str, prompt_version: str, model: str) -> str:
+        """kind (cylinder/valve) + prompt/model versiyonu + normalize sorgu"""
+        raw = f"{kind}|{prompt_version}|{model}|{normalize_query(query)}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _count(self, stat: str):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def _store_memory(self, key: str, expires_at: float, result_json: str):
+        with self._lock:
+            self._entries[key] = (expires_at, result_json)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Sonucu döndür (her çağrıda yeni kopya) veya None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return json.loads(entry[1])
+                del self._entries[key]
+                self._stats["expired"] += 1
+
+        if self._cursor_factory:
+            try:
+                with self._cursor_factory() as cursor:
+                    cursor.execute("""
+                        UPDATE llm_extraction_cache
+                        SET hit_count = hit_count + 1, last_hit_at = NOW()
+                        WHERE cache_key = %s AND expires_at > NOW()
+                        RETURNING result::text, EXTRACT(EPOCH FROM expires_at)
+                    """, (key,))
+                    row = cursor.fetchone()
+                if row:
+                    self._store_memory(key, float(row[1]), row[0])
+                    self._count("persistent_hits")
+                    return json.loads(row[0])
+            except Exception as e:
+                print(f"[LLM CACHE] Persistent read error: {e}")
+                self._count("persistent_errors")
+
+        self._count("misses")
+        return None
+
+    def set(self, key: str, result: Dict[str, Any], kind: str = None, query: str = None):
+        """Sonucu iki katmana da yaz"""
+        result_json = json.dumps(result, ensure_ascii=False)
+        expires_at = time.time() + self.ttl_seconds
+        self._store_memory(key, expires_at, result_json)
+
+        with self._lock:
+            self._stats["writes"] += 1
+            self._writes_since_prune += 1
+            prune = self._writes_since_prune >= self.PRUNE_EVERY_WRITES
+            if prune:
+                self._writes_since_prune = 0
+
+        if not self._cursor_factory:
+            return
+
+        try:
+            with self._cursor_factory() as cursor:
+                cursor.execute("""
+                    INSERT INTO llm_extraction_cache (cache_key, kind, query, result, expires_at)
+                    VALUES (%s, %s, %s, %s::jsonb, TO_TIMESTAMP(%s))
+                    ON CONFLICT (cache_key) DO UPDATE
+                    SET result = EXCLUDED.result, expires_at = EXCLUDED.expires_at, last_hit_at = NOW()
+                """, (key, kind, normalize_query(query) if query else None, result_json, expires_at))
+                if prune:
+                    self._prune_persistent(cursor)
+        except Exception as e:
+            print(f"[LLM CACHE] Persistent write error: {e}")
+            self._count("persistent_errors")
+
+    def _prune_persistent(self, cursor):
+        """Süresi dolanları ve en az kullanılan fazla satırları sil"""
+        cursor.execute("""
+            DELETE FROM llm_extraction_cache
+            WHERE expires_at <= NOW()
+               OR cache_key IN (
+                   SELECT cache_key FROM llm_extraction_cache
+                   ORDER BY last_hit_at DESC
+                   OFFSET %s
+               )
+        """, (self.persistent_max_size,))
+        if cursor.rowcount:
+            print(f"[LLM CACHE] Pruned {cursor.rowcount} persistent entries")
+
+    def clear(self):
+        """Bellek katmanını temizle (Postgres katmanı TTL ile kendiliğinden temizlenir)"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit oranı ve katman boyutları - /cache-stats endpoint'i için"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_size"] = len(self._entries)
+        hits = stats["memory_hits"] + stats["persistent_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+        stats["max_size"] = self.max_size
+        stats["ttl_seconds"] = self.ttl_seconds
+        stats["backend"] = "postgres" if self._cursor_factory else "memory"
+        return stats
@@ -0,0 +1,155 @@
+"""
+Message Dispatcher - whatsapp_number hash'ine göre sabit worker lane'leri
+Aynı numaranın mesajları tek lane'de sırayla işlenir (seçim -> miktar -> onay),
+farklı numaralar farklı lane'lerde paralel çalışır. Kuyruklar sınırlı:
+dolu lane yeni mesajı reddeder (LaneFullError) ve metrik tutar
+"""
+
+import os
+import time
+import zlib
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Any
+
+
+class LaneFullError(Exception):
+    """Lane kuyruğu dolu - mesaj kabul edilmedi"""
+
+
+class MessageDispatcher:
+    """N lane, her lane'de tek worker thread ve sınırlı FIFO kuyruk"""
+
+    # Lane başına gecikme persentilleri için saklanan son örnek sayısı
+    LATENCY_SAMPLES = 200
+
+    def __init__(self, handler: Callable[[str, str], Any], lanes: int = None, max_queue_depth: int = None):
+        self.handler = handler  # handler(message, whatsapp_number)
+        self.lane_count = lanes if lanes is not None else int(os.getenv('DISPATCH_LANES', 8))
+        self.max_queue_depth = (max_queue_depth if max_queue_depth is not None
+                                else int(os.getenv('DISPATCH_QUEUE_DEPTH', 20)))
+
+        self._lock = threading.Lock()
+        self._draining = False
+        self._queues = [queue.Queue(maxsize=self.max_queue_depth) for _ in range(self.lane_count)]
+        self._stats = [
+            {
+                "processed": 0,
+                "rejected": 0,
+                "errors": 0,
+                "max_depth": 0,
+                "wait_ms": deque(maxlen=self.LATENCY_SAMPLES),
+                "total_ms": deque(maxlen=self.LATENCY_SAMPLES),
+            }
+            for _ in range(self.lane_count)
+        ]
+
+        self._workers = []
+        for lane in range(self.lane_count):
+            worker = threading.Thread(target=self._run_lane, args=(lane,), name=f"dispatch-lane-{lane}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+        print(f"[DISPATCH] {self.lane_count} lanes, queue depth {self.max_queue_depth}")
+
+    def lane_for(self, whatsapp_number: str) -> int:
+        """Process'ler arasında da sabit hash (Python hash() her process'te farklı)"""
+        return zlib.crc32(whatsapp_number.encode('utf-8')) % self.lane_count
+
+    def submit(self, message: str, whatsapp_number: str) -> Future:
+        """Mesajı kullanıcının lane'ine ekle; sonuç Future ile döner"""
+        lane = self.lane_for(whatsapp_number)
+        if self._draining:
+            raise LaneFullError("Dispatcher is draining")
+        future = Future()
+        try:
+            self._queues[lane].put_nowait((message, whatsapp_number, future, time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self._stats[lane]["rejected"] += 1
+            print(f"[DISPATCH] Lane {lane} full ({self.max_queue_depth}) - rejected message from {whatsapp_number}")
+            raise LaneFullError(f"Lane {lane} queue is full")
+
+        depth = self._queues[lane].qsize()
+        with self._lock:
+            if depth > self._stats[lane]["max_depth"]:
+                self._stats[lane]["max_depth"] = depth
+        return future
+
+    def _run_lane(self, lane: int):
+        lane_queue = self._queues[lane]
+        while True:
+            message, whatsapp_number, future, enqueued_at = lane_queue.get()
+            started_at = time.perf_counter()
+            error = False
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(self.handler(message, whatsapp_number))
+                except Exception as e:
+                    error = True
+                    print(f"[DISPATCH] Lane {lane} handler error: {e}")
+                    future.set_exception(e)
+            finished_at = time.perf_counter()
+
+            with self._lock:
+                stats = self._stats[lane]
+                stats["processed"] += 1
+                stats["errors"] += int(error)
+                stats["wait_ms"].append((started_at - enqueued_at) * 1000)
+                stats["total_ms"].append((finished_at - enqueued_at) * 1000)
+            lane_queue.task_done()
+
+    def drain(self, timeout: float) -> bool:
+        """Yeni mesaj alma, kuyruktakileri bitir - graceful shutdown için (bitti mi döner)"""
+        self._draining = True
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if all(lane_queue.unfinished_tasks == 0 for lane_queue in self._queues):
+                print("[DISPATCH] Drained")
+                return True
+            time.sleep(0.1)
+        remaining = sum(lane_queue.unfinished_tasks for lane_queue in self._queues)
+        print(f"[DISPATCH] Drain timeout - {remaining} messages unfinished")
+        return False
+
+    @property
+    def draining(self) -> bool:
+        return self._draining
+
+    @staticmethod
+    def _latency(samples) -> Dict[str, float]:
+        if not samples:
+            return {"avg": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(samples)
+        return {
+            "avg": round(sum(ordered) / len(ordered), 1),
+            "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+            "max": round(ordered[-1], 1),
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Lane bazında kuyruk derinliği, red sayısı ve gecikme - /dispatcher-stats için"""
+        lanes = []
+        with self._lock:
+            for lane, stats in enumerate(self._stats):
+                lanes.append({
+                    "lane": lane,
+                    "queue_depth": self._queues[lane].qsize(),
+                    "max_depth": stats["max_depth"],
+                    "processed": stats["processed"],
+                    "rejected": stats["rejected"],
+                    "errors": stats["errors"],
+                    "wait_ms": self._latency(stats["wait_ms"]),
+                    "total_ms": self._latency(stats["total_ms"]),
+                })
+        return {
+            "lanes": self.lane_count,
+            "draining": self._draining,
+            "max_queue_depth": self.max_queue_depth,
+            "queued": sum(lane["queue_depth"] for lane in lanes),
+            "processed": sum(lane["processed"] for lane in lanes),
+            "rejected": sum(lane["rejected"] for lane in lanes),
+            "per_lane": lanes,
+        }
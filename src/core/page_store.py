@@ -0,0 +1,300 @@
+"""
+Page Store - PRODUCT_PAGES_DIR'de içerik adresli, önceden sıkıştırılmış liste sayfaları
+Her tekil sonuç seti (content_hash + şablon versiyonu) bir kez render edilip
+.html, .html.gz ve .html.br olarak yazılır (arka planda - arama yolunu bekletmez);
+sayfa isteğinde Accept-Encoding'e göre en küçük varyant gönderilir.
+
+Retention sayfa birimindedir: bir sayfanın tüm varyantları birlikte silinir.
+Sayfalar mtime sırasıyla bellek içi bir index'te tutulur (yazılanlar anında, diğer
+worker'ların / önceki çalışmaların dosyaları dizin taramasıyla eklenir). Sweeper
+yaşı PAGE_MAX_AGE'i geçen sayfaları ve toplam boyut PAGE_STORE_MAX_MB'ı aşarsa en
+eskileri siler. Her çalışma PAGE_SWEEP_BUDGET_MS ile sınırlıdır; silme index'ten
+devam eder, dizin taraması da kaldığı yerden sürer (bitmeyen iş bir sonraki
+çalışmaya kalır).
+"""
+
+import os
+import gzip
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from session_expiry import SessionSweeper
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+    print("[PAGES] brotli not installed - only gzip page variants will be written")
+
+# Varsayılan: product server'ın da okuduğu <proje>/product-pages
+PRODUCT_PAGES_DIR = os.getenv('PRODUCT_PAGES_DIR') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'product-pages')
+PAGE_MAX_AGE = float(os.getenv('PAGE_MAX_AGE', 6 * 3600))
+PAGE_STORE_MAX_MB = float(os.getenv('PAGE_STORE_MAX_MB', 200))
+PAGE_SWEEP_INTERVAL = float(os.getenv('PAGE_SWEEP_INTERVAL', 60))
+PAGE_SWEEP_BUDGET_MS = float(os.getenv('PAGE_SWEEP_BUDGET_MS', 50))
+
+# Dosya uzantısı -> Content-Encoding (tercih sırası: en küçük önce)
+VARIANTS = (('.html.br', 'br'), ('.html.gz', 'gzip'), ('.html', None))
+# Bir sayfanın dosyaları - .html önce silinir ki sayfa yarım varyantlarla sunulmasın
+# (eski products_*.html dosyaları da aynı şekilde yönetilir)
+PAGE_FILE_SUFFIXES = ('.html', '.html.gz', '.html.br', '.html.tmp', '.html.gz.tmp', '.html.br.tmp')
+
+
+def _accepts(accept_encoding: str, encoding: str) -> bool:
+    """Accept-Encoding başlığı bu encoding'i (q=0 değilse) kabul ediyor mu"""
+    for item in accept_encoding.lower().split(','):
+        name, _, params = item.strip().partition(';')
+        if name.strip() in (encoding, '*'):
+            return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+def _page_key(filename: str) -> Optional[str]:
+    """Dosya adından sayfa anahtarı (varyant ve .tmp uzantısı atılır) veya sayfa dosyası değilse None"""
+    if filename.endswith('.tmp'):
+        filename = filename[:-len('.tmp')]
+    for suffix, _ in VARIANTS:
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return None
+
+
+class PageFileStore:
+    """Sayfa varyantlarını yazar, isteğe uygun varyantı seçer, retention'ı uygular"""
+
+    def __init__(self, directory: str = None, max_age_seconds: float = None, max_bytes: int = None,
+                 sweep_interval: float = None, sweep_budget_ms: float = None):
+        self.directory = directory or PRODUCT_PAGES_DIR
+        self.max_age_seconds = max_age_seconds if max_age_seconds is not None else PAGE_MAX_AGE
+        self.max_bytes = max_bytes if max_bytes is not None else int(PAGE_STORE_MAX_MB * 1024 * 1024)
+        self.sweep_budget = (sweep_budget_ms if sweep_budget_ms is not None else PAGE_SWEEP_BUDGET_MS) / 1000
+        self.sweeper = SessionSweeper(self.sweep, sweep_interval if sweep_interval is not None else PAGE_SWEEP_INTERVAL,
+                                      name="page-retention")
+        os.makedirs(self.directory, exist_ok=True)
+        self._writer = None  # tek thread'li yazıcı - fork sonrası ilk yazmada oluşturulur
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # page_key -> [mtime, bytes] - en eski önde
+        self._total_bytes = 0
+        # Süren dizin taraması (sadece sweeper thread'i kullanır) - çalışmalar arasında devam eder
+        self._scan = None
+        self._scan_started = 0.0
+        self._scanned = {}
+        self._stats = {
+            "pages_written": 0, "pages_refreshed": 0, "pages_repaired": 0, "write_errors": 0,
+            "bytes_written": {"identity": 0, "gzip": 0, "br": 0},
+            "served": {"identity": 0, "gzip": 0, "br": 0, "rendered": 0},
+            "removed_age": 0, "removed_size": 0, "budget_exhausted": 0,
+            "last_scan_complete": None,
+        }
+
+    def _path(self, page_key: str, suffix: str) -> str:
+        return os.path.join(self.directory, page_key + suffix)
+
+    def write_async(self, page_key: str, render: Callable[[], str]):
+        """Sayfa yoksa render(+sıkıştır)+yaz, varsa mtime'ını yenile - arka planda"""
+        with self._lock:
+            if page_key in self._pending:
+                return
+            self._pending.add(page_key)
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="page-writer")
+        self._writer.submit(self._write, page_key, render)
+
+    @staticmethod
+    def _compress(raw: bytes) -> List[Tuple[str, str, bytes]]:
+        variants = [('.html.gz', 'gzip', gzip.compress(raw, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.html.br', 'br', brotli.compress(raw, quality=11)))
+        return variants
+
+    def _write_files(self, page_key: str, variants: List[Tuple[str, str, bytes]]):
+        for suffix, encoding, data in variants:
+            tmp_path = self._path(page_key, suffix + '.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(page_key, suffix))
+            with self._lock:
+                self._stats["bytes_written"][encoding] += len(data)
+
+    def _index_page(self, page_key: str, size: int):
+        """Sayfayı index'in sonuna (en yeni) taşı"""
+        with self._lock:
+            old = self._index.pop(page_key, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+            self._index[page_key] = [time.time(), size]
+            self._total_bytes += size
+
+    def _write(self, page_key: str, render: Callable[[], str]):
+        try:
+            html_path = self._path(page_key, '.html')
+            if os.path.exists(html_path):
+                # Aynı sayfa tekrar kullanıldı - eksik varyant varsa .html'den yeniden üret
+                missing = {suffix for suffix, encoding in VARIANTS
+                           if encoding is not None and not os.path.exists(self._path(page_key, suffix))}
+                if brotli is None:
+                    missing.discard('.html.br')
+                if missing:
+                    with open(html_path, 'rb') as f:
+                        raw = f.read()
+                    self._write_files(page_key, [v for v in self._compress(raw) if v[0] in missing])
+                    with self._lock:
+                        self._stats["pages_repaired"] += 1
+                # retention yaşını sıfırla
+                size = 0
+                for suffix, _ in VARIANTS:
+                    path = self._path(page_key, suffix)
+                    if os.path.exists(path):
+                        os.utime(path)
+                        size += os.path.getsize(path)
+                self._index_page(page_key, size)
+                with self._lock:
+                    self._stats["pages_refreshed"] += 1
+                return
+
+            raw = render().encode('utf-8')
+            # .html en son yazılır - varlığı sayfanın tamamlandığı anlamına gelir
+            variants = self._compress(raw) + [('.html', 'identity', raw)]
+            self._write_files(page_key, variants)
+            self._index_page(page_key, sum(len(data) for _, _, data in variants))
+            with self._lock:
+                self._stats["pages_written"] += 1
+        except Exception as e:
+            print(f"[PAGES] Write error for {page_key}: {e}")
+            with self._lock:
+                self._stats["write_errors"] += 1
+        finally:
+            with self._lock:
+                self._pending.discard(page_key)
+
+    def open_variant(self, page_key: str, accept_encoding: str) -> Optional[Tuple[bytes, Optional[str]]]:
+        """İstemcinin kabul ettiği en küçük varyant: (içerik, Content-Encoding) veya yazılmamışsa None"""
+        if not os.path.exists(self._path(page_key, '.html')):
+            return None
+        for suffix, encoding in VARIANTS:
+            if encoding is not None and not _accepts(accept_encoding or '', encoding):
+                continue
+            try:
+                with open(self._path(page_key, suffix), 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                # Retention bu varyantı silmiş olabilir - bir sonrakini dene
+                continue
+            with self._lock:
+                self._stats["served"][encoding or 'identity'] += 1
+            return data, encoding
+        return None
+
+    def count_rendered(self):
+        """Dosya henüz yazılmamış, sayfa istek anında render edildi"""
+        with self._lock:
+            self._stats["served"]["rendered"] += 1
+
+    def _remove_page(self, page_key: str):
+        """Sayfanın tüm varyantlarını birlikte sil"""
+        for suffix in PAGE_FILE_SUFFIXES:
+            try:
+                os.remove(self._path(page_key, suffix))
+            except FileNotFoundError:
+                pass
+        # Süren tarama bu sayfayı görmüş olabilir - tamamlanınca index'e geri eklenmesin
+        self._scanned.pop(page_key, None)
+
+    def _evict(self, deadline: float, now: float) -> Tuple[int, int, bool]:
+        """Index'in başından (en eski) yaşlı / boyut sınırını aşan sayfaları sil -> (yaş, boyut, bitti mi)"""
+        removed_age = removed_size = 0
+        while True:
+            if time.perf_counter() > deadline:
+                return removed_age, removed_size, False
+            with self._lock:
+                if not self._index:
+                    return removed_age, removed_size, True
+                page_key, (mtime, size) = next(iter(self._index.items()))
+                expired = now - mtime > self.max_age_seconds
+                if not expired and self._total_bytes <= self.max_bytes:
+                    return removed_age, removed_size, True  # mtime sıralı - kalanlar daha yeni
+                del self._index[page_key]
+                self._total_bytes -= size
+            self._remove_page(page_key)
+            if expired:
+                removed_age += 1
+            else:
+                removed_size += 1
+
+    def _continue_scan(self, deadline: float) -> bool:
+        """Dizin taramasını kaldığı yerden sürdür; tamamlanınca index'i diskle eşitle -> tamamlandı mı"""
+        if self._scan is None:
+            self._scan = os.scandir(self.directory)
+            self._scan_started = time.time()
+            self._scanned = {}
+        for entry in self._scan:
+            page_key = _page_key(entry.name)
+            if page_key is not None and entry.is_file():
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    st = None
+                if st is not None:
+                    page = self._scanned.setdefault(page_key, [0.0, 0])
+                    page[0] = max(page[0], st.st_mtime)
+                    page[1] += st.st_size
+            if time.perf_counter() > deadline:
+                return False
+        self._scan.close()
+        self._scan = None
+
+        pages = self._scanned
+        self._scanned = {}
+        with self._lock:
+            # Tarama sırasında yazılan/yenilenen sayfalar index'teki değeriyle kalır
+            for page_key, page in self._index.items():
+                if page[0] >= self._scan_started:
+                    pages[page_key] = page
+            self._index = OrderedDict(sorted(pages.items(), key=lambda item: item[1][0]))
+            self._total_bytes = sum(size for _, size in self._index.values())
+            self._stats["last_scan_complete"] = time.time()
+        return True
+
+    def sweep(self) -> int:
+        """Yaş ve toplam boyut sınırını sayfa bazında uygula - PAGE_SWEEP_BUDGET_MS içinde kalır"""
+        deadline = time.perf_counter() + self.sweep_budget
+        # Önce silme (index hazır), kalan bütçeyle tarama - tarama silmeyi hiç aç bırakmaz
+        removed_age, removed_size, done = self._evict(deadline, time.time())
+        if done:
+            done = self._continue_scan(deadline)
+
+        with self._lock:
+            self._stats["removed_age"] += removed_age
+            self._stats["removed_size"] += removed_size
+            if not done:
+                self._stats["budget_exhausted"] += 1
+        return removed_age + removed_size
+
+    def start_sweeper(self):
+        """Retention sweeper'ı başlat (thread olduğu için fork sonrası, process başına)"""
+        self.sweeper.start()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {k: (dict(v) if isinstance(v, dict) else v) for k, v in self._stats.items()}
+            pending = len(self._pending)
+            pages, total_bytes = len(self._index), self._total_bytes
+        written = stats["bytes_written"]
+        return dict(
+            stats,
+            pending_writes=pending,
+            pages=pages,
+            total_bytes=total_bytes,
+            gzip_ratio=round(written["gzip"] / written["identity"], 3) if written["identity"] else None,
+            br_ratio=round(written["br"] / written["identity"], 3) if written["identity"] and written["br"] else None,
+            brotli_available=brotli is not None,
+            directory=self.directory,
+            max_age_seconds=self.max_age_seconds,
+            max_bytes=self.max_bytes,
+            sweeper=self.sweeper.get_stats(),
+        )
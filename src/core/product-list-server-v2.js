@@ -18,7 +18,7 @@ const tokenStore = new Map();
 
 // Token configuration
 const TOKEN_CONFIG = {
-    EXPIRY_MINUTES: 10,           // Token expires in 10 minutes
+    EXPIRY_MINUTES: parseFloat(process.env.PRODUCT_LINK_TTL_MINUTES || '10'),  // Token expires in 10 minutes
     ALLOW_REUSE: true,            // Allow multiple accesses within expiry time
     CLEANUP_INTERVAL: 5 * 60 * 1000  // Cleanup expired tokens every 5 minutes
 };
@@ -63,13 +63,101 @@ function createToken(filename, whatsappNumber) {
     return token;
 }
 
+// Swarm sistemi (product_links.py) ile paylaşılan HMAC anahtarı
+const PRODUCT_LINK_SECRET = process.env.PRODUCT_LINK_SECRET || '';
+
+/**
+ * Verify an HMAC-signed token minted in-process by the Swarm system
+ * Format: base64url(json {f, w, e}) + "." + base64url(HMAC-SHA256(secret, payload))
+ * @param {string} token - Signed token
+ * @returns {Object|null} - Payload if signature is valid, null otherwise
+ */
+function verifySignedToken(token) {
+    if (!PRODUCT_LINK_SECRET || typeof token !== 'string') {
+        return null;
+    }
+
+    const [payloadPart, signature] = token.split('.');
+    if (!payloadPart || !signature) {
+        return null;
+    }
+
+    const expected = Buffer.from(crypto.createHmac('sha256', PRODUCT_LINK_SECRET).update(payloadPart).digest('base64url'));
+    const given = Buffer.from(signature);
+    if (given.length !== expected.length || !crypto.timingSafeEqual(given, expected)) {
+        return null;
+    }
+
+    try {
+        return JSON.parse(Buffer.from(payloadPart, 'base64url').toString('utf8'));
+    } catch (error) {
+        return null;
+    }
+}
+
+/**
+ * Register a signed token in tokenStore on first access (lookup gerekmez,
+ * verification akışı aynı tokenStore kaydını kullanır)
+ * @param {string} token - Signed token
+ * @returns {Object|null} - Token data if signature is valid and not expired
+ */
+function registerSignedToken(token) {
+    const payload = verifySignedToken(token);
+    if (!payload) {
+        return null;
+    }
+
+    const now = new Date();
+    const expiresAt = new Date(payload.e * 1000);
+    if (now > expiresAt) {
+        console.warn(`[TOKEN EXPIRED] Signed token ${token.substring(0, 8)}... expired at ${expiresAt.toLocaleTimeString('tr-TR')}`);
+        return null;
+    }
+
+    const tokenData = {
+        filename: payload.f,
+        whatsappNumber: payload.w,
+        createdAt: now,
+        expiresAt,
+        accessCount: 0,
+        firstAccess: null,
+        lastAccess: null,
+        firstAccessCompleted: false,
+        firstAccessIP: null,
+        verificationCode: null,
+        codeExpiresAt: null,
+        verificationAttempts: 0,
+        lastVerifiedAt: null
+    };
+    tokenStore.set(token, tokenData);
+
+    console.log(`[TOKEN SIGNED] ${token.substring(0, 8)}... registered for ${payload.f}`);
+
+    return tokenData;
+}
+
+/**
+ * Look up a token without counting an access (list data requests)
+ * @param {string} token - Token to look up
+ * @returns {Object|null} - Token data if valid, null otherwise
+ */
+function peekToken(token) {
+    const tokenData = tokenStore.get(token) || registerSignedToken(token);
+
+    if (!tokenData || new Date() > tokenData.expiresAt) {
+        return null;
+    }
+
+    return tokenData;
+}
+
 /**
  * Validate a token
  * @param {string} token - Token to validate
  * @returns {Object|null} - Token data if valid, null otherwise
  */
 function validateToken(token) {
-    const tokenData = tokenStore.get(token);
+    const tokenData = tokenStore.get(token) || registerSignedToken(token);
 
     if (!tokenData) {
         console.warn(`[TOKEN INVALID] Token not found: ${token.substring(0, 8)}...`);
@@ -247,16 +335,21 @@ cleanupService.start();
 
 // Static files serving
 app.use('/products', express.static(config.paths.productPages));
+// Liste sayfası CSS/JS - URL'ler içerik hash'li (?v=), uzun süre cache'lenebilir
+app.use('/product-assets', express.static(path.join(__dirname, 'static'), { maxAge: '365d', immutable: true }));
 app.use(express.json());
 
 // Filename parsing utility
+// products_<whatsapp>_<session>_<timestamp>.html (eski dosya) veya .html'siz sayfa adı
+// (sonuç seti Swarm sisteminde tutulur, sayfa /product-list'ten gelir - virtual: true)
 function parseFilename(filename) {
     try {
-        if (!filename.startsWith('products_') || !filename.endsWith('.html')) {
+        if (!filename.startsWith('products_')) {
             return null;
         }
 
-        const parts = filename.replace('.html', '').split('_');
+        const virtual = !filename.endsWith('.html');
+        const parts = filename.replace(/\.html$/, '').split('_');
 
         // Support both legacy format (2 parts) and new format (4 parts)
         if (parts.length === 2) {
@@ -265,7 +358,8 @@ function parseFilename(filename) {
                 whatsappNumber: '905306897885@c.us', // Default fallback
                 sessionId: parts[1],
                 timestamp: Date.now(),
-                legacy: true
+                legacy: true,
+                virtual
             };
         } else if (parts.length === 4) {
             // New format: products_<whatsapp>_<session>_<timestamp>.html
@@ -273,7 +367,8 @@ function parseFilename(filename) {
                 whatsappNumber: parts[1] + '@c.us',
                 sessionId: parts[2],
                 timestamp: parseInt(parts[3]),
-                legacy: false
+                legacy: false,
+                virtual
             };
         } else {
             return null;
@@ -284,6 +379,59 @@ function parseFilename(filename) {
     }
 }
 
+const SWARM_BASE_URL = `http://localhost:${process.env.SWARM_SERVER_PORT || 3007}`;
+
+/**
+ * Serve a virtual product list page (HTML or JSON data) from the Swarm system
+ * The page is streamed through as it is rendered (or as the pre-compressed
+ * gzip/br variant, decompress: false); If-None-Match / ETag are passed through
+ * so unchanged lists return 304
+ * @param {string} filename - Page name (products_<whatsapp>_<session>_<timestamp>)
+ * @param {string} suffix - '' for the page, '/data' for the result set
+ */
+async function proxyProductList(req, res, filename, suffix = '') {
+    const parsed = parseFilename(filename);
+    if (!parsed || parsed.legacy) {
+        return res.status(404).send(generateErrorPage('notfound'));
+    }
+
+    const axios = require('axios');
+    const headers = {};
+    if (req.headers['if-none-match']) {
+        headers['If-None-Match'] = req.headers['if-none-match'];
+    }
+    if (req.headers['accept-encoding']) {
+        headers['Accept-Encoding'] = req.headers['accept-encoding'];
+    }
+
+    const upstream = await axios.get(`${SWARM_BASE_URL}/product-list/${encodeURIComponent(parsed.sessionId)}${suffix}`, {
+        headers,
+        responseType: 'stream',
+        decompress: false,
+        validateStatus: () => true
+    });
+
+    if (upstream.status === 404 && !suffix) {
+        upstream.data.resume();
+        console.error(`[404] Product list not found or expired: ${filename}`);
+        return res.status(404).send(generateErrorPage('notfound'));
+    }
+
+    for (const header of ['content-type', 'content-encoding', 'content-length', 'etag', 'cache-control', 'vary']) {
+        if (upstream.headers[header]) {
+            res.set(header, upstream.headers[header]);
+        }
+    }
+
+    if (upstream.status === 304) {
+        upstream.data.resume();
+        return res.status(304).end();
+    }
+
+    res.status(upstream.status);
+    upstream.data.pipe(res);
+}
+
 /**
  * Generate error page HTML for invalid/expired tokens
  */
@@ -831,6 +979,17 @@ app.get('/view/:token/:filename', async (req, res) => {
             }
         }
 
+        // Parse filename for logging
+        const parsed = parseFilename(filename);
+        if (parsed) {
+            console.log(`[✅ SECURE ACCESS GRANTED] ${filename} -> WhatsApp: ${parsed.whatsappNumber}, Access #${tokenData.accessCount}`);
+        }
+
+        // Sonuç seti Swarm sisteminde - dosya yok, shell sayfası proxy'lenir
+        if (parsed && parsed.virtual) {
+            return await proxyProductList(req, res, filename);
+        }
+
         // Check if file exists
         const filePath = path.join(__dirname, '..', '..', 'product-pages', filename);
 
@@ -839,12 +998,6 @@ app.get('/view/:token/:filename', async (req, res) => {
             return res.status(404).send(generateErrorPage('notfound'));
         }
 
-        // Parse filename for logging
-        const parsed = parseFilename(filename);
-        if (parsed) {
-            console.log(`[✅ SECURE ACCESS GRANTED] ${filename} -> WhatsApp: ${parsed.whatsappNumber}, Access #${tokenData.accessCount}`);
-        }
-
         // Serve the file securely
         return res.sendFile(filePath);
 
@@ -854,6 +1007,35 @@ app.get('/view/:token/:filename', async (req, res) => {
     }
 });
 
+// Product list data (JSON) for the page shell - aynı token, erişim sayılmaz
+app.get('/view/:token/:filename/data', async (req, res) => {
+    try {
+        const { token, filename } = req.params;
+        const tokenData = peekToken(token);
+
+        if (!tokenData || tokenData.filename !== filename) {
+            return res.status(403).json({ success: false, error: 'Invalid or expired token' });
+        }
+
+        // Sayfayı açan istemci: WhatsApp, ilk erişimin IP'si veya az önce kod doğrulayan
+        const clientIP = req.headers['x-forwarded-for'] || req.ip;
+        const recentlyVerified = tokenData.lastVerifiedAt && (Date.now() - tokenData.lastVerifiedAt < 30 * 1000);
+        const allowed = /whatsapp/i.test(req.headers['user-agent'] || '') ||
+            recentlyVerified || tokenData.firstAccessIP === clientIP;
+
+        if (!allowed) {
+            console.warn(`[ACCESS DENIED] List data for ${filename} requested from ${clientIP}`);
+            return res.status(403).json({ success: false, error: 'Verification required' });
+        }
+
+        return await proxyProductList(req, res, filename, '/data');
+
+    } catch (error) {
+        console.error('[LIST DATA ERROR]', error.message);
+        res.status(502).json({ success: false, error: 'Swarm sistemi yanıt veremedi' });
+    }
+});
+
 // ============================================
 // END SECURE ENDPOINT
 // ============================================
@@ -862,6 +1044,12 @@ app.get('/view/:token/:filename', async (req, res) => {
 app.get('/products/:filename', async (req, res) => {
     try {
         const { filename } = req.params;
+
+        // Sonuç seti Swarm sisteminde (PRODUCT_LINK_SECRET yokken verilen korumasız link)
+        const parsed = parseFilename(filename);
+        if (parsed && parsed.virtual) {
+            return await proxyProductList(req, res, filename);
+        }
         
         // Check if it's a static HTML file request
         if (filename.endsWith('.html') && filename.startsWith('products_')) {
@@ -880,7 +1068,6 @@ app.get('/products/:filename', async (req, res) => {
             }
             
             // Parse filename for logging
-            const parsed = parseFilename(filename);
             if (parsed) {
                 console.log(`[ACCESS] ${filename} -> WhatsApp: ${parsed.whatsappNumber}, Session: ${parsed.sessionId}`);
                 
@@ -909,6 +1096,15 @@ app.get('/products/:filename', async (req, res) => {
     }
 });
 
+app.get('/products/:filename/data', async (req, res) => {
+    try {
+        return await proxyProductList(req, res, req.params.filename, '/data');
+    } catch (error) {
+        console.error('[LIST DATA ERROR]', error.message);
+        res.status(502).json({ success: false, error: 'Swarm sistemi yanıt veremedi' });
+    }
+});
+
 // Product selection endpoint - UPDATED for filename parsing
 app.post('/select-product', express.json(), async (req, res) => {
     try {
@@ -930,8 +1126,8 @@ app.post('/select-product', express.json(), async (req, res) => {
         // MIGRATION: Parse filename to get WhatsApp number (instead of database query)
         let whatsappNumber;
         
-        if (sessionId.startsWith('products_') && sessionId.endsWith('.html')) {
-            // New filename format
+        if (sessionId.startsWith('products_')) {
+            // New filename / page name format
             const parsed = parseFilename(sessionId);
             if (parsed) {
                 whatsappNumber = parsed.whatsappNumber;
@@ -955,7 +1151,7 @@ app.post('/select-product', express.json(), async (req, res) => {
         const axios = require('axios');
         
         try {
-            const swarmResponse = await axios.post(`http://localhost:${process.env.SWARM_SERVER_PORT || 3007}/process-message`, {
+            const swarmResponse = await axios.post(`${SWARM_BASE_URL}/process-message`, {
                 message: urunSeciidiMessage,
                 whatsapp_number: whatsappNumber
             });
@@ -1021,7 +1217,7 @@ app.post('/cleanup/trigger', (req, res) => {
 // TOKEN MANAGEMENT API ENDPOINTS
 // ============================================
 /**
- * Create a secure token for a file (for use by Swarm system)
+ * Create a secure token for a file (legacy - Swarm system now mints signed tokens in-process)
  * POST /api/create-token
  * Body: { filename, whatsappNumber }
  */
@@ -0,0 +1,61 @@
+"""
+Product Links - HMAC imzalı, süreli ürün listesi token'ları
+Token process içinde üretilir (product server'a HTTP çağrısı yok); product server
+(product-list-server-v2.js) aynı PRODUCT_LINK_SECRET ile imzayı ve süreyi
+lookup yapmadan doğrular.
+
+Format: base64url(json {"f": filename, "w": whatsapp_number, "e": expiry_epoch})
+        + "." + base64url(HMAC-SHA256(secret, payload_part))
+"""
+
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+from typing import Dict, Any, Optional
+
+PRODUCT_LINK_SECRET = os.getenv('PRODUCT_LINK_SECRET', '')
+PRODUCT_LINK_TTL_MINUTES = float(os.getenv('PRODUCT_LINK_TTL_MINUTES', 10))
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64url_decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _signature(payload_part: str, secret: str) -> str:
+    return _b64url(hmac.new(secret.encode('utf-8'), payload_part.encode('ascii'), hashlib.sha256).digest())
+
+
+def sign_product_token(filename: str, whatsapp_number: str, ttl_minutes: float = None,
+                       secret: str = None) -> str:
+    """Dosya + numara + son geçerlilik zamanını imzala"""
+    secret = secret or PRODUCT_LINK_SECRET
+    if not secret:
+        raise ValueError("PRODUCT_LINK_SECRET is not set")
+    ttl_minutes = PRODUCT_LINK_TTL_MINUTES if ttl_minutes is None else ttl_minutes
+    payload = {"f": filename, "w": whatsapp_number, "e": int(time.time() + ttl_minutes * 60)}
+    payload_part = _b64url(json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+    return f"{payload_part}.{_signature(payload_part, secret)}"
+
+
+def verify_product_token(token: str, secret: str = None) -> Optional[Dict[str, Any]]:
+    """İmza ve süre geçerliyse payload, değilse None (JS tarafındaki verifySignedToken ile aynı)"""
+    secret = secret or PRODUCT_LINK_SECRET
+    payload_part, _, signature = (token or '').partition('.')
+    if not secret or not payload_part or not signature:
+        return None
+    if not hmac.compare_digest(signature, _signature(payload_part, secret)):
+        return None
+    try:
+        payload = json.loads(_b64url_decode(payload_part))
+    except ValueError:
+        return None
+    if payload.get("e", 0) < time.time():
+        return None
+    return payload
@@ -0,0 +1,199 @@
+"""
+Product Page - ürün listesi sayfası (önceden derlenmiş şablon + kart fragment cache)
+Sonuç seti içerik hash'i ile kompakt kayıt olarak tutulur (product_results);
+her tekil sayfa bir kez render edilip .html/.gz/.br olarak yazılır (page_store),
+dosya henüz yazılmadıysa istek anında stream edilerek üretilir.
+
+- Şablon import sırasında bir kez parçalara ayrılır (sabit metin / alan); render
+  sadece alanları escape edip birleştirir
+- Her ürün kartı (code, name, price, stock) anahtarıyla LRU cache'te tutulur -
+  popüler ürünler her sayfada yeniden üretilmez
+- CSS/JS sayfaya gömülmez: static/ altındaki dosyalar versiyonlu URL ile
+  (product server /product-assets, uzun süreli cache) yüklenir
+"""
+
+import os
+import re
+import json
+import html
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, List, Sequence
+
+from query_parsers import turkish_lower
+
+# Liste sayfasında gösterilen ürün sayısı (eski generate_product_html ile aynı)
+PRODUCT_LIST_LIMIT = 50
+
+# Sayfada kullanılan kayıt alanları - (code, name, price, stock)
+PAGE_RECORD_FIELDS = ('code', 'name', 'price', 'stock')
+
+PRODUCT_CARD_CACHE_MAX = int(os.getenv('PRODUCT_CARD_CACHE_MAX', 5000))
+PRODUCT_ASSET_URL = os.getenv('PRODUCT_ASSET_URL', '/product-assets').rstrip('/')
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+# Stream'de kaç kart bir chunk olarak gönderilir
+CARDS_PER_CHUNK = 10
+
+
+def compact_products(products: Sequence[Dict[str, Any]]) -> List[list]:
+    """Ürün dict'lerini PAGE_RECORD_FIELDS sırasıyla kompakt kayıtlara çevir"""
+    return [
+        [p.get('code'), p.get('name'), float(p.get('price') or 0), int(p.get('stock') or 0)]
+        for p in products[:PRODUCT_LIST_LIMIT]
+    ]
+
+
+def build_list_payload(records: List[list], query: str, total_count: int) -> Dict[str, Any]:
+    """Kaydedilen / JSON endpoint'in döndüğü sonuç seti (sorgu müşterinin yazdığı gibi, boşluklar normalize)"""
+    return {
+        "query": ' '.join(query.split()),
+        "count": total_count,
+        "in_stock": sum(1 for r in records if r[3] > 0),
+        "fields": PAGE_RECORD_FIELDS,
+        "products": records,
+    }
+
+
+def payload_hash(payload: Dict[str, Any]) -> str:
+    """
+    Sonuç setinin içerik hash'i - sayfa anahtarı ve ETag kaynağı (kayıt anında bir kez).
+    Sorgu harf büyüklüğünden bağımsız hash'lenir: "100x200 Silindir" ve "100x200 silindir"
+    aynı sayfayı paylaşır; gösterilen sorgu değişmez.
+    """
+    key = dict(payload, query=turkish_lower(payload["query"]))
+    body = json.dumps(key, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(body.encode('utf-8')).hexdigest()[:32]
+
+
+def _asset_url(filename: str) -> str:
+    """İçerik hash'li URL - dosya değişince URL de değişir (immutable cache güvenli)"""
+    with open(os.path.join(STATIC_DIR, filename), 'rb') as f:
+        version = hashlib.sha1(f.read()).hexdigest()[:10]
+    return f"{PRODUCT_ASSET_URL}/{filename}?v={version}"
+
+
+def _format_price(price: float) -> str:
+    return str(int(price)) if price == int(price) else str(price)
+
+
+class CompiledTemplate:
+    """$alan yer tutuculu şablon - sabit alanlar derlemede doldurulur, kalanlar render'da escape edilir"""
+
+    _FIELD = re.compile(r'\$(\w+)')
+
+    def __init__(self, source: str, **static_values):
+        # parts: çift indeksler sabit metin, tek indeksler alan adı
+        parts = self._FIELD.split(source)
+        self.parts = [parts[0]]
+        for i in range(1, len(parts), 2):
+            name, text = parts[i], parts[i + 1]
+            if name in static_values:
+                self.parts[-1] += static_values[name] + text
+            else:
+                self.parts.extend([name, text])
+
+    def render(self, values: Dict[str, Any]) -> str:
+        out = list(self.parts)
+        for i in range(1, len(out), 2):
+            out[i] = html.escape(str(values[out[i]]))
+        return ''.join(out)
+
+
+PAGE_HEAD = """<!DOCTYPE html>
+<html lang="tr">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Ürün Listesi - $query</title>
+    <link rel="stylesheet" href="$css_url">
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h2>Urun Listesi</h2>
+            <p>Arama: "<strong>$query</strong>"</p>
+            <p>Toplam $count ürün bulundu</p>
+        </div>
+        <div id="products">
+"""
+
+PAGE_TAIL = """        </div>
+    </div>
+    <script src="$js_url" defer></script>
+</body>
+</html>"""
+
+# Kart tek satır - sayfada 50 kez tekrarlandığı için girinti byte'ı da kısaltıldı
+CARD = ('<div class="product$stock_class" data-code="$code" data-name="$name" data-price="$price">'
+        '<div class="product-name">$name</div><div class="product-code">Kod: $code</div>'
+        '<div class="product-price">$price TL</div><div class="product-stock">Stok: $stock adet</div></div>\n')
+
+
+class ProductPageRenderer:
+    """Liste sayfasını sonuç setinden stream eder; kart HTML'leri LRU cache'ten gelir"""
+
+    def __init__(self, card_cache_max: int = None):
+        self.card_cache_max = card_cache_max if card_cache_max is not None else PRODUCT_CARD_CACHE_MAX
+        self.head = CompiledTemplate(PAGE_HEAD, css_url=html.escape(_asset_url('product-list.css')))
+        self.tail = CompiledTemplate(PAGE_TAIL, js_url=html.escape(_asset_url('product-list.js'))).render({})
+        self.card = CompiledTemplate(CARD)
+        # Şablon/asset değişince sayfa ETag'leri de değişsin
+        self.version = hashlib.sha1(''.join(self.head.parts + [self.tail] + self.card.parts)
+                                    .encode('utf-8')).hexdigest()[:8]
+        self._cards = OrderedDict()  # (code, name, price, stock) -> kart HTML
+        self._lock = threading.Lock()
+        self._stats = {"pages": 0, "card_hits": 0, "card_misses": 0}
+
+    def page_etag(self, content_hash: str) -> str:
+        return f'"{content_hash[:20]}-{self.version}"'
+
+    def page_key(self, content_hash: str) -> str:
+        """Yazılan sayfa dosyasının adı - şablon değişince eski dosyalar kullanılmaz"""
+        return f"{content_hash}-{self.version}"
+
+    def render_card(self, record: Sequence) -> str:
+        key = tuple(record)
+        with self._lock:
+            fragment = self._cards.get(key)
+            if fragment is not None:
+                self._cards.move_to_end(key)
+                self._stats["card_hits"] += 1
+                return fragment
+            self._stats["card_misses"] += 1
+
+        code, name, price, stock = key
+        fragment = self.card.render({
+            "stock_class": " out-of-stock" if stock <= 0 else "",
+            "code": code, "name": name, "price": _format_price(price), "stock": stock,
+        })
+        with self._lock:
+            self._cards[key] = fragment
+            while len(self._cards) > self.card_cache_max:
+                self._cards.popitem(last=False)
+        return fragment
+
+    def stream(self, payload: Dict[str, Any]) -> Iterator[str]:
+        """Sayfayı parça parça üret - başlık hemen gider, kartlar CARDS_PER_CHUNK'lık gruplarla"""
+        with self._lock:
+            self._stats["pages"] += 1
+        yield self.head.render({"query": payload["query"], "count": payload["count"]})
+        records = payload["products"]
+        for i in range(0, len(records), CARDS_PER_CHUNK):
+            yield ''.join(self.render_card(r) for r in records[i:i + CARDS_PER_CHUNK])
+        yield self.tail
+
+    def render(self, payload: Dict[str, Any]) -> str:
+        return ''.join(self.stream(payload))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["card_hits"] + self._stats["card_misses"]
+            return dict(
+                self._stats,
+                cached_cards=len(self._cards),
+                card_cache_max=self.card_cache_max,
+                card_hit_rate=round(self._stats["card_hits"] / lookups, 3) if lookups else 0.0,
+                template_version=self.version,
+            )
@@ -0,0 +1,100 @@
+"""
+Product Results - içerik adresli ürün listesi store'u
+Aynı sonuç setini (ör. "100x200 silindir") arayan müşteriler tek bir kayıtlı
+sayfayı paylaşır: sayfa, normalize edilmiş sonuç setinin hash'i ile saklanır,
+her müşterinin kendi session'ı (ve token'ı) sadece bu hash'e referans tutar.
+
+- pages namespace:    content_hash -> {"payload", "refs"}
+- sessions namespace: session_id -> {"content", "whatsapp_number"}
+Session'ların süresi ExpiryIndex ile izlenir; süresi dolan session referansı
+bırakır, referansı kalmayan sayfa silinir. pages namespace'inin kendi TTL'i
+kaçan referanslar (LRU'dan düşen session, process restart) için güvenlik ağıdır.
+
+Not: refs sayacı process içi kilitle korunur; STATE_BACKEND=postgres ve çok
+worker'da sayaç güncellemeleri yarışabilir - TTL güvenlik ağı sızıntıyı sınırlar.
+"""
+
+import uuid
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+from session_expiry import ExpiryIndex
+from state_store import StateNamespace, approx_size
+from product_page import payload_hash
+
+
+class ProductListStore:
+    """Sonuç setlerini hash'e göre tekilleştirerek saklar, referans sayısıyla temizler"""
+
+    def __init__(self, sessions: StateNamespace, pages: StateNamespace, session_ttl: float):
+        self.sessions = sessions
+        self.pages = pages
+        self.session_ttl = session_ttl
+        self.expiry = ExpiryIndex()
+        self._owned = {}  # bu process'in açtığı session -> content_hash (süre dolunca bırakılacak referans)
+        self._lock = threading.Lock()
+        self._stats = {"stored": 0, "deduped": 0, "bytes_deduped": 0, "released": 0, "pages_evicted": 0}
+
+    def put(self, payload: Dict[str, Any], whatsapp_number: str) -> Tuple[str, str]:
+        """Sonuç setini kaydet (varsa mevcut sayfayı kullan) -> (session_id, content_hash)"""
+        content_hash = payload_hash(payload)
+        session_id = uuid.uuid4().hex[:8]
+        with self._lock:
+            page = self.pages.get(content_hash)
+            if page is None:
+                page = {"payload": payload, "refs": 0}
+            else:
+                self._stats["deduped"] += 1
+                self._stats["bytes_deduped"] += approx_size(payload)
+            page["refs"] += 1
+            # Tekrar set: refs güncellenir ve sayfanın TTL'i yenilenir
+            self.pages[content_hash] = page
+            self.sessions[session_id] = {"content": content_hash, "whatsapp_number": whatsapp_number}
+            self.expiry.touch(session_id, self.session_ttl)
+            self._owned[session_id] = content_hash
+            self._stats["stored"] += 1
+        return session_id, content_hash
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Session'ın sayfası: {"content_hash", "payload", "whatsapp_number"} veya None"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        page = self.pages.get(session["content"])
+        if page is None:
+            return None
+        return {"content_hash": session["content"], "payload": page["payload"],
+                "whatsapp_number": session["whatsapp_number"]}
+
+    def _release(self, content_hash: str):
+        page = self.pages.get(content_hash)
+        if page is None:
+            return
+        page["refs"] -= 1
+        if page["refs"] <= 0:
+            self.pages.pop(content_hash, None)
+            self._stats["pages_evicted"] += 1
+        else:
+            self.pages[content_hash] = page
+
+    def release_expired(self) -> int:
+        """Süresi dolan session'ları sil ve sayfa referanslarını bırak - sweeper'dan çağrılır"""
+        released = 0
+        with self._lock:
+            for session_id in self.expiry.pop_expired():
+                # Session kaydı namespace TTL'i ile zaten düşmüş olabilir - referans yine bırakılır
+                self.sessions.pop(session_id, None)
+                self._release(self._owned.pop(session_id))
+                released += 1
+            self._stats["released"] += released
+        return released
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stored = self._stats["stored"]
+            return dict(
+                self._stats,
+                dedupe_ratio=round(self._stats["deduped"] / stored, 3) if stored else 0.0,
+                live_sessions=len(self.expiry),
+                live_pages=len(self.pages),
+            )
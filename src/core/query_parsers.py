@@ -0,0 +1,287 @@
+"""
+Rule-based Query Parsers - LLM'den önce deterministik parametre çıkarma
+Yaygın kalıplar ("100x200 silindir", "63 çap 160 strok") için OpenRouter
+çağrısı yapılmaz; güven skoru düşükse çağıran taraf LLM'e düşer.
+Olumsuz extras ("yastıksız 100x200 silindir", "sensörsüz silindir 63 çap")
+kurala bırakılmaz - güven düşürülür, LLM yorumlar
+"""
+
+import os
+import re
+import threading
+from typing import Dict, List, Any
+
+# Bu değerin altındaki güven skorlarında LLM kullanılır
+PARSER_MIN_CONFIDENCE = float(os.getenv('PARSER_MIN_CONFIDENCE', 0.8))
+
+# Sorgudaki sohbet / stok kelimeleri - extras'a girmez
+QUERY_NOISE_WORDS = {
+    'arıyorum', 'ariyorum', 'istiyorum', 'lazım', 'lazim', 'var', 'mı', 'mi', 'mu', 'mü',
+    'fiyat', 'fiyatı', 'fiyati', 'ne', 'kadar', 'ürün', 'urun', 'stokta', 'stok', 'olan',
+    'mevcut', 'için', 'icin', 'bana', 'bir', 've', 'tane', 'adet', 'kaç', 'kac', 'tl',
+    'özellikli', 'ozellikli', 'mm', 'model', 'lütfen', 'lutfen', 'stock', 'available'
+}
+
+# Silindir extras kelimeleri (LLM prompt'undaki tanımlayıcı listesi, ASCII katlanmış)
+# Kelime bunlardan biri + EXTRA_SUFFIXES'ten bir ek olmalı: "sensörlü" -> "sensor" + "lu"
+# ("tekerlekli", "magazin" eşleşmez - LLM'e düşer)
+CYLINDER_EXTRA_WORDS = (
+    'manyetik', 'magnet', 'magnetik', 'mag', 'yastik', 'cushion', 'sensor', 'mafsal', 'baglanti',
+    'cift', 'tek', 'etkili', 'paslanmaz', 'inox', 'flans', 'vida', 'pnomatik', 'hidrolik',
+    'hiz', 'hizli', 'krom', 'doner', 'sabit', 'ayarlanabilir', 'kompakt', 'uzun', 'kisa', 'iso',
+    'mil', 'rod', 'profil', 'mini', 'kilavuz', 'burc', 'catal'
+)
+
+# Valf extras kelimeleri (extract_valve_params_with_ai prompt'undaki liste, ASCII katlanmış)
+# CYLINDER_EXTRA_WORDS gibi kelime + EXTRA_SUFFIXES: "kollu" eşleşir, "kolay" / "tekrar" / "yayın" eşleşmez
+VALVE_EXTRA_WORDS = (
+    'pnomatik', 'hidrolik', 'namur', 'paslanmaz', 'inox', 'pirinc', 'aluminyum', 'atex',
+    'ex-proof', 'exproof', 'yuksek', 'basinc', 'vakum', 'hizli', 'yavas', 'manyetik', 'manuel',
+    'otomatik', 'flans', 'disli', 'rakor', 'push-in', 'hortum', 'selenoid', 'solenoid', 'bobin',
+    'pilot', 'kontrol', 'susturucu', 'egzoz', 'sessiz', 'yay', 'cift', 'tek', 'bistable',
+    'monostable', 'sertifika', 'elektrik', 'mekanik', 'pedal', 'buton', 'kol'
+)
+
+# Valf tipi (yol/konum) ve standart bağlantı dişleri - iki küme kesişmez
+VALVE_TYPES = ('2/2', '3/2', '4/2', '5/2', '3/3', '4/3', '5/3')
+VALVE_CONNECTION_SIZES = ('1/8', '1/4', '3/8', '1/2', '3/4')
+
+# Çap / strok ekleri: 100'lük, 63 lük, 50li
+_SIZE_SUFFIX = r"['’]?\s*(?:lük|luk|lik|lık|lu|lü|li|lı)\b"
+
+_CYLINDER_PATTERNS = {
+    # 100x200, 100 X 200, 100*200, 100×200
+    'cap_strok': re.compile(r'(\d{1,4})\s*[x×*]\s*(\d{1,4})'),
+    # 100 lük
+    'cap_suffix': re.compile(r'(\d{1,4})' + _SIZE_SUFFIX),
+    # Etiketli ölçüler: "63 çap 160 strok", "çap 63 strok 160", "Ø63", "160mm stroklu"
+    'labeled': re.compile(r'\d{1,4}|(?:çap|cap|strok)[^\W\d]*|ø'),
+}
+
+_VALVE_PATTERNS = {
+    # 5/2, 5 / 2
+    'tip': re.compile(r'(?<![\d/])([2-5])\s*/\s*([2-3])(?![\d/])'),
+    # 1/4, 1/4", 1/4 inç, bağlantı 1/4, 1/4 bağlantılı
+    'baglanti': re.compile(
+        r'(?:bağlantı\w*\s*|baglanti\w*\s*)?(?<![\d/])([13])\s*/\s*([248])(?![\d/])'
+        r'(?:\s*(?:"|”|inç|inc|inch|bağlantı\w*|baglanti\w*))?'
+    ),
+}
+
+
+def turkish_lower(text: str) -> str:
+    """Türkçe küçük harf (I -> ı, İ -> i)"""
+    return text.replace('I', 'ı').replace('İ', 'i').lower()
+
+
+def fold_turkish(text: str) -> str:
+    """Türkçe karakterleri ASCII'ye katla (küçük harf metin için)"""
+    return text.translate(str.maketrans('çğıöşü', 'cgiosu'))
+
+
+# Extras kelimesinden sonra kabul edilen ekler (katlanmış): -lı/-li/-lu/-lü, -lık/-luk, -ı/-u, -ler/-lar
+EXTRA_SUFFIXES = ('', 'li', 'lu', 'lik', 'luk', 'i', 'u', 'ler', 'lar')
+
+# Olumsuzluk eki: -sız/-siz/-suz/-süz (katlanmış: siz/suz) - "yastıksız", "sensörsüz"
+_NEGATION_SUFFIX = re.compile(r'^(.+)s[iu]z')
+
+_TOKEN = re.compile(r'[^\W\d_]+(?:-[^\W\d_]+)*')
+
+
+def _is_extra_word(folded: str, words: tuple) -> bool:
+    """Kelime listedeki bir kelime + kapalı listeden bir ek mi (önek eşleşmesi yok)"""
+    return any(folded.startswith(word) and folded[len(word):] in EXTRA_SUFFIXES for word in words)
+
+
+def _is_negated(folded: str, words: tuple) -> bool:
+    """Kelime bilinen bir kelime + olumsuzluk eki mi ("sessiz" değil: "ses" listede değil)"""
+    match = _NEGATION_SUFFIX.match(folded)
+    return match is not None and match.group(1) in words
+
+
+def _extra_tokens(text: str, words: tuple, query: str) -> Dict[str, List[str]]:
+    """
+    Kalan kelimeleri bilinen extras, olumsuz extras ve bilinmeyenler olarak ayır.
+    Eşleştirme Türkçe katlanmış hal ile yapılır; extras değeri sorgudaki yazılışıdır
+    ("ISO" -> "ıso" olmasın, ILIKE katalogdaki "ISO" ile eşleşsin).
+    """
+    originals = {}
+    for word in _TOKEN.findall(query):
+        originals.setdefault(turkish_lower(word), word)
+
+    known = []
+    negated = []
+    unknown = []
+    for token in _TOKEN.findall(text):
+        if token in QUERY_NOISE_WORDS or len(token) < 2:
+            continue
+        folded = fold_turkish(token)
+        value = originals.get(token, token)
+        if _is_negated(folded, words):
+            # "yastıksız"ı "yastıklı" sanmamak için LLM'e bırak
+            negated.append(value)
+        elif _is_extra_word(folded, words):
+            if value not in known:
+                known.append(value)
+        else:
+            unknown.append(value)
+    return {"known": known, "negated": negated, "unknown": unknown}
+
+
+def parse_cylinder_query(query: str) -> Dict[str, Any]:
+    """
+    Silindir sorgusundan cap/strok/extras çıkar.
+    Dönüş: {"cap", "strok", "extras", "confidence"} - confidence 0..1
+
+    "100x200 silindir"           -> cap=100, strok=200, confidence=1.0
+    "63 çap 160 strok sensörlü"  -> cap=63, strok=160, extras=["sensörlü"], confidence=1.0
+    "100 lük ISO silindir"       -> cap=100, extras=["ISO"], confidence=1.0
+    "yastıksız 100x200 silindir" -> confidence=0.5 (olumsuz extra - LLM)
+    "sensörsüz silindir 63 çap"  -> confidence=0.5 (olumsuz extra - LLM)
+    "100x200 tekerlekli silindir" -> confidence=0.5 (bilinmeyen kelime - LLM)
+    """
+    text = turkish_lower(query or '')
+    cap = None
+    strok = None
+    ambiguous = False
+
+    def blank(spans):
+        # Eşleşen bölümleri sil ki sayı/ek extras'a karışmasın (uzunluk korunur)
+        nonlocal text
+        for start, end in spans:
+            text = text[:start] + ' ' * (end - start) + text[end:]
+
+    match = _CYLINDER_PATTERNS['cap_strok'].search(text)
+    if match:
+        cap, strok = int(match.group(1)), int(match.group(2))
+        blank([match.span()])
+
+    # Etiketler sayıdan sonra mı ("63 çap") önce mi ("çap 63") - iki okuma da mümkünse belirsiz
+    items = list(_CYLINDER_PATTERNS['labeled'].finditer(text))
+    label_indexes = [i for i, item in enumerate(items) if not item.group().isdigit()]
+    if label_indexes:
+        def number_at(i):
+            return 0 <= i < len(items) and items[i].group().isdigit()
+
+        postfix = all(number_at(i - 1) for i in label_indexes)
+        prefix = all(number_at(i + 1) for i in label_indexes)
+        if postfix != prefix:
+            offset = -1 if postfix else 1
+            for i in label_indexes:
+                value = int(items[i + offset].group())
+                if items[i].group().startswith('strok'):
+                    ambiguous = ambiguous or strok is not None
+                    strok = value
+                else:
+                    ambiguous = ambiguous or cap is not None
+                    cap = value
+            blank([items[i].span() for i in label_indexes] + [items[i + offset].span() for i in label_indexes])
+        else:
+            ambiguous = True
+
+    if cap is None:
+        match = _CYLINDER_PATTERNS['cap_suffix'].search(text)
+        if match:
+            cap = int(match.group(1))
+            blank([match.span()])
+
+    # "silindir", "silindiri", "silindirler"
+    text = re.sub(r'silindir\w*', ' ', text)
+    tokens = _extra_tokens(text, CYLINDER_EXTRA_WORDS, query or '')
+    leftover_numbers = re.findall(r'\d+', text)
+
+    # Güven: ölçü veya bilinen extra bulunmalı; yorumlanamayan sayı/kelime varsa LLM karar versin
+    if cap is None and strok is None and not tokens["known"]:
+        confidence = 0.0
+    elif ambiguous or leftover_numbers:
+        confidence = 0.3
+    elif tokens["unknown"] or tokens["negated"]:
+        confidence = 0.5
+    elif cap is None and strok is None:
+        confidence = 0.8
+    else:
+        confidence = 1.0
+
+    return {
+        "cap": cap,
+        "strok": strok,
+        "extras": tokens["known"],
+        "confidence": confidence
+    }
+
+
+def parse_valve_query(query: str) -> Dict[str, Any]:
+    """
+    Valf sorgusundan tip/baglanti/extras çıkar.
+    Dönüş: {"tip", "baglanti", "extras", "confidence"} - confidence 0..1
+
+    "5/2 1/4 valf"               -> tip="5/2", baglanti="1/4", confidence=1.0
+    "5/2 sessiz valf"            -> extras=["sessiz"], confidence=1.0
+    "3/2 kollu valf"             -> extras=["kollu"], confidence=1.0
+    "5/2 kolay valf"             -> confidence=0.5 (bilinmeyen kelime - LLM)
+    "manyetiksiz 5/2 valf"       -> confidence=0.5 (olumsuz extra - LLM)
+    """
+    text = turkish_lower(query or '')
+    tip = None
+    baglanti = None
+    ambiguous = False
+
+    for match in _VALVE_PATTERNS['baglanti'].finditer(text):
+        candidate = f"{match.group(1)}/{match.group(2)}"
+        if candidate in VALVE_CONNECTION_SIZES:
+            baglanti = candidate
+            text = text[:match.start()] + ' ' + text[match.end():]
+            break
+
+    tips = [m for m in _VALVE_PATTERNS['tip'].finditer(text) if f"{m.group(1)}/{m.group(2)}" in VALVE_TYPES]
+    if tips:
+        tip = f"{tips[0].group(1)}/{tips[0].group(2)}"
+        ambiguous = len(tips) > 1
+        text = text[:tips[0].start()] + ' ' + text[tips[0].end():]
+
+    # "valf", "valfi", "valfler", "valve"
+    text = re.sub(r'val(?:f|v|ve)\w*', ' ', text)
+    tokens = _extra_tokens(text, VALVE_EXTRA_WORDS, query or '')
+    leftover_numbers = re.findall(r'\d+', text)
+
+    if tip is None and baglanti is None and not tokens["known"]:
+        confidence = 0.0
+    elif ambiguous or leftover_numbers:
+        confidence = 0.3
+    elif tokens["unknown"] or tokens["negated"]:
+        confidence = 0.5
+    elif tip is None and baglanti is None:
+        confidence = 0.8
+    else:
+        confidence = 1.0
+
+    return {
+        "tip": tip,
+        "baglanti": baglanti,
+        # extract_valve_params_with_ai ile aynı sınır
+        "extras": tokens["known"][:4],
+        "confidence": confidence
+    }
+
+
+class ParserStats:
+    """Kural tabanlı parser isabet sayaçları - kaç LLM çağrısından tasarruf edildiğini gösterir"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, parser: str, hit: bool):
+        """hit=True: kural yeterli oldu, LLM çağrılmadı"""
+        with self._lock:
+            entry = self._stats.setdefault(parser, {"rule_hits": 0, "llm_fallbacks": 0})
+            entry["rule_hits" if hit else "llm_fallbacks"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {name: dict(entry) for name, entry in self._stats.items()}
+        for entry in stats.values():
+            total = entry["rule_hits"] + entry["llm_fallbacks"]
+            entry["llm_calls_saved"] = entry["rule_hits"]
+            entry["hit_rate"] = round(entry["rule_hits"] / total, 3) if total else 0.0
+        return {"min_confidence": PARSER_MIN_CONFIDENCE, "parsers": stats}
@@ -0,0 +1,111 @@
+"""
+Session Expiry - son aktiviteye göre min-heap expiry index + arka plan sweeper
+Her mesajda tüm konuşmaları taramak yerine: touch() O(log n), süresi dolanlar
+heap'in tepesinden O(k log n) ile çıkar. Eski (yeniden touch edilmiş) heap
+kayıtları tembel silinir; birikirse heap yeniden kurulur
+"""
+
+import heapq
+import threading
+import time
+from typing import Callable, Dict, Any, List
+
+
+class ExpiryIndex:
+    """key -> deadline; heap'te aynı key'in eski kayıtları olabilir, geçerli olan _deadlines'takidir"""
+
+    # Eski kayıt sayısı canlı kayıtların bu katını geçerse heap'i yeniden kur
+    COMPACT_RATIO = 2
+
+    def __init__(self):
+        self._heap = []  # (deadline, key)
+        self._deadlines = {}  # key -> geçerli deadline
+        self._lock = threading.Lock()
+
+    def touch(self, key: str, ttl_seconds: float, now: float = None):
+        """Key'in son aktivitesini güncelle - deadline = now + ttl"""
+        deadline = (now if now is not None else time.monotonic()) + ttl_seconds
+        with self._lock:
+            self._deadlines[key] = deadline
+            heapq.heappush(self._heap, (deadline, key))
+            if len(self._heap) > (self.COMPACT_RATIO + 1) * max(len(self._deadlines), 64):
+                self._compact()
+
+    def discard(self, key: str):
+        """Key'i index'ten çıkar (heap kaydı tembel silinir)"""
+        with self._lock:
+            self._deadlines.pop(key, None)
+
+    def is_expired(self, key: str, now: float = None) -> bool:
+        now = now if now is not None else time.monotonic()
+        with self._lock:
+            deadline = self._deadlines.get(key)
+        return deadline is not None and deadline <= now
+
+    def pop_expired(self, now: float = None) -> List[str]:
+        """Süresi dolan key'leri index'ten çıkar ve döndür"""
+        now = now if now is not None else time.monotonic()
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, key = heapq.heappop(self._heap)
+                # Sonradan touch edilmiş veya discard edilmiş key'in eski kaydı
+                if self._deadlines.get(key) == deadline:
+                    del self._deadlines[key]
+                    expired.append(key)
+        return expired
+
+    def _compact(self):
+        self._heap = [(deadline, key) for key, deadline in self._deadlines.items()]
+        heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._deadlines)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tracked_keys": len(self._deadlines),
+                "heap_entries": len(self._heap),
+                "stale_entries": len(self._heap) - len(self._deadlines),
+            }
+
+
+class SessionSweeper:
+    """sweep() fonksiyonunu request yolunun dışında, sabit aralıkla çalıştıran daemon thread"""
+
+    def __init__(self, sweep: Callable[[], int], interval_seconds: float, name: str = "session-sweeper"):
+        self.sweep = sweep  # sweep() -> çıkarılan oturum (veya kayıt) sayısı
+        self.interval_seconds = interval_seconds
+        self.name = name
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {"runs": 0, "evicted": 0, "last_run_ms": 0.0, "last_run_at": None, "errors": 0}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        print(f"[SWEEPER] {self.name} started (every {self.interval_seconds}s)")
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            start = time.perf_counter()
+            try:
+                evicted = self.sweep()
+            except Exception as e:
+                print(f"[SWEEPER] {self.name} sweep error: {e}")
+                self._stats["errors"] += 1
+                continue
+            self._stats["runs"] += 1
+            self._stats["evicted"] += evicted
+            self._stats["last_run_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            self._stats["last_run_at"] = time.time()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self._stats, interval_seconds=self.interval_seconds, running=self._thread is not None)
@@ -0,0 +1,475 @@
+"""
+State Store - konuşma durumu için değiştirilebilir backend
+Namespace'ler: conversation, extracted_context, selected_product, product_list, product_page
+- memory: process içi dict (varsayılan, eski davranış)
+- postgres: conversation_state tablosu (migration 009); yazmalar arka planda
+  toplu upsert edilir (write-behind), okumalar yerel LRU cache'ten geçer (read-through)
+
+Değerler JSON'a çevrilebilir olmalı (datetime desteklenir). Yerinde değiştirilen
+değer store'a tekrar set edilmelidir: namespace[key] = value
+"""
+
+import os
+import abc
+import sys
+import json
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional
+
+# Yazma kuyruğunda silme işareti / cache'te "DB'de yok" işareti
+_DELETED = object()
+_MISSING = object()
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _json_object_hook(obj):
+    if len(obj) == 1 and "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+def dump_state(value) -> str:
+    return json.dumps(value, ensure_ascii=False, default=_json_default)
+
+
+def load_state(text: str):
+    return json.loads(text, object_hook=_json_object_hook)
+
+
+def approx_size(value) -> int:
+    """Yaklaşık bellek kullanımı (byte) - iç içe dict/list/tuple/str için sys.getsizeof toplamı"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(approx_size(item) for item in value)
+    return size
+
+
+class StateNamespace:
+    """Tek namespace için dict benzeri görünüm - mevcut kod dict gibi kullanmaya devam eder"""
+
+    def __init__(self, store: 'StateStore', name: str, ttl_seconds: float = None):
+        self.store = store
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key: str, default=None):
+        return self.store.get(self.name, key, default)
+
+    def __getitem__(self, key: str):
+        value = self.store.get(self.name, key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value):
+        self.store.set(self.name, key, value, self.ttl_seconds)
+
+    def __delitem__(self, key: str):
+        if not self.store.delete(self.name, key):
+            raise KeyError(key)
+
+    def __contains__(self, key: str) -> bool:
+        return self.store.get(self.name, key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return self.store.count(self.name)
+
+    def pop(self, key: str, default=None):
+        value = self.store.get(self.name, key, _MISSING)
+        if value is _MISSING:
+            return default
+        self.store.delete(self.name, key)
+        return value
+
+    def keys(self) -> List[str]:
+        return self.store.keys(self.name)
+
+    def clear(self):
+        self.store.clear(self.name)
+
+
+class StateStore(abc.ABC):
+    """Backend arayüzü - eksik metodu olan backend oluşturulurken hata verir"""
+
+    backend = "base"
+
+    def namespace(self, name: str, ttl_seconds: float = None, max_entries: int = None) -> StateNamespace:
+        """ttl_seconds: yaş sınırı, max_entries: LRU boyut sınırı (kalıcı backend'lerde TTL yeterli)"""
+        self.configure(name, max_entries)
+        return StateNamespace(self, name, ttl_seconds)
+
+    def configure(self, namespace: str, max_entries: int = None):
+        pass
+
+    def purge_expired(self) -> int:
+        """Süresi dolmuş kayıtları sil - sweeper thread'inden çağrılır"""
+        return 0
+
+    @abc.abstractmethod
+    def get(self, namespace: str, key: str, default=None):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def set(self, namespace: str, key: str, value, ttl_seconds: float = None):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete(self, namespace: str, key: str) -> bool:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def keys(self, namespace: str) -> List[str]:
+        raise NotImplementedError
+
+    def count(self, namespace: str) -> int:
+        return len(self.keys(namespace))
+
+    @abc.abstractmethod
+    def clear(self, namespace: str):
+        raise NotImplementedError
+
+    def flush(self) -> bool:
+        """Bekleyen yazmaları kalıcı hale getir (memory backend'de no-op)"""
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend}
+
+
+class MemoryStateStore(StateStore):
+    """Process içi LRU dict'ler - namespace başına boyut (max_entries) ve yaş (TTL) sınırlı.
+    Restart'ta kaybolur, process'ler arasında paylaşılmaz"""
+
+    backend = "memory"
+
+    def __init__(self):
+        self._data = {}  # namespace -> OrderedDict{key: (expires_at | None, value)} (LRU sırası)
+        self._limits = {}  # namespace -> max_entries
+        self._counters = {}  # namespace -> {"evictions", "expired"}
+        self._lock = threading.Lock()
+
+    def _entries(self, namespace: str) -> OrderedDict:
+        # _lock altında çağrılır
+        entries = self._data.get(namespace)
+        if entries is None:
+            entries = self._data[namespace] = OrderedDict()
+            self._counters[namespace] = {"evictions": 0, "expired": 0}
+        return entries
+
+    def configure(self, namespace: str, max_entries: int = None):
+        with self._lock:
+            self._entries(namespace)
+            self._limits[namespace] = max_entries
+
+    def get(self, namespace: str, key: str, default=None):
+        with self._lock:
+            entries = self._entries(namespace)
+            entry = entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] is not None and entry[0] <= time.time():
+                del entries[key]
+                self._counters[namespace]["expired"] += 1
+                return default
+            entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, namespace: str, key: str, value, ttl_seconds: float = None):
+        expires_at = time.time() + ttl_seconds if ttl_seconds else None
+        with self._lock:
+            entries = self._entries(namespace)
+            entries[key] = (expires_at, value)
+            entries.move_to_end(key)
+            max_entries = self._limits.get(namespace)
+            while max_entries and len(entries) > max_entries:
+                entries.popitem(last=False)
+                self._counters[namespace]["evictions"] += 1
+
+    def delete(self, namespace: str, key: str) -> bool:
+        with self._lock:
+            return self._entries(namespace).pop(key, None) is not None
+
+    def keys(self, namespace: str) -> List[str]:
+        now = time.time()
+        with self._lock:
+            return [key for key, (expires_at, _) in self._entries(namespace).items()
+                    if expires_at is None or expires_at > now]
+
+    def clear(self, namespace: str):
+        with self._lock:
+            self._entries(namespace).clear()
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        purged = 0
+        with self._lock:
+            for namespace, entries in self._data.items():
+                expired = [key for key, (expires_at, _) in entries.items()
+                           if expires_at is not None and expires_at <= now]
+                for key in expired:
+                    del entries[key]
+                self._counters[namespace]["expired"] += len(expired)
+                purged += len(expired)
+        return purged
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = {namespace: list(entries.values()) for namespace, entries in self._data.items()}
+            counters = {namespace: dict(counter) for namespace, counter in self._counters.items()}
+            limits = dict(self._limits)
+        namespaces = {}
+        for namespace, entries in snapshot.items():
+            namespaces[namespace] = dict(
+                counters[namespace],
+                entries=len(entries),
+                max_entries=limits.get(namespace),
+                approx_bytes=sum(approx_size(value) for _, value in entries)
+            )
+        return {"backend": self.backend, "namespaces": namespaces}
+
+
+class PostgresStateStore(StateStore):
+    """conversation_state tablosu + write-behind kuyruk + read-through LRU cache"""
+
+    backend = "postgres"
+
+    # Her N flush'ta bir süresi dolmuş satırları sil
+    PRUNE_EVERY_FLUSHES = 200
+
+    def __init__(self, cursor_factory: Callable, flush_interval: float = None, batch_size: int = None,
+                 cache_ttl: float = None, cache_size: int = None):
+        self._cursor_factory = cursor_factory  # DatabaseManager.get_cursor
+        self.flush_interval = (flush_interval if flush_interval is not None
+                               else float(os.getenv('STATE_FLUSH_INTERVAL', 0.5)))
+        self.batch_size = batch_size if batch_size is not None else int(os.getenv('STATE_BATCH_SIZE', 100))
+        # Başka bir worker process'in yazdığını bu süreden sonra görürüz
+        self.cache_ttl = cache_ttl if cache_ttl is not None else float(os.getenv('STATE_CACHE_TTL', 5))
+        self.cache_size = cache_size if cache_size is not None else int(os.getenv('STATE_CACHE_SIZE', 10000))
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._cache = OrderedDict()  # (namespace, key) -> (cached_at, value | _MISSING)
+        self._pending = OrderedDict()  # (namespace, key) -> (json | _DELETED, ttl_seconds)
+        self._wakeup = threading.Event()
+        self._flusher_pid = None
+        self._flush_count = 0
+        self._stats = {"cache_hits": 0, "cache_misses": 0, "writes": 0, "coalesced": 0,
+                       "flushes": 0, "rows_flushed": 0, "flush_errors": 0, "last_flush_ms": 0.0}
+
+    def _ensure_flusher(self):
+        """Flusher thread'i process başına (fork sonrası) ilk yazmada başlat"""
+        if self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._run_flusher, name="state-flusher", daemon=True).start()
+        print(f"[STATE] Write-behind flusher started (every {self.flush_interval}s, batch {self.batch_size})")
+
+    def _run_flusher(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _cache_put(self, cache_key, value):
+        # _lock altında çağrılır
+        self._cache[cache_key] = (time.monotonic(), value)
+        self._cache.move_to_end(cache_key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def get(self, namespace: str, key: str, default=None):
+        cache_key = (namespace, key)
+        with self._lock:
+            pending = self._pending.get(cache_key)
+            entry = self._cache.get(cache_key)
+            # Kendi yazdığımızı hemen görürüz - flush beklenmez
+            if pending is not None:
+                self._stats["cache_hits"] += 1
+                if entry is not None:
+                    value = entry[1]
+                else:
+                    value = _MISSING if pending[0] is _DELETED else load_state(pending[0])
+                return default if value is _MISSING else value
+            if entry is not None and time.monotonic() - entry[0] < self.cache_ttl:
+                self._cache.move_to_end(cache_key)
+                self._stats["cache_hits"] += 1
+                return default if entry[1] is _MISSING else entry[1]
+            self._stats["cache_misses"] += 1
+
+        value = _MISSING
+        try:
+            with self._cursor_factory() as cursor:
+                cursor.execute("""
+                    SELECT value::text FROM conversation_state
+                    WHERE namespace = %s AND key = %s AND (expires_at IS NULL OR expires_at > NOW())
+                """, (namespace, key))
+                row = cursor.fetchone()
+            if row:
+                value = load_state(row[0])
+        except Exception as e:
+            print(f"[STATE] Read error ({namespace}/{key}): {e}")
+            return default
+
+        with self._lock:
+            # Okuma sırasında yazılan değer daha yeni - onu döndür
+            concurrent_write = cache_key in self._pending
+            if not concurrent_write:
+                self._cache_put(cache_key, value)
+        if concurrent_write:
+            return self.get(namespace, key, default)
+        return default if value is _MISSING else value
+
+    def set(self, namespace: str, key: str, value, ttl_seconds: float = None):
+        # Değerin o anki hali yazılır - sonraki yerinde değişiklikler yeni set() ister
+        serialized = dump_state(value)
+        cache_key = (namespace, key)
+        with self._lock:
+            if cache_key in self._pending:
+                self._stats["coalesced"] += 1
+            self._pending[cache_key] = (serialized, ttl_seconds)
+            self._cache_put(cache_key, value)
+            self._stats["writes"] += 1
+            full = len(self._pending) >= self.batch_size
+        self._ensure_flusher()
+        if full:
+            self._wakeup.set()
+
+    def delete(self, namespace: str, key: str) -> bool:
+        existed = self.get(namespace, key, _MISSING) is not _MISSING
+        cache_key = (namespace, key)
+        with self._lock:
+            self._pending[cache_key] = (_DELETED, None)
+            self._cache_put(cache_key, _MISSING)
+            self._stats["writes"] += 1
+        self._ensure_flusher()
+        return existed
+
+    def keys(self, namespace: str) -> List[str]:
+        self.flush()
+        try:
+            with self._cursor_factory() as cursor:
+                cursor.execute("""
+                    SELECT key FROM conversation_state
+                    WHERE namespace = %s AND (expires_at IS NULL OR expires_at > NOW())
+                """, (namespace,))
+                return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            print(f"[STATE] Keys error ({namespace}): {e}")
+            return []
+
+    def count(self, namespace: str) -> int:
+        self.flush()
+        try:
+            with self._cursor_factory() as cursor:
+                cursor.execute("""
+                    SELECT COUNT(*) FROM conversation_state
+                    WHERE namespace = %s AND (expires_at IS NULL OR expires_at > NOW())
+                """, (namespace,))
+                return cursor.fetchone()[0]
+        except Exception as e:
+            print(f"[STATE] Count error ({namespace}): {e}")
+            return 0
+
+    def clear(self, namespace: str):
+        self.flush()
+        with self._lock:
+            for cache_key in [k for k in self._cache if k[0] == namespace]:
+                del self._cache[cache_key]
+        with self._cursor_factory() as cursor:
+            cursor.execute("DELETE FROM conversation_state WHERE namespace = %s", (namespace,))
+
+    def flush(self) -> bool:
+        """Bekleyen yazmaları tek transaction'da toplu upsert / delete et"""
+        from psycopg2.extras import execute_values
+
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return True
+                batch = self._pending
+                self._pending = OrderedDict()
+
+            upserts = [(namespace, key, value, ttl) for (namespace, key), (value, ttl) in batch.items()
+                       if value is not _DELETED]
+            deletes = [(namespace, key) for (namespace, key), (value, _) in batch.items() if value is _DELETED]
+            start = time.perf_counter()
+            try:
+                with self._cursor_factory() as cursor:
+                    if upserts:
+                        execute_values(cursor, """
+                            INSERT INTO conversation_state (namespace, key, value, updated_at, expires_at)
+                            SELECT v.namespace, v.key, v.value::jsonb, NOW(),
+                                   CASE WHEN v.ttl IS NULL THEN NULL
+                                        ELSE NOW() + v.ttl::float * INTERVAL '1 second' END
+                            FROM (VALUES %s) AS v(namespace, key, value, ttl)
+                            ON CONFLICT (namespace, key) DO UPDATE
+                            SET value = EXCLUDED.value, updated_at = EXCLUDED.updated_at,
+                                expires_at = EXCLUDED.expires_at
+                        """, upserts)
+                    if deletes:
+                        execute_values(cursor, """
+                            DELETE FROM conversation_state c
+                            USING (VALUES %s) AS v(namespace, key)
+                            WHERE c.namespace = v.namespace AND c.key = v.key
+                        """, deletes)
+                    self._flush_count += 1
+                    if self._flush_count % self.PRUNE_EVERY_FLUSHES == 0:
+                        cursor.execute("DELETE FROM conversation_state WHERE expires_at <= NOW()")
+            except Exception as e:
+                print(f"[STATE] Flush error ({len(batch)} rows): {e}")
+                with self._lock:
+                    self._stats["flush_errors"] += 1
+                    # Bu arada daha yeni yazılmamış olanları kuyruğa geri koy
+                    for cache_key, item in batch.items():
+                        self._pending.setdefault(cache_key, item)
+                return False
+
+            with self._lock:
+                self._stats["flushes"] += 1
+                self._stats["rows_flushed"] += len(batch)
+                self._stats["last_flush_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            return True
+
+    def purge_expired(self) -> int:
+        """Süresi dolmuş satırları sil (yerel cache TTL ile kendiliğinden tazelenir)"""
+        try:
+            with self._cursor_factory() as cursor:
+                cursor.execute("DELETE FROM conversation_state WHERE expires_at <= NOW()")
+                return cursor.rowcount
+        except Exception as e:
+            print(f"[STATE] Purge error: {e}")
+            return 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending_writes"] = len(self._pending)
+            stats["cache_size"] = len(self._cache)
+        stats["backend"] = self.backend
+        stats["flush_interval"] = self.flush_interval
+        stats["cache_ttl"] = self.cache_ttl
+        return stats
+
+
+def create_state_store(cursor_factory: Optional[Callable] = None) -> StateStore:
+    """STATE_BACKEND=memory|postgres - Postgres yoksa memory'ye düşer"""
+    backend = os.getenv('STATE_BACKEND', 'memory').lower()
+    if backend == 'postgres':
+        if cursor_factory is not None:
+            print("[STATE] Postgres state store (write-behind + read-through cache)")
+            return PostgresStateStore(cursor_factory)
+        print("[STATE WARNING] STATE_BACKEND=postgres but no DB pool - using memory store")
+    return MemoryStateStore()
@@ -0,0 +1,68 @@
+// Ürün listesi sayfası - kartlar sunucuda çizilir, ürün bilgisi data-* attribute'larında
+(function () {
+    // Sayfa adı (products_<whatsapp>_<session>_<timestamp>) /select-product için session id'dir
+    var pageName = decodeURIComponent(location.pathname.replace(/\/+$/, '').split('/').pop());
+
+    function el(tag, className, text) {
+        var node = document.createElement(tag);
+        if (className) node.className = className;
+        if (text !== undefined) node.textContent = text;
+        return node;
+    }
+
+    function selectProduct(code, name, price) {
+        var whatsappMsg = "URUN_SECILDI: " + code + " - " + name + " - " + price + " TL";
+
+        fetch('/select-product', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                message: whatsappMsg,
+                sessionId: pageName,
+                productCode: code,
+                productName: name,
+                productPrice: price
+            })
+        }).catch(function () {
+            // Ad blocker vb. - clipboard kopyası yeterli
+            console.log('Fetch blocked, showing copy dialog');
+        });
+
+        navigator.clipboard.writeText(whatsappMsg).then(showSuccessOverlay, showSuccessOverlay);
+    }
+
+    function showSuccessOverlay() {
+        var overlay = el('div', 'overlay');
+        var popup = el('div', 'popup');
+        var message = el('p');
+        message.innerHTML = '👆 Back tuşuna basarak<br>WhatsApp\'a dönebilirsiniz';
+        var closeBtn = el('button', null, 'Tamam');
+
+        popup.appendChild(el('div', 'popup-icon', 'OK'));
+        popup.appendChild(el('h3', null, 'Ürün Seçildi!'));
+        popup.appendChild(message);
+        popup.appendChild(closeBtn);
+        overlay.appendChild(popup);
+        document.body.appendChild(overlay);
+        setTimeout(function () { overlay.classList.add('visible'); }, 50);
+
+        closeBtn.onclick = function () {
+            overlay.classList.remove('visible');
+            setTimeout(function () {
+                if (document.body.contains(overlay)) {
+                    document.body.removeChild(overlay);
+                }
+            }, 300);
+        };
+        overlay.onclick = function (e) {
+            if (e.target === overlay) closeBtn.onclick();
+        };
+    }
+
+    document.getElementById('products').addEventListener('click', function (e) {
+        var card = e.target.closest('.product');
+        if (card) {
+            selectProduct(card.dataset.code, card.dataset.name, card.dataset.price);
+        }
+    });
+})();
@@ -14,12 +14,13 @@ import json
 import random
 import re
 import time
-import hashlib
-import requests
+import threading
 from datetime import datetime, timedelta
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from typing import Dict, List, Any, Tuple
-from swarm import Swarm, Agent
-from flask import Flask, request, jsonify
+from swarm import Agent
+from swarm.types import Result
+from flask import Flask, Response, request, jsonify
 
 # Fix Windows encoding issues
 if sys.platform == "win32":
@@ -49,13 +50,39 @@ except ImportError:
 
 # Database imports
 from database_tools_fixed import db
+from swarm_client import B2BSwarm, final_result
+from message_dispatcher import MessageDispatcher, LaneFullError
+from async_jobs import AsyncJobManager
+from session_expiry import ExpiryIndex, SessionSweeper
+from state_store import create_state_store
+from product_links import sign_product_token, PRODUCT_LINK_SECRET
+from product_page import ProductPageRenderer, compact_products, build_list_payload
+from product_results import ProductListStore
+from page_store import PageFileStore
 
 # ===================== CONFIGURATION =====================
 
-# Global context for WhatsApp number and selected product
-current_whatsapp_context = {}
-selected_product_context = {}
-product_list_sessions = {}  # Product list sessions for HTML generation
+# Konuşma durumu store'u - STATE_BACKEND=memory (process içi) | postgres (paylaşılan, migration 009)
+state_store = create_state_store(db.get_cursor if db.pool else None)
+
+# Kullanıcı / session anahtarlı paylaşılan durum - istek başına WhatsApp numarası
+# global'de tutulmaz, Swarm context_variables ile tool'lara gelir (request_whatsapp_number)
+# Boyut (LRU) ve yaş sınırları - uzun çalışan process'te sınırsız büyümesinler
+PRODUCT_SESSION_MAX = int(os.getenv('PRODUCT_SESSION_MAX', 500))
+PRODUCT_SESSION_TTL = float(os.getenv('PRODUCT_SESSION_TTL', 3600))
+SELECTED_PRODUCT_MAX = int(os.getenv('SELECTED_PRODUCT_MAX', 5000))
+SELECTED_PRODUCT_TTL = float(os.getenv('SELECTED_PRODUCT_TTL', 1800))
+CONVERSATION_MAX = int(os.getenv('CONVERSATION_MAX', 10000))
+MAX_CONTEXT_FEATURES = 10
+
+selected_product_context = state_store.namespace('selected_product', SELECTED_PRODUCT_TTL, SELECTED_PRODUCT_MAX)
+product_list_sessions = state_store.namespace('product_list', PRODUCT_SESSION_TTL, PRODUCT_SESSION_MAX)  # {session_id: content_hash + whatsapp}
+# Aynı sonuç setleri tek sayfa olarak saklanır (content_hash -> payload + refs); sayfa sayısı <= session sayısı
+product_pages = state_store.namespace('product_page', PRODUCT_SESSION_TTL * 2, PRODUCT_SESSION_MAX)
+product_lists = ProductListStore(product_list_sessions, product_pages, PRODUCT_SESSION_TTL)
+product_page_renderer = ProductPageRenderer()
+# Tekil sayfaların .html/.gz/.br dosyaları (PRODUCT_PAGES_DIR) - yaş/boyut retention'lı
+page_files = PageFileStore()
 
 # OpenRouter Custom Client - Swarm ile uyumlu
 import openai
@@ -66,8 +93,8 @@ openai_client = openai.OpenAI(
     api_key=os.getenv('OPENROUTER_API_KEY')
 )
 
-# Swarm client - Custom OpenRouter client ile
-client = Swarm(client=openai_client)
+# Swarm client - Custom OpenRouter client ile (terminal tool sonuçlarında run erken biter)
+client = B2BSwarm(client=openai_client)
 
 OPENROUTER_MODEL = os.getenv('OPENROUTER_MODEL', 'openai/gpt-4o-mini')
 
@@ -313,221 +340,51 @@ def create_secure_product_link(filename, whatsapp_number):
     """
     Create a secure token-protected link for product HTML
 
+    Token process içinde HMAC ile imzalanır (product_links.sign_product_token) -
+    arama yolunda product server'a HTTP çağrısı yapılmaz.
+
     Args:
-        filename: HTML filename (e.g., products_905306897885_abc123_1234567890.html)
+        filename: Product list page name (e.g., products_905306897885_abc123_1234567890)
         whatsapp_number: WhatsApp number (e.g., 905306897885@c.us)
 
     Returns:
-        Secure URL with token or fallback to direct URL
+        Secure URL with signed token (direct URL only if PRODUCT_LINK_SECRET is missing)
     """
+    product_server_port = os.getenv('PRODUCT_SERVER_PORT', '3005')
+    tunnel_url = os.getenv('TUNNEL_URL', f'http://localhost:{product_server_port}').strip()
+
     try:
-        product_server_port = os.getenv('PRODUCT_SERVER_PORT', '3005')
-        tunnel_url = os.getenv('TUNNEL_URL', f'http://localhost:{product_server_port}')
-
-        # Try to create a secure token
-        token_api_url = f'http://localhost:{product_server_port}/api/create-token'
-
-        response = requests.post(token_api_url, json={
-            'filename': filename,
-            'whatsappNumber': whatsapp_number
-        }, timeout=2)
-
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('success') and data.get('secureUrl'):
-                # Replace localhost with tunnel URL if available
-                secure_url = data['secureUrl']
-                if tunnel_url and 'localhost' in secure_url:
-                    secure_url = secure_url.replace(f'http://localhost:{product_server_port}', tunnel_url)
-
-                print(f"[SECURE LINK] Created token-protected link: {secure_url[:50]}...")
-                return secure_url
-
-        # Fallback to direct link if token creation fails
-        print(f"[FALLBACK] Token creation failed, using direct link")
+        token = sign_product_token(filename, whatsapp_number)
+    except ValueError as e:
+        print(f"[SECURE LINK WARNING] {e} - using unprotected direct link")
         return f"{tunnel_url}/products/{filename}"
 
-    except Exception as e:
-        # Fallback to direct link on any error
-        print(f"[ERROR] Secure link creation failed: {e}, using direct link")
-        tunnel_url = os.getenv('TUNNEL_URL', 'http://localhost:3006')
-        return f"{tunnel_url}/products/{filename}"
+    secure_url = f"{tunnel_url}/view/{token}/{filename}"
+    print(f"[SECURE LINK] Signed token-protected link: {secure_url[:50]}...")
+    return secure_url
 
-def generate_product_html(products, query, html_filename):
-    """Generate HTML content for product list"""
-    html = f"""<!DOCTYPE html>
-<html lang="tr">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Ürün Listesi - {query}</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; margin: 20px; background: #f5f5f5; }}
-        .container {{ max-width: 800px; margin: 0 auto; background: white; padding: 20px; border-radius: 8px; }}
-        .header {{ text-align: center; margin-bottom: 20px; color: #333; }}
-        .product {{ border: 1px solid #ddd; margin: 10px 0; padding: 15px; border-radius: 5px; background: #fff; cursor: pointer; }}
-        .product:hover {{ background: #f9f9f9; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }}
-        .product-name {{ font-weight: bold; color: #2c5aa0; margin-bottom: 5px; }}
-        .product-code {{ color: #666; font-size: 0.9em; }}
-        .product-price {{ color: #d9534f; font-weight: bold; margin: 5px 0; }}
-        .product-stock {{ color: #5cb85c; font-size: 0.9em; }}
-        .out-of-stock {{ opacity: 0.6; }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h2>Urun Listesi</h2>
-            <p>Arama: "<strong>{query}</strong>"</p>
-            <p>Toplam {len(products)} ürün bulundu</p>
-        </div>
-        
-        {"".join([f'''
-            <div class="product {"out-of-stock" if p["stock"] <= 0 else ""}" onclick="selectProduct('{p["code"]}', '{p["name"]}', {p["price"]})">
-                <div class="product-name">{p["name"]}</div>
-                <div class="product-code">Kod: {p["code"]}</div>
-                <div class="product-price">{p["price"]} TL</div>
-                <div class="product-stock">Stok: {p["stock"]} adet</div>
-            </div>
-        ''' for p in products[:50]])}
-    </div>
-    
-    <script>
-        function selectProduct(code, name, price) {{
-            // Create WhatsApp message
-            var whatsappMsg = "URUN_SECILDI: " + code + " - " + name + " - " + price + " TL";
-            
-            // Try to send via fetch
-            fetch('/select-product', {{
-                method: 'POST',
-                headers: {{ 'Content-Type': 'application/json' }},
-                body: JSON.stringify({{ 
-                    message: whatsappMsg,
-                    sessionId: '{html_filename}',
-                    productCode: code,
-                    productName: name,
-                    productPrice: price
-                }})
-            }}).then(response => {{
-                // Fetch success - do nothing here, let clipboard handle it
-            }}).catch(error => {{
-                // Fetch blocked by ad blocker - show copy dialog
-                console.log('Fetch blocked, showing copy dialog');
-            }});
-            
-            // Silent clipboard copy and show overlay popup
-            navigator.clipboard.writeText(whatsappMsg).then(function() {{
-                showSuccessOverlay();
-            }}).catch(function(err) {{
-                showSuccessOverlay();
-            }});
-        }}
-
-        function showSuccessOverlay() {{
-            // Create overlay background
-            var overlay = document.createElement('div');
-            overlay.style.position = 'fixed';
-            overlay.style.top = '0';
-            overlay.style.left = '0';
-            overlay.style.width = '100%';
-            overlay.style.height = '100%';
-            overlay.style.backgroundColor = 'rgba(0,0,0,0.7)';
-            overlay.style.zIndex = '10000';
-            overlay.style.display = 'flex';
-            overlay.style.alignItems = 'center';
-            overlay.style.justifyContent = 'center';
-            overlay.style.opacity = '0';
-            overlay.style.transition = 'opacity 0.3s ease';
-            
-            // Create popup box
-            var popup = document.createElement('div');
-            popup.style.backgroundColor = 'white';
-            popup.style.borderRadius = '12px';
-            popup.style.padding = '30px';
-            popup.style.maxWidth = '350px';
-            popup.style.width = '90%';
-            popup.style.textAlign = 'center';
-            popup.style.boxShadow = '0 10px 30px rgba(0,0,0,0.3)';
-            popup.style.transform = 'scale(0.9)';
-            popup.style.transition = 'transform 0.3s ease';
-            
-            // Create success icon
-            var icon = document.createElement('div');
-            icon.innerHTML = 'OK';
-            icon.style.fontSize = '48px';
-            icon.style.marginBottom = '15px';
-            
-            // Create title
-            var title = document.createElement('h3');
-            title.innerHTML = 'Ürün Seçildi!';
-            title.style.color = '#2c5aa0';
-            title.style.margin = '0 0 15px 0';
-            title.style.fontSize = '22px';
-            title.style.fontWeight = 'bold';
-            
-            // Create message
-            var message = document.createElement('p');
-            message.innerHTML = '👆 Back tuşuna basarak<br>WhatsApp\\'a dönebilirsiniz';
-            message.style.color = '#666';
-            message.style.margin = '0 0 20px 0';
-            message.style.fontSize = '16px';
-            message.style.lineHeight = '1.5';
-            
-            // Create close button
-            var closeBtn = document.createElement('button');
-            closeBtn.innerHTML = 'Tamam';
-            closeBtn.style.backgroundColor = '#2c5aa0';
-            closeBtn.style.color = 'white';
-            closeBtn.style.border = 'none';
-            closeBtn.style.borderRadius = '6px';
-            closeBtn.style.padding = '12px 24px';
-            closeBtn.style.fontSize = '16px';
-            closeBtn.style.cursor = 'pointer';
-            closeBtn.style.fontWeight = 'bold';
-            closeBtn.style.transition = 'background-color 0.2s ease';
-            
-            // Hover effect for button
-            closeBtn.onmouseover = function() {{ this.style.backgroundColor = '#1a4480'; }};
-            closeBtn.onmouseout = function() {{ this.style.backgroundColor = '#2c5aa0'; }};
-            
-            // Assemble popup
-            popup.appendChild(icon);
-            popup.appendChild(title);
-            popup.appendChild(message);
-            popup.appendChild(closeBtn);
-            overlay.appendChild(popup);
-            
-            // Add to page
-            document.body.appendChild(overlay);
-            
-            // Animate in
-            setTimeout(function() {{
-                overlay.style.opacity = '1';
-                popup.style.transform = 'scale(1)';
-            }}, 50);
-            
-            // Close button functionality
-            closeBtn.onclick = function() {{
-                overlay.style.opacity = '0';
-                popup.style.transform = 'scale(0.9)';
-                setTimeout(function() {{
-                    if (document.body.contains(overlay)) {{
-                        document.body.removeChild(overlay);
-                    }}
-                }}, 300);
-            }};
-            
-            // Close on overlay click
-            overlay.onclick = function(e) {{
-                if (e.target === overlay) {{
-                    closeBtn.onclick();
-                }}
-            }};
-        }}
-    </script>
-</body>
-</html>"""
-    return html
+def store_product_list(products, query, whatsapp_number, total_count=None):
+    """
+    Arama sonucunu liste sayfası için kaydet - tekil sayfa bir kez .html/.gz/.br olarak yazılır
+
+    Sonuç seti kompakt kayıtlar olarak içerik hash'i ile saklanır (product_lists) - aynı
+    listeyi alan müşteriler tek sayfayı paylaşır, her birinin session'ı ve token'ı ayrıdır.
+    Sayfa arka planda bir kez render edilip sıkıştırılmış varyantlarıyla yazılır (page_files);
+    /product-list/<session_id> ile sunulur, JSON hali /data'dadır.
+
+    Returns:
+        Sayfa adı: products_{whatsapp}_{session}_{timestamp} (token bu ada imzalanır)
+    """
+    payload = build_list_payload(compact_products(products), query,
+                                 len(products) if total_count is None else total_count)
+    session_id, content_hash = product_lists.put(payload, whatsapp_number)
+    page_files.write_async(product_page_renderer.page_key(content_hash),
+                           lambda: product_page_renderer.render(payload))
+
+    whatsapp_clean = whatsapp_number.replace('@c.us', '').replace('+', '')
+    page_name = f"products_{whatsapp_clean}_{session_id}_{int(time.time() * 1000)}"
+    print(f"[PRODUCT LIST] Stored {len(payload['products'])} products (page {content_hash[:8]}) -> {page_name}")
+    return page_name
 
 def is_quantity_context_valid(whatsapp_number: str) -> tuple[bool, str]:
     """
@@ -552,18 +409,20 @@ def is_quantity_context_valid(whatsapp_number: str) -> tuple[bool, str]:
 
 # ===================== TOOLS (PostgreSQL Integration) =====================
 
+def request_whatsapp_number(context_variables: dict, default: str = 'unknown') -> str:
+    """Bu isteğin WhatsApp numarası - process_message'ın verdiği context_variables'tan
+    (eşzamanlı konuşmalar birbirinin numarasını ezemez)"""
+    return (context_variables or {}).get('whatsapp_number') or default
+
 def customer_check_tool(whatsapp_number: str) -> str:
     """Müşteri bilgilerini kontrol et"""
     return f"Müşteri {whatsapp_number} - Kredi limiti: 50.000 TL, Risk skoru: 85/100, Aktif müşteri"
 
-def valve_search_tool(query: str) -> str:
+def valve_search_tool(query: str, context_variables: dict = None) -> str | Result:
     """Valve (valf) ürün arama - SQL valve_bul fonksiyonunu kullanır - AI ile parametre çıkarma"""
     try:
-        # Global context'ten WhatsApp numarasını al
-        global current_whatsapp_context
-        
-        # AI ile parametreleri çıkar (silindir gibi)
-        params = db.extract_valve_params_with_ai(query)
+        # Parametreleri çıkar - kural tabanlı parser, gerekirse AI (silindir gibi)
+        params = db.extract_valve_params(query)
         valve_tip = params.get('tip')
         baglanti_boyutu = params.get('baglanti')
         extras = params.get('extras', [])
@@ -571,9 +430,6 @@ def valve_search_tool(query: str) -> str:
         print(f"[VALVE SEARCH] Query: '{query}'")
         print(f"[VALVE AI] Extracted - Tip: {valve_tip}, Bağlantı: {baglanti_boyutu}, Extras: {extras}")
         
-        # PostgreSQL valve_bul fonksiyonunu çağır
-        cursor = db.connection.cursor()
-        
         # Extras'ı SQL için hazırla - Türkçe büyük harfe çevir (DB'de her şey büyük harf)
         from database_tools_fixed import turkish_upper
         sql_extras = [turkish_upper(extra) for extra in extras[:4]] if extras else []  # İlk 4 extra'yı al ve büyük harfe çevir
@@ -583,15 +439,16 @@ def valve_search_tool(query: str) -> str:
         # Stok kontrolü
         is_stock_filter = any(term in query.lower() for term in ['stokta olan', 'stokta', 'mevcut'])
         
-        if is_stock_filter:
-            cursor.execute("SELECT * FROM valve_bul_in_stock(%s, %s, %s, %s, %s, %s)", 
-                         (valve_tip, baglanti_boyutu, sql_extras[0], sql_extras[1], sql_extras[2], sql_extras[3]))
-        else:
-            cursor.execute("SELECT * FROM valve_bul(%s, %s, %s, %s, %s, %s)", 
-                         (valve_tip, baglanti_boyutu, sql_extras[0], sql_extras[1], sql_extras[2], sql_extras[3]))
-        
-        results = cursor.fetchall()
-        cursor.close()
+        # PostgreSQL valve_bul fonksiyonunu çağır (havuzdan bağlantı al)
+        with db.get_cursor() as cursor:
+            if is_stock_filter:
+                cursor.execute("SELECT * FROM valve_bul_in_stock(%s, %s, %s, %s, %s, %s)", 
+                             (valve_tip, baglanti_boyutu, sql_extras[0], sql_extras[1], sql_extras[2], sql_extras[3]))
+            else:
+                cursor.execute("SELECT * FROM valve_bul(%s, %s, %s, %s, %s, %s)", 
+                             (valve_tip, baglanti_boyutu, sql_extras[0], sql_extras[1], sql_extras[2], sql_extras[3]))
+            
+            results = cursor.fetchall()
         
         # Sonuçları formatla
         products = []
@@ -608,46 +465,24 @@ def valve_search_tool(query: str) -> str:
         print(f"[VALVE SQL] Found {count} valves with valve_bul({valve_tip}, {baglanti_boyutu}, extras={sql_extras})")
         
         if count > 0:
-            # Session ID oluştur
-            import hashlib
-            import random
-            import time
-            session_id = hashlib.md5(f"{query}_{random.randint(1000,9999)}".encode()).hexdigest()[:8]
-            
-            # WhatsApp number'ı global context'ten al
-            actual_whatsapp = current_whatsapp_context.get('whatsapp_number', 'unknown')
-            
-            # HTML dosyası oluştur - PLAN'A GÖRE
-            import os
-            html_dir = os.getenv('PRODUCT_PAGES_DIR', 'C:/projects/WhatsAppB2B-Clean/product-pages')
-            os.makedirs(html_dir, exist_ok=True)
-            
-            # Dosya adı formatı: products_{whatsapp}_{session}_{timestamp}.html
-            timestamp = str(int(time.time() * 1000))
-            whatsapp_clean = actual_whatsapp.replace('@c.us', '').replace('+', '')
-            html_filename = f"products_{whatsapp_clean}_{session_id}_{timestamp}.html"
-            html_path = f"{html_dir}/{html_filename}"
-            
-            # HTML içeriği oluştur (products değişkenini kullan, all_products değil)
-            html_content = generate_product_html(products, query, html_filename)
-            
-            # Dosyaya yaz
-            with open(html_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-            
-            print(f"[HTML CREATED] {html_path}")
-            
+            # WhatsApp number'ı istek context'inden al
+            actual_whatsapp = request_whatsapp_number(context_variables)
+
+            # Sonuç setini kaydet - tekil sayfa .html/.gz/.br olarak yazılır, JSON /data'da
+            page_name = store_product_list(products, query, actual_whatsapp)
+
             # Stokta olan ürünleri say (products değişkenini kullan)
             in_stock_count = len([p for p in products if p['stock'] > 0])
 
             # Secure token-protected URL oluştur
-            list_url = create_secure_product_link(html_filename, actual_whatsapp)
+            list_url = create_secure_product_link(page_name, actual_whatsapp)
 
             response = f"💼 {count} valf - {in_stock_count} stokta\n\n"
             response += f"URUN LISTESI:\n{list_url}"
             
-            print(f"[VALVE SEARCH] Found {count} valves, created session: {session_id}")
-            return response
+            print(f"[VALVE SEARCH] Found {count} valves, created page: {page_name}")
+            # Liste cevabı müşteriye olduğu gibi gider - agent tekrar yazmaz
+            return final_result(response)
         else:
             return f"'{query}' icin valf bulunamadi."
         
@@ -655,13 +490,12 @@ def valve_search_tool(query: str) -> str:
         return f"Valf arama hatasi: {str(e)}"
 
 
-def air_preparation_search_tool(query: str) -> str:
+def air_preparation_search_tool(query: str, context_variables: dict = None) -> str | Result:
     """Şartlandırıcı, Regülatör, Yağlayıcı arama - 4 parametreli SQL fonksiyonu kullanır"""
-    import uuid
     import re
     
     try:
-        global current_whatsapp_context, product_list_sessions
+        actual_whatsapp = request_whatsapp_number(context_variables)
         
         # Query'yi Türkçe büyük harfe çevir
         query_upper = query.upper().replace('İ', 'I').replace('Ğ', 'G')
@@ -717,71 +551,28 @@ def air_preparation_search_tool(query: str) -> str:
         SELECT * FROM find_air_preparation_units(%s, %s, %s, %s)
         """
         
-        cursor = db.connection.cursor()
-        cursor.execute(sql_query, (query, unit_type, connection_size, keywords))
-        products = cursor.fetchall()
-        cursor.close()
+        with db.get_cursor() as cursor:
+            cursor.execute(sql_query, (query, unit_type, connection_size, keywords))
+            products = cursor.fetchall()
         
         if products:
             count = len(products)
             in_stock = sum(1 for p in products if p[4] > 0)  # stock_quantity index
             
-            # Session'a kaydet
-            session_id = str(uuid.uuid4())[:8]
-            product_list_sessions[session_id] = {
-                'products': [
-                    {
-                        'id': p[0],
-                        'code': p[1],
-                        'name': p[2],
-                        'price': float(p[3]) if p[3] else 0,
-                        'stock': p[4],
-                        'unit_type': p[5],
-                        'connection_size': p[6],
-                        'description': p[7]
-                    }
-                    for p in products[:50]  # İlk 50 ürün
-                ],
-                'query': query,
-                'whatsapp_number': current_whatsapp_context.get('whatsapp_number', 'unknown')
-            }
-            
-            # HTML dosyası oluştur
-            whatsapp_number = current_whatsapp_context.get('whatsapp_number', 'unknown').replace('@c.us', '')
-            timestamp = int(time.time() * 1000)
-            filename = f"products_{whatsapp_number}_{session_id}_{timestamp}.html"
-            
-            # HTML içeriği oluştur
-            # generate_product_html kullan (onclick versiyonu - buton yok)
-            formatted_products = [
-                {
-                    "code": p[1],
-                    "name": p[2],
-                    "price": p[3],
-                    "stock": p[4]
-                }
-                for p in products
-            ]
-            html_content = generate_product_html(formatted_products, query, filename)
-            
-            # HTML dosyasını kaydet
-            product_pages_dir = os.getenv('PRODUCT_PAGES_DIR', 'C:/projects/WhatsAppB2B-Clean/product-pages')
-            os.makedirs(product_pages_dir, exist_ok=True)
-            filepath = os.path.join(product_pages_dir, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-            
-            print(f"[HTML] Created: {filename}")
+            # Sonuç setini kaydet - tekil sayfa .html/.gz/.br olarak yazılır, JSON /data'da
+            page_name = store_product_list(
+                [{"code": p[1], "name": p[2], "price": p[3], "stock": p[4]} for p in products],
+                query, actual_whatsapp
+            )
 
             # Secure token-protected URL oluştur
-            whatsapp_number_full = current_whatsapp_context.get('whatsapp_number', '905306897885@c.us')
-            list_url = create_secure_product_link(filename, whatsapp_number_full)
+            list_url = create_secure_product_link(page_name, actual_whatsapp)
 
             response = f"💼 {count} ürün - {in_stock} stokta\n\n"
             response += f"URUN LISTESI:\n{list_url}"
             
-            return response
+            # Liste cevabı müşteriye olduğu gibi gider - agent tekrar yazmaz
+            return final_result(response)
         else:
             return f"'{query}' için şartlandırıcı/regülatör/yağlayıcı bulunamadı."
             
@@ -789,13 +580,10 @@ def air_preparation_search_tool(query: str) -> str:
         print(f"[ERROR] air_preparation_search_tool: {e}")
         return f"Şartlandırıcı arama hatası: {str(e)}"
 
-def product_search_tool(query: str) -> str:
+def product_search_tool(query: str, context_variables: dict = None) -> str | Result:
     """OPTIMIZE Ürün ara - Session'a kaydet ve liste linki oluştur"""
-    import uuid, re
+    import re
     try:
-        # Global context'ten WhatsApp numarasını al
-        global current_whatsapp_context
-
         # Direkt ürün kodu kontrolü - örn: 13B0099, ABC123, XYZ-456 gibi
         # Pattern: 3+ karakter, harf/rakam/tire kombinasyonu, boşluk yok
         direct_code_pattern = r'^[A-Za-z0-9\-]{3,}$'
@@ -817,55 +605,24 @@ def product_search_tool(query: str) -> str:
                         price_display = exact_product.get('price_range', f"{exact_product['price']} TL")
                         # Direkt satış akışına geç
                         return f"[URUN BULUNDU] TAM ESLESME!\n\nUrun: {exact_product['name']}\nFiyat: {price_display}\nKod: {exact_product['code']}\nStok: {exact_product['stock']} adet\n\nBu urunu almak ister misiniz? Siparis vermek icin Sales Expert'e yonlendiriliyorsunuz..."
-                # Session ID oluştur
-                session_id = str(uuid.uuid4())[:8]
-                
-                # PostgreSQL'a session kaydet
-                from psycopg2 import sql
-                cursor = db.connection.cursor()
-                
-                # Session verisini hazırla
-                session_data = {
-                    "products": all_products,
-                    "query": query,
-                    "timestamp": "NOW()",
-                    "algorithm": result.get('algorithm', 'Optimize')
-                }
-                
-                # WhatsApp number'ı global context'ten al
-                actual_whatsapp = current_whatsapp_context.get('whatsapp_number', 'unknown')
-                
-                # HTML dosyası oluştur - PLAN'A GÖRE
-                import os
-                html_dir = os.getenv('PRODUCT_PAGES_DIR', 'C:/projects/WhatsAppB2B-Clean/product-pages')
-                os.makedirs(html_dir, exist_ok=True)
-                
-                # Dosya adı formatı: products_{whatsapp}_{session}_{timestamp}.html
-                timestamp = str(int(time.time() * 1000))
-                whatsapp_clean = actual_whatsapp.replace('@c.us', '').replace('+', '')
-                html_filename = f"products_{whatsapp_clean}_{session_id}_{timestamp}.html"
-                html_path = f"{html_dir}/{html_filename}"
-                
-                # HTML içeriği oluştur
-                html_content = generate_product_html(all_products, query, html_filename)
-                
-                # Dosyaya yaz
-                with open(html_path, 'w', encoding='utf-8') as f:
-                    f.write(html_content)
-                
-                print(f"[HTML CREATED] {html_path}")
-                
+                # WhatsApp number'ı istek context'inden al
+                actual_whatsapp = request_whatsapp_number(context_variables)
+
+                # Sonuç setini kaydet - tekil sayfa .html/.gz/.br olarak yazılır, JSON /data'da
+                page_name = store_product_list(all_products, query, actual_whatsapp)
+
                 # Stokta olan ürünleri say
                 in_stock_count = len([p for p in all_products if p['stock'] > 0])
 
                 # Secure token-protected URL oluştur
-                list_url = create_secure_product_link(html_filename, actual_whatsapp)
+                list_url = create_secure_product_link(page_name, actual_whatsapp)
 
                 response = f"💼 {count} ürün - {in_stock_count} stokta\n\n"
                 response += f"URUN LISTESI:\n{list_url}"
                 
-                print(f"[PRODUCT SEARCH] Found {count} products, created session: {session_id}")
-                return response
+                print(f"[PRODUCT SEARCH] Found {count} products, created page: {page_name}")
+                # Liste cevabı müşteriye olduğu gibi gider - agent tekrar yazmaz
+                return final_result(response)
             else:
                 return f"'{query}' icin urun bulunamadi."
                 
@@ -931,10 +688,9 @@ def price_quote_tool(product_code: str, quantity: int) -> str:
 def generate_order_number() -> str:
     """Unique order number oluştur"""
     try:
-        cursor = db.connection.cursor()
-        cursor.execute("SELECT 'ORD-' || TO_CHAR(CURRENT_DATE, 'YYYY') || '-' || LPAD(nextval('order_number_seq')::text, 4, '0')")
-        order_number = cursor.fetchone()[0]
-        cursor.close()
+        with db.get_cursor() as cursor:
+            cursor.execute("SELECT 'ORD-' || TO_CHAR(CURRENT_DATE, 'YYYY') || '-' || LPAD(nextval('order_number_seq')::text, 4, '0')")
+            order_number = cursor.fetchone()[0]
         return order_number
     except Exception as e:
         return f"ORD-2025-ERR{random.randint(1000,9999)}"
@@ -942,41 +698,37 @@ def generate_order_number() -> str:
 def save_order(whatsapp_number: str, items_with_quantities: dict, total_amount: float) -> str:
     """Siparişi veritabanına kaydet - Single Product için optimize edildi"""
     try:
-        cursor = db.connection.cursor()
-        
-        # Sipariş numarası oluştur
+        # Sipariş numarası oluştur (transaction dışında - sequence kendi bağlantısını kullanır)
         order_number = generate_order_number()
         
-        # Ana sipariş kaydı
-        cursor.execute("""
-            INSERT INTO orders (order_number, whatsapp_number, status, total_amount)
-            VALUES (%s, %s, 'CONFIRMED', %s)
-            RETURNING id
-        """, [order_number, whatsapp_number, total_amount])
-        
-        order_id = cursor.fetchone()[0]
-        
-        # Sipariş detayları - Single product için
-        for product_code, details in items_with_quantities.items():
+        # Tek transaction: çıkışta commit, hata olursa havuz rollback yapar
+        with db.get_cursor() as cursor:
+            # Ana sipariş kaydı
             cursor.execute("""
-                INSERT INTO order_items (order_id, product_code, product_name, quantity, unit_price, total_price)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, [
-                order_id,
-                product_code,
-                details['product_name'],
-                details['quantity'], 
-                details['unit_price'],
-                details['total_price']
-            ])
-        
-        db.connection.commit()
-        cursor.close()
+                INSERT INTO orders (order_number, whatsapp_number, status, total_amount)
+                VALUES (%s, %s, 'CONFIRMED', %s)
+                RETURNING id
+            """, [order_number, whatsapp_number, total_amount])
+            
+            order_id = cursor.fetchone()[0]
+            
+            # Sipariş detayları - Single product için
+            for product_code, details in items_with_quantities.items():
+                cursor.execute("""
+                    INSERT INTO order_items (order_id, product_code, product_name, quantity, unit_price, total_price)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, [
+                    order_id,
+                    product_code,
+                    details['product_name'],
+                    details['quantity'], 
+                    details['unit_price'],
+                    details['total_price']
+                ])
         
         return f"SIPARIS KAYDEDILDI: {order_number} (ID: {order_id})"
         
     except Exception as e:
-        db.connection.rollback()
         return f"SIPARIS KAYIT HATASI: {str(e)}"
 
 def create_order_confirmation_message(order_number: str, order_data: dict, total_amount: float) -> str:
@@ -1040,20 +792,19 @@ def create_order_confirmation_message(order_number: str, order_data: dict, total
 def get_order_history(whatsapp_number: str, limit: int = 5) -> str:
     """Müşterinin sipariş geçmişini getir"""
     try:
-        cursor = db.connection.cursor()
-        cursor.execute("""
-            SELECT o.order_number, o.status, o.total_amount, o.created_at,
-                   COUNT(oi.id) as item_count
-            FROM orders o
-            LEFT JOIN order_items oi ON o.id = oi.order_id
-            WHERE o.whatsapp_number = %s
-            GROUP BY o.id, o.order_number, o.status, o.total_amount, o.created_at
-            ORDER BY o.created_at DESC
-            LIMIT %s
-        """, [whatsapp_number, limit])
-        
-        orders = cursor.fetchall()
-        cursor.close()
+        with db.get_cursor() as cursor:
+            cursor.execute("""
+                SELECT o.order_number, o.status, o.total_amount, o.created_at,
+                       COUNT(oi.id) as item_count
+                FROM orders o
+                LEFT JOIN order_items oi ON o.id = oi.order_id
+                WHERE o.whatsapp_number = %s
+                GROUP BY o.id, o.order_number, o.status, o.total_amount, o.created_at
+                ORDER BY o.created_at DESC
+                LIMIT %s
+            """, [whatsapp_number, limit])
+            
+            orders = cursor.fetchall()
         
         if not orders:
             return "SIPARIS GECMISI BOS - Henüz hiç siparişiniz bulunmuyor."
@@ -1087,31 +838,29 @@ def get_order_history(whatsapp_number: str, limit: int = 5) -> str:
 def get_order_details(whatsapp_number: str, order_number: str) -> str:
     """Belirli sipariş numarasının detaylarını getir"""
     try:
-        cursor = db.connection.cursor()
-        
-        # Sipariş bilgilerini al
-        cursor.execute("""
-            SELECT id, order_number, status, total_amount, created_at
-            FROM orders 
-            WHERE whatsapp_number = %s AND order_number = %s
-        """, [whatsapp_number, order_number])
-        
-        order = cursor.fetchone()
-        if not order:
-            return f"SİPARİŞ BULUNAMADI: {order_number} numaralı siparişiniz bulunamadı."
-        
-        order_id, order_num, status, total, created_at = order
-        
-        # Sipariş kalemlerini al
-        cursor.execute("""
-            SELECT product_code, product_name, quantity, unit_price, total_price
-            FROM order_items
-            WHERE order_id = %s
-            ORDER BY id
-        """, [order_id])
-        
-        items = cursor.fetchall()
-        cursor.close()
+        with db.get_cursor() as cursor:
+            # Sipariş bilgilerini al
+            cursor.execute("""
+                SELECT id, order_number, status, total_amount, created_at
+                FROM orders 
+                WHERE whatsapp_number = %s AND order_number = %s
+            """, [whatsapp_number, order_number])
+            
+            order = cursor.fetchone()
+            if not order:
+                return f"SİPARİŞ BULUNAMADI: {order_number} numaralı siparişiniz bulunamadı."
+            
+            order_id, order_num, status, total, created_at = order
+            
+            # Sipariş kalemlerini al
+            cursor.execute("""
+                SELECT product_code, product_name, quantity, unit_price, total_price
+                FROM order_items
+                WHERE order_id = %s
+                ORDER BY id
+            """, [order_id])
+            
+            items = cursor.fetchall()
         
         # Status'u Türkçe'ye çevir
         status_tr = {
@@ -1145,54 +894,46 @@ def get_order_details(whatsapp_number: str, order_number: str) -> str:
 def cancel_order(whatsapp_number: str, order_number: str = "") -> str:
     """Sipariş iptal et - Single product workflow için basitleştirilmiş"""
     try:
-        cursor = db.connection.cursor()
-        
-        if order_number:
-            # Belirli sipariş numarasını iptal et
-            cursor.execute("""
-                SELECT id, status FROM orders 
-                WHERE whatsapp_number = %s AND order_number = %s
-            """, [whatsapp_number, order_number])
-            
-            order = cursor.fetchone()
-            if not order:
-                cursor.close()
-                return f"SİPARİŞ BULUNAMADI: {order_number} numaralı siparişiniz bulunamadı."
-            
-            order_id, status = order
-            
-            if status != 'draft':
-                cursor.close()
-                return f"SİPARİŞ İPTAL EDİLEMEZ: {order_number} sipariş durumu '{status}' - Sadece taslak siparişler iptal edilebilir."
-            
-            # Siparişi iptal et
-            cursor.execute("""
-                UPDATE orders 
-                SET status = 'cancelled', cancelled_at = CURRENT_TIMESTAMP
-                WHERE id = %s
-            """, [order_id])
-            
-            db.connection.commit()
-            cursor.close()
+        with db.get_cursor() as cursor:
+            if order_number:
+                # Belirli sipariş numarasını iptal et
+                cursor.execute("""
+                    SELECT id, status FROM orders 
+                    WHERE whatsapp_number = %s AND order_number = %s
+                """, [whatsapp_number, order_number])
+                
+                order = cursor.fetchone()
+                if not order:
+                    return f"SİPARİŞ BULUNAMADI: {order_number} numaralı siparişiniz bulunamadı."
+                
+                order_id, status = order
+                
+                if status != 'draft':
+                    return f"SİPARİŞ İPTAL EDİLEMEZ: {order_number} sipariş durumu '{status}' - Sadece taslak siparişler iptal edilebilir."
+                
+                # Siparişi iptal et
+                cursor.execute("""
+                    UPDATE orders 
+                    SET status = 'cancelled', cancelled_at = CURRENT_TIMESTAMP
+                    WHERE id = %s
+                """, [order_id])
+                
+                return f"[OK] SİPARİŞ İPTAL EDİLDİ: {order_number} numaralı siparişiniz başarıyla iptal edildi."
             
-            return f"[OK] SİPARİŞ İPTAL EDİLDİ: {order_number} numaralı siparişiniz başarıyla iptal edildi."
+            else:
+                # Genel iptal - sadece draft siparişleri iptal et (sepet sistemi yok)
+                cursor.execute("""
+                    UPDATE orders 
+                    SET status = 'cancelled', cancelled_at = CURRENT_TIMESTAMP
+                    WHERE whatsapp_number = %s AND status = 'draft'
+                """, [whatsapp_number])
+                
+                cancelled_count = cursor.rowcount
         
+        if cancelled_count > 0:
+            return f"[OK] SİPARİŞ İPTAL EDİLDİ: {cancelled_count} taslak sipariş iptal edildi."
         else:
-            # Genel iptal - sadece draft siparişleri iptal et (sepet sistemi yok)
-            cursor.execute("""
-                UPDATE orders 
-                SET status = 'cancelled', cancelled_at = CURRENT_TIMESTAMP
-                WHERE whatsapp_number = %s AND status = 'draft'
-            """, [whatsapp_number])
-            
-            cancelled_count = cursor.rowcount
-            db.connection.commit()
-            cursor.close()
-            
-            if cancelled_count > 0:
-                return f"[OK] SİPARİŞ İPTAL EDİLDİ: {cancelled_count} taslak sipariş iptal edildi."
-            else:
-                return " İPTAL EDİLECEK SİPARİŞ YOK: Açık taslak siparişiniz bulunmuyor."
+            return " İPTAL EDİLECEK SİPARİŞ YOK: Açık taslak siparişiniz bulunmuyor."
         
     except Exception as e:
         return f"İPTAL HATASI: {str(e)}"
@@ -1581,23 +1322,19 @@ product_specialist = Agent(
 - Liste oluşturma, HTML sayfa üretme gerekmez!
 
 **RESPONSE FORMAT**:
-When tool finds products, return the tool response plus a helpful comment:
-
-Tool response (copy exactly):
+When a search tool finds products, its list response is sent to the customer directly
+and the turn ends (terminal tool) - you do not need to repeat or rephrase it:
 💼 [COUNT] ürün - [IN_STOCK] stokta
 
 URUN LISTESI:
 [TUNNEL_URL]/products/[ID]
 
-Then add your own contextual message based on:
-- Product type found
-- Customer's specific need
-- Next suggested action
+Only for "bulunamadı" or error results, write a short helpful message (suggest a different size/type).
 
-Example: "İsteğinize uygun seçenekleri listelendi. Teknik detayları inceleyip uygun olanları seçebilirsiniz."
+**NEW WORKFLOW**: When product selected from HTML list, customer goes directly to Sales Expert via ÜRÜN_SEÇİLDİ intent!
 
-**NEW WORKFLOW**: When product selected from HTML list, customer goes directly to Sales Expert via ÜRÜN_SEÇİLDİ intent!""",
-    functions=[product_search_tool, valve_search_tool, air_preparation_search_tool, stock_check_tool, transfer_from_product_to_order, transfer_to_sales_expert]
+**KONU DEĞİŞİKLİĞİ**: Mesaj ürün aramasıyla ilgili değilse (selamlama, hesap, sipariş geçmişi vb.) -> transfer_back_to_intent_analyzer()""",
+    functions=[product_search_tool, valve_search_tool, air_preparation_search_tool, stock_check_tool, transfer_from_product_to_order, transfer_to_sales_expert, transfer_back_to_intent_analyzer]
 )
 
 # 4. Sales Expert - TASK 2.4: Product confirmation + pricing + order history
@@ -1688,6 +1425,30 @@ order_manager = Agent(
     functions=[process_context_quantity_input, get_selected_product_context, detect_quantity_input, create_single_product_order, ask_quantity_for_product, confirm_single_product_order, cancel_order, clear_selected_product_context, transfer_back_to_intent_analyzer]
 )
 
+# Statik agent'ların tool şemalarını startup'ta bir kez üret (her completion'da yeniden introspection yok)
+client.warm_agent_payloads([intent_analyzer, customer_manager, product_specialist, sales_expert, order_manager])
+
+# ===================== PRE-ROUTER =====================
+
+# Sadece çıplak miktar cevapları ("5", "10 adet", "beş tane") - detect_quantity_input'un
+# gevşek alt-dize eşleşmesi ("onayla" -> "on") deterministik yönlendirmeye sızmasın
+BARE_QUANTITY_PATTERN = re.compile(
+    r'^\s*(?:\d{1,3}|bir|iki|üç|dört|beş|altı|yedi|sekiz|dokuz|on|yirmi|otuz|elli|yüz)'
+    r'\s*(?:adet|tane|ad|pcs|piece)?\s*[.!]?\s*$',
+    re.IGNORECASE
+)
+
+# Net ürün arama mesajları Product Specialist'ten başlar (sipariş/iptal kelimesi yoksa)
+PRODUCT_SEARCH_PATTERN = re.compile(
+    r'silindir|valf|şartlandırıcı|sartlandirici|regülatör|regulator|yağlayıcı|yaglayici|\d+\s*[xX]\s*\d+',
+    re.IGNORECASE
+)
+ORDER_INTENT_PATTERN = re.compile(r'sipariş|siparis|iptal|onay|evet|hayır|vazgeç|ORD-\d{4}-', re.IGNORECASE)
+ORDER_NUMBER_PATTERN = re.compile(r'ORD-\d{4}-', re.IGNORECASE)
+
+# Çok adımlı akışlarda bir sonraki tur bu agent'lardan devam eder (hepsinde transfer_back_to_intent_analyzer var)
+STICKY_AGENTS = {agent.name: agent for agent in [product_specialist, sales_expert, order_manager]}
+
 # ===================== SWARM SYSTEM =====================
 
 class SwarmB2BSystem:
@@ -1697,16 +1458,30 @@ class SwarmB2BSystem:
         self.client = client
 
         # Conversation Memory System - Store last 5 messages per user, 30-minute timeout, FIFO
-        self.conversation_memory = {}  # {whatsapp_number: {"messages": [...], "last_activity": datetime, "timeout_minutes": 30}}
         self.memory_settings = {
             "max_messages": 5,  # Store last 5 messages (FIFO)
             "timeout_minutes": 30,  # 30-minute timeout
-            "cleanup_on_message": True,  # Cleanup expired conversations after each message
+            "sweep_interval_seconds": float(os.getenv('SESSION_SWEEP_INTERVAL', 30)),  # Background expiry sweep
             "extract_context": True  # Auto-extract search context from messages
         }
 
+        # State store namespace'leri - yerinde değişiklikten sonra tekrar set edilir (postgres write-behind)
+        session_ttl = self.memory_settings['timeout_minutes'] * 60
+        self.conversation_memory = state_store.namespace('conversation', session_ttl, CONVERSATION_MAX)  # {whatsapp_number: {"messages": [...], "last_activity": datetime}}
+
         # Auto-extracted context for better continuity
-        self.extracted_context = {}  # {whatsapp_number: {"product_type": str, "dimensions": str, "features": []}}
+        self.extracted_context = state_store.namespace('extracted_context', session_ttl, CONVERSATION_MAX)  # {whatsapp_number: {"product_type": str, "dimensions": str, "features": []}}
+
+        # Kullanıcı başına son aktivite -> expiry heap; süresi dolan kullanıcı tüm per-user store'lardan silinir
+        self.session_expiry = ExpiryIndex()
+        self.memory_lock = threading.RLock()
+        self.session_sweeper = SessionSweeper(self.cleanup_expired_conversations,
+                                              self.memory_settings['sweep_interval_seconds'])
+        self.sessions_evicted = 0
+
+        # Pre-router kararları: {route: count}
+        self.routing_stats = {}
+        self.routing_stats_lock = threading.Lock()
 
 
         print("[Swarm] Single-Product B2B System initialized")
@@ -1716,27 +1491,65 @@ class SwarmB2BSystem:
         print("TASK 2.5: Enhanced MIKTAR_GİRİŞİ intent implemented")
         print(f"[Memory] Conversation memory enabled: {self.memory_settings['max_messages']} messages, {self.memory_settings['timeout_minutes']}min timeout, FIFO cleanup")
 
-    def cleanup_expired_conversations(self):
-        """Cleanup expired conversations based on timeout_minutes"""
-        if not self.memory_settings['cleanup_on_message']:
-            return
-
-        current_time = datetime.now()
-        timeout_delta = timedelta(minutes=self.memory_settings['timeout_minutes'])
-        expired_numbers = []
-
-        for whatsapp_number, memory_data in self.conversation_memory.items():
-            last_activity = memory_data.get('last_activity')
-            if last_activity and (current_time - last_activity) > timeout_delta:
-                expired_numbers.append(whatsapp_number)
-
-        # Remove expired conversations
-        for number in expired_numbers:
-            del self.conversation_memory[number]
-            print(f"[Memory] Expired conversation cleanup: {number}")
-
-        if expired_numbers:
-            print(f"[Memory] Cleaned up {len(expired_numbers)} expired conversations")
+    def cleanup_expired_conversations(self) -> int:
+        """Süresi dolan konuşmaları expiry heap'ten çıkar - sweeper thread'inde çalışır, O(k log n)"""
+        timeout_seconds = self.memory_settings['timeout_minutes'] * 60
+        evicted = 0
+        with self.memory_lock:
+            for number in self.session_expiry.pop_expired():
+                # Paylaşılan store'da kullanıcı başka bir worker'da konuşmaya devam etmiş olabilir
+                memory_data = self.conversation_memory.get(number)
+                last_activity = memory_data.get("last_activity") if memory_data else None
+                remaining = timeout_seconds - (datetime.now() - last_activity).total_seconds() if last_activity else 0
+                if remaining > 0:
+                    self.session_expiry.touch(number, remaining)
+                    continue
+                self.evict_session(number)
+                evicted += 1
+
+        # Süresi dolan ürün listesi session'ları sayfa referanslarını bırakır
+        product_lists.release_expired()
+
+        # Diğer store'lardaki (ürün listeleri, seçili ürünler) yaşı dolmuş kayıtlar
+        purged = state_store.purge_expired()
+
+        if evicted or purged:
+            print(f"[Memory] Cleaned up {evicted} expired conversations, {purged} expired state entries")
+        return evicted
+
+    def expire_session_if_idle(self, whatsapp_number: str):
+        """Mesaj geldiğinde sadece bu kullanıcıyı kontrol et (sweeper henüz çalışmadıysa) - O(1)"""
+        with self.memory_lock:
+            if self.session_expiry.is_expired(whatsapp_number):
+                self.session_expiry.discard(whatsapp_number)
+                self.evict_session(whatsapp_number)
+
+    def evict_session(self, whatsapp_number: str):
+        """Kullanıcıyı tüm per-user store'lardan sil: hafıza, çıkarılan context, seçili ürün"""
+        with self.memory_lock:
+            evicted = self.conversation_memory.pop(whatsapp_number, None) is not None
+            self.extracted_context.pop(whatsapp_number, None)
+            selected_product_context.pop(whatsapp_number, None)
+            if evicted:
+                self.sessions_evicted += 1
+        if evicted:
+            print(f"[Memory] Expired conversation cleanup: {whatsapp_number}")
+
+    def start_sweeper(self):
+        """Arka plan expiry sweeper'ı başlat (thread olduğu için fork sonrası, process başına)"""
+        self.session_sweeper.start()
+
+    def get_session_gauges(self) -> Dict[str, Any]:
+        """Canlı oturum gauge'ları - /memory-status için"""
+        return {
+            "live_sessions": len(self.conversation_memory),
+            "extracted_contexts": len(self.extracted_context),
+            "selected_products": len(selected_product_context),
+            "sessions_evicted": self.sessions_evicted,
+            "state_store": state_store.get_stats(),
+            "expiry_index": self.session_expiry.get_stats(),
+            "sweeper": self.session_sweeper.get_stats()
+        }
 
     def extract_search_context(self, message: str, whatsapp_number: str):
         """Auto-extract and accumulate search context from messages"""
@@ -1772,19 +1585,24 @@ class SwarmB2BSystem:
             if feature in message_lower and feature not in context["features"]:
                 context["features"].append(feature)
                 print(f"[Context] Added feature: {feature}")
+        context["features"] = context["features"][-MAX_CONTEXT_FEATURES:]
+
+        self.extracted_context[whatsapp_number] = context
 
     def add_message_to_memory(self, whatsapp_number: str, role: str, content: str):
         """Add message to conversation memory with FIFO management and context extraction"""
         current_time = datetime.now()
 
-        # Initialize conversation memory if not exists
-        if whatsapp_number not in self.conversation_memory:
-            self.conversation_memory[whatsapp_number] = {
-                "messages": [],
-                "last_activity": current_time
-            }
+        with self.memory_lock:
+            # Initialize conversation memory if not exists
+            if whatsapp_number not in self.conversation_memory:
+                self.conversation_memory[whatsapp_number] = {
+                    "messages": [],
+                    "last_activity": current_time
+                }
+            memory_data = self.conversation_memory[whatsapp_number]
+            self.session_expiry.touch(whatsapp_number, self.memory_settings['timeout_minutes'] * 60)
 
-        memory_data = self.conversation_memory[whatsapp_number]
         messages = memory_data["messages"]
 
         # Auto-extract context from user messages
@@ -1806,15 +1624,17 @@ class SwarmB2BSystem:
 
         # Update last activity
         memory_data["last_activity"] = current_time
+        self.conversation_memory[whatsapp_number] = memory_data
 
         print(f"[Memory] Added {role} message for {whatsapp_number}, total: {len(messages)}/{max_messages}")
 
     def get_conversation_history(self, whatsapp_number: str) -> List[Dict[str, str]]:
         """Get conversation history for Swarm client (format: [{"role": str, "content": str}])"""
-        if whatsapp_number not in self.conversation_memory:
+        memory_data = self.conversation_memory.get(whatsapp_number)
+        if not memory_data:
             return []
 
-        messages = self.conversation_memory[whatsapp_number]["messages"]
+        messages = memory_data["messages"]
         # Convert to Swarm format (remove timestamp)
         swarm_messages = [
             {"role": msg["role"], "content": msg["content"]}
@@ -1831,6 +1651,7 @@ class SwarmB2BSystem:
                 memory_data = self.conversation_memory[whatsapp_number]
                 return {
                     "user": whatsapp_number,
+                    "active_agent": memory_data.get("active_agent"),
                     "message_count": len(memory_data["messages"]),
                     "last_activity": memory_data["last_activity"].isoformat(),
                     "age_minutes": (datetime.now() - memory_data["last_activity"]).total_seconds() / 60
@@ -1841,18 +1662,91 @@ class SwarmB2BSystem:
             return {
                 "total_conversations": len(self.conversation_memory),
                 "settings": self.memory_settings,
+                "gauges": self.get_session_gauges(),
                 "users": list(self.conversation_memory.keys())
             }
     
+    def route_message(self, customer_message: str, whatsapp_number: str) -> Tuple[str, Any]:
+        """
+        Deterministik ön yönlendirme - Intent Analyzer LLM çağrısını atla.
+        Dönüş: (route, handler) - handler ya direkt fonksiyon ya da başlangıç agent'ı
+        """
+        message = customer_message.strip()
+
+        # HTML listesinden gelen makine mesajı - kesin kalıp
+        if message.startswith("ÜRÜN_SEÇİLDİ:") or message.startswith("URUN_SECILDI:"):
+            return "product_selection", handle_product_selection
+
+        # Seçili ürün varken çıplak miktar cevabı
+        if BARE_QUANTITY_PATTERN.match(message):
+            context_valid, _ = is_quantity_context_valid(whatsapp_number)
+            is_quantity, _ = detect_quantity_input(message)
+            if context_valid and is_quantity:
+                return "quantity_input", process_context_quantity_input
+
+        # Sipariş numarası sorgusu -> Sales Expert (get_order_details)
+        if ORDER_NUMBER_PATTERN.search(message):
+            return "agent:sales_expert", sales_expert
+
+        # Net ürün araması -> Product Specialist
+        if PRODUCT_SEARCH_PATTERN.search(message) and not ORDER_INTENT_PATTERN.search(message):
+            return "agent:product_specialist", product_specialist
+
+        # Devam eden akış -> son aktif agent (konu değişirse agent analyzer'a geri transfer eder)
+        active_agent = self.get_active_agent(whatsapp_number)
+        if active_agent:
+            return f"agent:sticky:{active_agent.name}", active_agent
+
+        return "agent:intent_analyzer", intent_analyzer
+
+    def set_active_agent(self, whatsapp_number: str, agent_name: str = None):
+        """Son aktif agent'ı konuşma hafızasına yaz - STICKY_AGENTS dışındakiler temizler"""
+        memory_data = self.conversation_memory.get(whatsapp_number)
+        if not memory_data:
+            return
+        if agent_name in STICKY_AGENTS:
+            memory_data["active_agent"] = agent_name
+            memory_data["active_agent_at"] = datetime.now()
+        else:
+            memory_data.pop("active_agent", None)
+            memory_data.pop("active_agent_at", None)
+        self.conversation_memory[whatsapp_number] = memory_data
+
+    def get_active_agent(self, whatsapp_number: str):
+        """Hafıza timeout'u (30 dk) içinde kalan son aktif agent veya None"""
+        memory_data = self.conversation_memory.get(whatsapp_number, {})
+        agent_name = memory_data.get("active_agent")
+        active_at = memory_data.get("active_agent_at")
+        if not agent_name or not active_at:
+            return None
+        if datetime.now() - active_at > timedelta(minutes=self.memory_settings['timeout_minutes']):
+            self.set_active_agent(whatsapp_number, None)
+            return None
+        return STICKY_AGENTS.get(agent_name)
+
+    def record_route(self, route: str):
+        """Yönlendirme kararını say"""
+        with self.routing_stats_lock:
+            self.routing_stats[route] = self.routing_stats.get(route, 0) + 1
+
+    def get_routing_stats(self) -> Dict[str, Any]:
+        """Pre-router karar sayaçları - kaç mesaj Intent Analyzer'ı atladı"""
+        with self.routing_stats_lock:
+            routes = dict(self.routing_stats)
+        total = sum(routes.values())
+        classifier = routes.get("agent:intent_analyzer", 0)
+        return {
+            "total": total,
+            "routes": routes,
+            "classifier_skipped": total - classifier,
+            "classifier_skip_rate": round((total - classifier) / total, 3) if total else 0.0
+        }
+
     def process_message(self, customer_message: str, whatsapp_number: str) -> str:
         """Ana mesaj işleme fonksiyonu - Conversation Memory enabled"""
 
-        # Cleanup expired conversations first
-        self.cleanup_expired_conversations()
-
-        # Global context'e WhatsApp numarasını kaydet
-        global current_whatsapp_context
-        current_whatsapp_context['whatsapp_number'] = whatsapp_number
+        # Bu kullanıcının konuşması zaman aşımına uğradıysa temizle (diğerleri sweeper'da)
+        self.expire_session_if_idle(whatsapp_number)
 
         print(f"[Swarm] Processing: {customer_message[:50]}... from {whatsapp_number}")
 
@@ -1871,6 +1765,23 @@ class SwarmB2BSystem:
         if is_quantity_input:
             print(f"[TASK 2.5] MIKTAR_GİRİŞİ intent potential: {customer_message[:100]}")
 
+        # Pre-router: yapısal mesajlar direkt handler'a, diğerleri doğru agent'tan başlar
+        route, handler = self.route_message(customer_message, whatsapp_number)
+        self.record_route(route)
+        print(f"[ROUTER] {route}")
+
+        if not route.startswith("agent:"):
+            try:
+                final_message = handler(whatsapp_number, customer_message.strip())
+            except Exception as e:
+                print(f"[ROUTER Error] {e}")
+                final_message = f"Sistem hatası: {str(e)}"
+            self.add_message_to_memory(whatsapp_number, "assistant", final_message)
+            # Ürün seçildikten sonraki tur (miktar / iptal) Order Manager'dan devam eder
+            self.set_active_agent(whatsapp_number, order_manager.name if route == "product_selection" else None)
+            print(f"[Swarm] Final response (pre-routed): {final_message[:100]}...")
+            return final_message
+
         # If we have conversation history, use it; otherwise start fresh
         if conversation_history:
             # Add current message to the history
@@ -1881,13 +1792,13 @@ class SwarmB2BSystem:
             messages_for_swarm = [{"role": "user", "content": f"Customer: {whatsapp_number}\nMessage: {customer_message}"}]
             print(f"[Memory] Fresh conversation started for {whatsapp_number}")
 
-        # Swarm'ı çalıştır - Intent Analyzer ile başla
+        # Swarm'ı çalıştır - pre-router'ın seçtiği agent ile başla (varsayılan Intent Analyzer)
         try:
             # Get extracted context if available
             extracted_ctx = self.extracted_context.get(whatsapp_number, {})
 
             response = self.client.run(
-                agent=intent_analyzer,
+                agent=handler,
                 messages=messages_for_swarm,
                 context_variables={
                     "whatsapp_number": whatsapp_number,
@@ -1917,6 +1828,11 @@ class SwarmB2BSystem:
             # Add assistant response to conversation memory
             self.add_message_to_memory(whatsapp_number, "assistant", final_message)
 
+            # Bir sonraki tur bu agent'tan devam etsin (Intent Analyzer / Customer Manager'da kalınmaz)
+            active_agent_name = response.agent.name if response.agent else None
+            self.set_active_agent(whatsapp_number, active_agent_name)
+            print(f"[Memory] Active agent for {whatsapp_number}: {active_agent_name}")
+
             print(f"[Swarm] Final response: {final_message[:100]}...")
             print(f"[Memory] Conversation updated for {whatsapp_number}")
 
@@ -1933,6 +1849,61 @@ class SwarmB2BSystem:
 
 app = Flask(__name__)
 system_instance = None
+dispatcher = None
+job_manager = None
+dispatcher_init_lock = threading.Lock()
+
+# Flask thread'inin lane sonucunu bekleme süresi (saniye)
+DISPATCH_TIMEOUT = float(os.getenv('DISPATCH_TIMEOUT', 120))
+
+# Graceful shutdown'da kuyruktaki mesajlar / callback'ler için bekleme süresi (saniye)
+DRAIN_TIMEOUT = float(os.getenv('DRAIN_TIMEOUT', 30))
+
+def initialize_system() -> 'SwarmB2BSystem':
+    """SwarmB2BSystem'i bir kez oluştur - sunucu başlarken (preload) veya ilk mesajda"""
+    global system_instance
+    with dispatcher_init_lock:
+        if system_instance is None:
+            print("[HTTP] Initializing Swarm Single-Product system with TASK 2.5...")
+            # Startup config kontrolü - dev server, gunicorn ve waitress hepsi buradan geçer
+            if not PRODUCT_LINK_SECRET:
+                print("[SECURE LINK WARNING] PRODUCT_LINK_SECRET not set - product links will be unprotected")
+            system_instance = SwarmB2BSystem()
+    return system_instance
+
+def get_dispatcher() -> MessageDispatcher:
+    """Lane dispatcher - thread başlattığı için process başına (fork sonrası) oluşturulur"""
+    global dispatcher
+    system = initialize_system()
+    with dispatcher_init_lock:
+        if dispatcher is None:
+            dispatcher = MessageDispatcher(system.process_message)
+            system.start_sweeper()
+            page_files.start_sweeper()
+    return dispatcher
+
+def get_job_manager() -> AsyncJobManager:
+    """Asenkron mod job yöneticisi - dispatcher lane'lerini kullanır"""
+    global job_manager
+    lane_dispatcher = get_dispatcher()
+    with dispatcher_init_lock:
+        if job_manager is None:
+            job_manager = AsyncJobManager(lane_dispatcher.submit)
+    return job_manager
+
+def start_workers():
+    """Trafik kabul etmeden önce lane ve callback worker'larını hazırla"""
+    get_job_manager()
+
+def drain_workers(timeout: float = None) -> bool:
+    """Graceful shutdown: yeni mesaj alma, kuyruktakileri işle, callback'leri teslim et"""
+    timeout = DRAIN_TIMEOUT if timeout is None else timeout
+    start = time.monotonic()
+    drained = dispatcher.drain(timeout) if dispatcher else True
+    if job_manager:
+        drained = job_manager.drain(max(0.0, timeout - (time.monotonic() - start))) and drained
+    # Write-behind kuyruğundaki konuşma durumunu yaz
+    return state_store.flush() and drained
 
 @app.route('/process-message', methods=['POST'])
 def process_whatsapp_message():
@@ -1952,14 +1923,31 @@ def process_whatsapp_message():
             return jsonify({"error": "message and whatsapp_number required"}), 400
         
         print(f"[HTTP] Processing: {message[:50]}... from {whatsapp_number}")
+
+        # Asenkron mod: hemen 202 + job_id, cevap bot'un SWARM_CALLBACK_URL'ine POST edilir
+        if data.get('async'):
+            try:
+                job = get_job_manager().submit(message, whatsapp_number)
+            except LaneFullError as e:
+                return jsonify({"success": False, "error": str(e)}), 503
+            return jsonify({
+                "success": True,
+                "job_id": job["job_id"],
+                "status": job["status"],
+                "status_url": f"/jobs/{job['job_id']}"
+            }), 202
         
-        # System instance oluştur (ilk çağrıda)
-        if system_instance is None:
-            print("[HTTP] Initializing Swarm Single-Product system with TASK 2.5...")
-            system_instance = SwarmB2BSystem()
-        
-        # Swarm sistemini çalıştır
-        result = system_instance.process_message(message, whatsapp_number)
+        # Kullanıcının lane'inde sırayla işle (aynı numara FIFO, farklı numaralar paralel)
+        try:
+            future = get_dispatcher().submit(message, whatsapp_number)
+        except LaneFullError as e:
+            return jsonify({"success": False, "error": str(e)}), 503
+
+        try:
+            result = future.result(timeout=DISPATCH_TIMEOUT)
+        except FutureTimeoutError:
+            # Mesaj lane'de işlenmeye devam eder - sadece HTTP cevabı beklenmez
+            return jsonify({"success": False, "error": "Processing timeout"}), 504
         
         return jsonify({
             "success": True,
@@ -1980,6 +1968,17 @@ def process_whatsapp_message():
             "error": str(e)
         }), 500
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness - sistem ve worker'lar hazır, DB havuzu açık ve drain başlamamışsa 200"""
+    checks = {
+        "system": system_instance is not None,
+        "dispatcher": dispatcher is not None and not dispatcher.draining,
+        "db_pool": db.pool is not None
+    }
+    ready = all(checks.values())
+    return jsonify({"ready": ready, "checks": checks, "pid": os.getpid()}), 200 if ready else 503
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -2017,6 +2016,141 @@ def memory_status():
             "error": str(e)
         }), 500
 
+@app.route('/db-status', methods=['GET'])
+def db_status():
+    """PostgreSQL bağlantı havuzu durumu ve bekleme süresi metrikleri"""
+    try:
+        return jsonify({
+            "success": True,
+            "db_status": db.get_connection_status()
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/parser-stats', methods=['GET'])
+def parser_stats():
+    """Kural tabanlı parser isabetleri - LLM'e düşmeden çözülen sorgular"""
+    try:
+        return jsonify({
+            "success": True,
+            "parser_stats": db.get_parser_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    """LLM parametre çıkarma cache'i - bellek/Postgres hit oranı"""
+    try:
+        return jsonify({
+            "success": True,
+            "extraction_cache": db.get_extraction_cache_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/routing-stats', methods=['GET'])
+def routing_stats():
+    """Pre-router karar sayaçları - Intent Analyzer'ı atlayan mesajlar"""
+    global system_instance
+
+    if system_instance is None:
+        return jsonify({"error": "System not initialized"}), 400
+
+    return jsonify({
+        "success": True,
+        "routing_stats": system_instance.get_routing_stats(),
+        "agent_payload_cache": client.get_payload_stats()
+    })
+
+@app.route('/dispatcher-stats', methods=['GET'])
+def dispatcher_stats():
+    """Lane kuyruk derinlikleri, reddedilen mesajlar ve lane gecikmeleri"""
+    if dispatcher is None:
+        return jsonify({"error": "Dispatcher not initialized"}), 400
+
+    return jsonify({
+        "success": True,
+        "dispatcher_stats": dispatcher.get_stats(),
+        "async_job_stats": job_manager.get_stats() if job_manager else None
+    })
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Asenkron mesaj job'unun durumu ve (bittiyse) cevabı - polling için"""
+    job = job_manager.get_job(job_id) if job_manager else None
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+
+    return jsonify({"success": True, "job": job})
+
+def _not_modified(etag: str) -> bool:
+    """If-None-Match bu ETag'i (weak veya strong) içeriyor mu"""
+    return request.if_none_match.contains_weak(etag.strip('"'))
+
+@app.route('/product-list/<session_id>', methods=['GET'])
+def product_list_page(session_id):
+    """Ürün listesi sayfası - yazılmış (sıkıştırılmış) varyant, yoksa şablondan stream edilir"""
+    record = product_lists.get(session_id)
+    if record is None:
+        return jsonify({"success": False, "error": "Product list not found or expired"}), 404
+
+    page_key = product_page_renderer.page_key(record["content_hash"])
+    variant = page_files.open_variant(page_key, request.headers.get('Accept-Encoding', ''))
+    encoding = variant[1] if variant else None
+
+    # Varyantlar farklı byte'lar - her encoding'in kendi ETag'i var
+    etag = product_page_renderer.page_etag(record["content_hash"])
+    if encoding:
+        etag = f'{etag[:-1]}-{encoding}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if _not_modified(etag):
+        return Response(status=304, headers=headers)
+
+    if variant is None:
+        # Dosya henüz yazılmadı veya retention sildi - render et, yeniden yazdır
+        page_files.count_rendered()
+        page_files.write_async(page_key, lambda: product_page_renderer.render(record["payload"]))
+        return Response(product_page_renderer.stream(record["payload"]), mimetype='text/html', headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(variant[0], mimetype='text/html', headers=headers)
+
+@app.route('/product-list/<session_id>/data', methods=['GET'])
+def product_list_data(session_id):
+    """Ürün listesi sonuç seti (JSON) - ETag içerik hash'idir, değişmediyse 304"""
+    record = product_lists.get(session_id)
+    if record is None:
+        return jsonify({"success": False, "error": "Product list not found or expired"}), 404
+
+    etag = f'"{record["content_hash"][:20]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _not_modified(etag):
+        return Response(status=304, headers=headers)
+    response = jsonify(record["payload"])
+    response.headers.update(headers)
+    return response
+
+@app.route('/product-list-stats', methods=['GET'])
+def product_list_stats():
+    """Ürün listesi sayfaları - dedupe oranı, kart cache'i, sayfa dosyaları ve retention"""
+    return jsonify({
+        "success": True,
+        "product_lists": product_lists.get_stats(),
+        "product_page_renderer": product_page_renderer.get_stats(),
+        "page_files": page_files.get_stats()
+    })
+
 @app.route('/clear-memory', methods=['POST'])
 def clear_memory():
     """Clear conversation memory for specific user or all users"""
@@ -2103,11 +2237,23 @@ if __name__ == "__main__":
         print("TASK 2.5: Enhanced MIKTAR_GİRİŞİ intent implementation")
         print("Port: 3007 (Swarm)")
         print("Endpoints:")
-        print("  POST /process-message - WhatsApp mesaj işleme")
+        print("  POST /process-message - WhatsApp mesaj işleme (async: true -> 202 + callback)")
+        print("  GET  /jobs/<job_id> - Async job status")
         print("  GET  /health - System health check")
+        print("  GET  /ready - Readiness (system + workers + DB pool)")
+        print("  GET  /db-status - DB connection pool metrics")
+        print("  GET  /parser-stats - Rule parser hits / LLM fallbacks")
+        print("  GET  /cache-stats - LLM extraction cache hit rate")
+        print("  GET  /routing-stats - Pre-router decisions (classifier skipped)")
+        print("  GET  /dispatcher-stats - Per-user lane queues / rejections / latency")
         print("="*60)
         
-        # Flask server başlat
+        # Sistemi ve worker'ları trafik gelmeden hazırla (reloader'ın izleyici process'inde değil)
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            initialize_system()
+            start_workers()
+
+        # Flask dev server başlat - production için: gunicorn -c gunicorn.conf.py (Windows: python src/core/wsgi.py)
         app.run(
             host="0.0.0.0",
             port=3007,  # CrewAI'dan farklı port
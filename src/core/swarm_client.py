@@ -0,0 +1,251 @@
+"""
+B2B Swarm Client - Swarm.run üzerine terminal tool ve paralel tool desteği
+- Turdaki tüm tool'lar sonucunu final_result() ile işaretlerse run orada biter:
+  agent'ın sonucu tekrar yazması için ikinci bir LLM completion yapılmaz. Terminal
+  olmayan bir tool da çağrıldıysa (ör. arama + stok) tur normal şekilde LLM'e döner
+- Aynı assistant mesajındaki tool çağrıları sınırlı bir thread havuzunda
+  eşzamanlı çalışır; sonuç sırası ve context_variables davranışı aynıdır
+- Agent'lar statik olduğundan tool JSON şemaları ve system mesajı agent başına
+  bir kez üretilir; her completion'da function_to_json introspection'ı yapılmaz
+"""
+
+import os
+import copy
+import json
+import time
+import threading
+import contextvars
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from swarm import Swarm
+from swarm.types import Response, Result
+from swarm.util import debug_print, function_to_json
+
+# Tool sonucunda bu context variable varsa değeri müşteriye giden son cevaptır
+FINAL_RESPONSE_KEY = "final_response"
+
+# Swarm'ın context_variables parametresi için kullandığı isim
+CTX_VARS_NAME = "context_variables"
+
+# Tüm istekler için ortak, sınırlı tool havuzu (Postgres / HTTP bekleyen tool'lar)
+TOOL_WORKERS = int(os.getenv('SWARM_TOOL_WORKERS', 4))
+_tool_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="swarm-tool")
+
+
+def final_result(text: str) -> Result:
+    """Tool çıktısını son cevap olarak işaretle (terminal tool)"""
+    return Result(value=text, context_variables={FINAL_RESPONSE_KEY: text})
+
+
+def build_agent_tools(agent) -> list:
+    """Agent fonksiyonlarından tool şemaları (context_variables model'den gizlenir - upstream ile aynı)"""
+    tools = [function_to_json(f) for f in agent.functions]
+    for tool in tools:
+        params = tool["function"]["parameters"]
+        params["properties"].pop(CTX_VARS_NAME, None)
+        if CTX_VARS_NAME in params["required"]:
+            params["required"].remove(CTX_VARS_NAME)
+    return tools
+
+
+class B2BSwarm(Swarm):
+    """Swarm client - terminal tool sonuçlarında run'ı erken bitirir, tool çağrılarını paralel çalıştırır"""
+
+    def __init__(self, client=None):
+        super().__init__(client)
+        # (agent.name, fonksiyon kimlikleri) -> {"tools": [...], "system_message": {...} | None}
+        self._agent_payloads = {}
+        self._agent_payloads_lock = threading.Lock()
+        self._payload_stats = {"hits": 0, "builds": 0}
+
+    def _agent_payload(self, agent) -> dict:
+        """Agent'ın tool şemaları ve (statikse) system mesajı - ilk kullanımda üretilip saklanır"""
+        # Fonksiyon listesi değişirse (agent.functions.append) anahtar da değişir
+        key = (agent.name, tuple(id(f) for f in agent.functions))
+        with self._agent_payloads_lock:
+            payload = self._agent_payloads.get(key)
+            if payload is not None:
+                self._payload_stats["hits"] += 1
+                return payload
+
+        payload = {
+            "tools": build_agent_tools(agent),
+            # Callable instructions context_variables'a bağlı - her turda hesaplanır
+            "system_message": None if callable(agent.instructions)
+            else {"role": "system", "content": agent.instructions},
+        }
+        with self._agent_payloads_lock:
+            self._agent_payloads[key] = payload
+            self._payload_stats["builds"] += 1
+        return payload
+
+    def warm_agent_payloads(self, agents: list):
+        """Startup'ta tüm agent'ların şemalarını önceden üret"""
+        start = time.perf_counter()
+        for agent in agents:
+            self._agent_payload(agent)
+        print(f"[SWARM] Tool schemas compiled for {len(agents)} agents in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    def get_payload_stats(self) -> dict:
+        with self._agent_payloads_lock:
+            return dict(self._payload_stats, cached_agents=len(self._agent_payloads))
+
+    def get_chat_completion(self, agent, history, context_variables, model_override, stream, debug):
+        """Upstream get_chat_completion - şemalar ve system mesajı cache'ten"""
+        payload = self._agent_payload(agent)
+        system_message = payload["system_message"]
+        if system_message is None:
+            system_message = {"role": "system", "content": agent.instructions(defaultdict(str, context_variables))}
+        messages = [system_message] + history
+        debug_print(debug, "Getting chat completion for...:", messages)
+
+        tools = payload["tools"]
+        create_params = {
+            "model": model_override or agent.model,
+            "messages": messages,
+            "tools": tools or None,
+            "tool_choice": agent.tool_choice,
+            "stream": stream,
+        }
+        if tools:
+            create_params["parallel_tool_calls"] = agent.parallel_tool_calls
+
+        return self.client.chat.completions.create(**create_params)
+
+    def run(self, agent, messages, context_variables={}, model_override=None, stream=False,
+            debug=False, max_turns=float("inf"), execute_tools=True) -> Response:
+        if stream:
+            return super().run(agent, messages, context_variables, model_override, stream,
+                               debug, max_turns, execute_tools)
+
+        active_agent = agent
+        context_variables = copy.deepcopy(context_variables)
+        history = copy.deepcopy(messages)
+        init_len = len(messages)
+
+        while len(history) - init_len < max_turns and active_agent:
+            completion = self.get_chat_completion(
+                agent=active_agent,
+                history=history,
+                context_variables=context_variables,
+                model_override=model_override,
+                stream=stream,
+                debug=debug,
+            )
+            message = completion.choices[0].message
+            debug_print(debug, "Received completion:", message)
+            message.sender = active_agent.name
+            history.append(json.loads(message.model_dump_json()))
+
+            if not message.tool_calls or not execute_tools:
+                debug_print(debug, "Ending turn.")
+                break
+
+            partial_response = self.handle_tool_calls(
+                message.tool_calls, active_agent.functions, context_variables, debug
+            )
+            history.extend(partial_response.messages)
+
+            # Turdaki tüm tool'lar terminal: çıktıyı assistant cevabı olarak ekle ve LLM'e geri dönmeden bitir
+            final_response = partial_response.context_variables.pop(FINAL_RESPONSE_KEY, None)
+            context_variables.update(partial_response.context_variables)
+            if partial_response.agent:
+                active_agent = partial_response.agent
+
+            if final_response is not None:
+                debug_print(debug, "Terminal tool result - ending turn.")
+                history.append({
+                    "role": "assistant",
+                    "content": final_response,
+                    "sender": active_agent.name,
+                    "tool_calls": None
+                })
+                break
+
+        return Response(
+            messages=history[init_len:],
+            agent=active_agent,
+            context_variables=context_variables,
+        )
+
+    def _call_tool(self, name: str, func, args: dict):
+        """Tek tool çağrısı - süreyi ölç ve logla"""
+        start = time.perf_counter()
+        try:
+            return func(**args)
+        finally:
+            print(f"[TOOL] {name} {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    def handle_tool_calls(self, tool_calls, functions, context_variables, debug) -> Response:
+        """
+        Bir turdaki tool çağrılarını paralel çalıştır.
+        Sıralı Swarm ile aynı semantik: her tool turun başındaki context_variables'ı görür,
+        sonuçlar ve context güncellemeleri çağrı sırasıyla uygulanır, son agent kazanır.
+        """
+        function_map = {f.__name__: f for f in functions}
+        partial_response = Response(messages=[], agent=None, context_variables={})
+        turn_start = time.perf_counter()
+
+        # 1. Çağrıları hazırla (bilinmeyen tool'lar hata mesajı olarak yerinde kalır)
+        calls = []
+        for tool_call in tool_calls:
+            name = tool_call.function.name
+            if name not in function_map:
+                debug_print(debug, f"Tool {name} not found in function map.")
+                calls.append((tool_call, name, None, None))
+                continue
+            args = json.loads(tool_call.function.arguments)
+            debug_print(debug, f"Processing tool call: {name} with arguments {args}")
+            func = function_map[name]
+            if CTX_VARS_NAME in func.__code__.co_varnames:
+                args[CTX_VARS_NAME] = context_variables
+            calls.append((tool_call, name, func, args))
+
+        # 2. Çalıştır - tek çağrıda havuz atlanır; contextvars worker thread'e kopyalanır
+        runnable = [call for call in calls if call[2] is not None]
+        if len(runnable) > 1:
+            futures = {
+                id(call[0]): _tool_executor.submit(contextvars.copy_context().run, self._call_tool, call[1], call[2], call[3])
+                for call in runnable
+            }
+            get_result = lambda call: futures[id(call[0])].result()
+        else:
+            get_result = lambda call: self._call_tool(call[1], call[2], call[3])
+
+        # 3. Sonuçları orijinal sırayla birleştir
+        final_responses = []
+        for tool_call, name, func, args in calls:
+            if func is None:
+                partial_response.messages.append({
+                    "role": "tool",
+                    "tool_call_id": tool_call.id,
+                    "tool_name": name,
+                    "content": f"Error: Tool {name} not found.",
+                })
+                continue
+
+            result: Result = self.handle_function_result(get_result((tool_call, name, func, args)), debug)
+            partial_response.messages.append({
+                "role": "tool",
+                "tool_call_id": tool_call.id,
+                "tool_name": name,
+                "content": result.value,
+            })
+            result_context = dict(result.context_variables)
+            final_response = result_context.pop(FINAL_RESPONSE_KEY, None)
+            if final_response is not None:
+                final_responses.append(final_response)
+            partial_response.context_variables.update(result_context)
+            if result.agent:
+                partial_response.agent = result.agent
+
+        if len(runnable) > 1:
+            print(f"[TOOL] {len(runnable)} parallel calls in {(time.perf_counter() - turn_start) * 1000:.1f}ms")
+
+        # Tur sadece tüm çağrılar terminal ise biter - aksi halde diğer tool çıktıları
+        # (terminal sonuçlarla birlikte history'de) müşteriye LLM üzerinden ulaşır
+        if final_responses and len(final_responses) == len(calls):
+            partial_response.context_variables[FINAL_RESPONSE_KEY] = "\n\n".join(final_responses)
+
+        return partial_response
@@ -8,6 +8,11 @@ const config = require('./config');
 const app = express();
 app.use(express.json());
 
+// Async mod: Swarm 202 + job_id döner, cevap /swarm-callback'e POST edilir
+const SWARM_URL = `http://localhost:${process.env.SWARM_SERVER_PORT || 3007}`;
+const SWARM_ASYNC_MODE = process.env.SWARM_ASYNC_MODE === 'true';
+const SWARM_CALLBACK_TOKEN = process.env.SWARM_CALLBACK_TOKEN || '';
+
 // WhatsApp Client oluştur
 const client = new Client({
     authStrategy: new LocalAuth({
@@ -40,6 +45,21 @@ client.on('ready', () => {
     console.log(`OpenAI Swarm sistem aktif: http://localhost:${process.env.SWARM_SERVER_PORT || 3007}`);
 });
 
+// Swarm cevabını WhatsApp'a gönder (ürün listesi linkini biçimlendir)
+async function deliverSwarmResponse(chatId, swarmResponse) {
+    const linkMatch = swarmResponse.match(/URUN LISTESI: (https?:\/\/[^\s]+)/);
+    if (linkMatch) {
+        // Format with clickable link
+        const formattedResponse = swarmResponse.replace(
+            linkMatch[0],
+            `📋 *ÜRÜN LİSTESİ:*\n${linkMatch[1]}`
+        );
+        await client.sendMessage(chatId, formattedResponse);
+    } else {
+        await client.sendMessage(chatId, swarmResponse);
+    }
+}
+
 // Gelen mesajları dinle ve Swarm sistemine gönder
 client.on('message', async (message) => {
     console.log(`[DEBUG] Mesaj alındı - From: ${message.from}, Body: ${message.body}`);
@@ -61,27 +81,20 @@ client.on('message', async (message) => {
         
         try {
             // Call OpenAI Swarm 5-Agent system
-            const response = await axios.post(`http://localhost:${process.env.SWARM_SERVER_PORT || 3007}/process-message`, {
+            const response = await axios.post(`${SWARM_URL}/process-message`, {
                 message: body,
-                whatsapp_number: userId
+                whatsapp_number: userId,
+                async: SWARM_ASYNC_MODE
             });
             
-            if (response.data.success) {
+            if (response.status === 202) {
+                // Cevap /swarm-callback ile gelecek
+                console.log(`[Swarm Async] ${userId}: job ${response.data.job_id} queued`);
+            } else if (response.data.success) {
                 console.log('[DEBUG] Full response data:', JSON.stringify(response.data, null, 2));
                 const swarmResponse = response.data.response || response.data.message || "Yanıt alınamadı";
                 
-                // Check for product list link
-                const linkMatch = swarmResponse.match(/URUN LISTESI: (https?:\/\/[^\s]+)/);
-                if (linkMatch) {
-                    // Format with clickable link
-                    const formattedResponse = swarmResponse.replace(
-                        linkMatch[0],
-                        `📋 *ÜRÜN LİSTESİ:*\n${linkMatch[1]}`
-                    );
-                    await client.sendMessage(message.from, formattedResponse);
-                } else {
-                    await client.sendMessage(message.from, swarmResponse);
-                }
+                await deliverSwarmResponse(message.from, swarmResponse);
                 
                 console.log(`[Swarm Yanıt] ${userId}: ${swarmResponse.substring(0, 100)}...`);
             } else {
@@ -153,10 +166,46 @@ app.post('/send-message', async (req, res) => {
     }
 });
 
+// Async mod: Swarm job sonucu (tekrar denemeli callback - aynı job iki kez gelebilir)
+const deliveredJobs = new Set();
+app.post('/swarm-callback', async (req, res) => {
+    if (SWARM_CALLBACK_TOKEN && req.get('X-Callback-Token') !== SWARM_CALLBACK_TOKEN) {
+        return res.status(401).json({ error: 'invalid callback token' });
+    }
+
+    const { job_id, whatsapp_number, success, response, error } = req.body || {};
+    if (!job_id || !whatsapp_number) {
+        return res.status(400).json({ error: 'job_id ve whatsapp_number gerekli' });
+    }
+    if (deliveredJobs.has(job_id)) {
+        return res.json({ success: true, duplicate: true });
+    }
+
+    try {
+        if (success) {
+            await deliverSwarmResponse(whatsapp_number, response || "Yanıt alınamadı");
+            console.log(`[Swarm Async Yanıt] ${whatsapp_number}: ${(response || '').substring(0, 100)}...`);
+        } else {
+            console.error(`[Swarm Async Error] job ${job_id}:`, error);
+            await client.sendMessage(whatsapp_number, '❌ Sistem hatası. Lütfen tekrar deneyin.');
+        }
+        deliveredJobs.add(job_id);
+        if (deliveredJobs.size > 10000) {
+            deliveredJobs.delete(deliveredJobs.values().next().value);
+        }
+        res.json({ success: true });
+    } catch (err) {
+        // 500 -> Swarm backoff ile tekrar dener
+        console.error('[Hata] Async cevap gönderilemedi:', err.message);
+        res.status(500).json({ error: err.message });
+    }
+});
+
 // Reply server'ı başlat
 const REPLY_PORT = 3001;
 app.listen(REPLY_PORT, () => {
     console.log(`WhatsApp Reply Server: http://localhost:${REPLY_PORT}/send-message`);
+    console.log(`Swarm async callback: http://localhost:${REPLY_PORT}/swarm-callback (async mode: ${SWARM_ASYNC_MODE})`);
 });
 
 // Client'ı başlat
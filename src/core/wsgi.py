@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Production WSGI entry point - Swarm B2B HTTP server
+Import sırasında SwarmB2BSystem, DB havuzu ve agent şemaları hazırlanır; böylece
+ilk müşteri başlatma maliyetini ödemez.
+
+Linux (çok process, preload): gunicorn -c gunicorn.conf.py
+Windows (tek process, waitress): python src/core/wsgi.py
+"""
+
+import os
+import sys
+
+from swarm_b2b_system import app, db, initialize_system, start_workers, drain_workers
+
+# Preload: gunicorn master'da bir kez (fork ile worker'lara paylaşılır)
+initialize_system()
+
+
+def main():
+    """waitress ile tek process, çok thread - gunicorn olmayan ortamlar (Windows) için"""
+    from waitress import serve
+
+    host = os.getenv('WEB_HOST', '0.0.0.0')
+    port = int(os.getenv('WEB_PORT', 3007))
+    threads = int(os.getenv('WEB_THREADS', 16))
+
+    start_workers()
+    print(f"[SERVER] waitress on {host}:{port} ({threads} threads, pid {os.getpid()})")
+    try:
+        serve(app, host=host, port=port, threads=threads)
+    finally:
+        drain_workers()
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
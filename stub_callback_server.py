@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Stub Callback Server
+Stands in for the WhatsApp bot's /swarm-callback endpoint when testing the
+async /process-message mode locally. Optionally fails the first N deliveries
+per job so the Swarm server's backoff / retry path can be observed.
+
+Usage:
+    python stub_callback_server.py --port 3011 --fail-first 2
+    SWARM_CALLBACK_URL=http://localhost:3011/swarm-callback python src/core/swarm_b2b_system.py
+    curl -X POST localhost:3007/process-message -H "Content-Type: application/json" \
+         -d '{"message": "100x200 silindir", "whatsapp_number": "905000000000@c.us", "async": true}'
+    curl localhost:3011/callbacks
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+from dotenv import load_dotenv
+from flask import Flask, request, jsonify
+
+# Load environment variables
+load_dotenv()
+
+app = Flask(__name__)
+received = []  # Başarıyla kabul edilen callback'ler
+attempts = {}  # job_id -> gelen deneme sayısı
+lock = threading.Lock()
+settings = {"fail_first": 0, "token": ""}
+
+
+@app.route('/swarm-callback', methods=['POST'])
+def swarm_callback():
+    """Bot'un /swarm-callback endpoint'i ile aynı sözleşme"""
+    if settings["token"] and request.headers.get('X-Callback-Token') != settings["token"]:
+        return jsonify({"error": "invalid callback token"}), 401
+
+    data = request.json or {}
+    job_id = data.get('job_id')
+    if not job_id or not data.get('whatsapp_number'):
+        return jsonify({"error": "job_id ve whatsapp_number gerekli"}), 400
+
+    with lock:
+        attempts[job_id] = attempts.get(job_id, 0) + 1
+        attempt = attempts[job_id]
+        if attempt <= settings["fail_first"]:
+            print(f"[STUB] Job {job_id} attempt {attempt} -> 503 (simulated failure)")
+            return jsonify({"error": "simulated failure"}), 503
+        received.append(dict(data, attempt=attempt, received_at=time.time()))
+
+    print(f"[STUB] Job {job_id} attempt {attempt} -> OK: {str(data.get('response'))[:80]}")
+    return jsonify({"success": True})
+
+
+@app.route('/callbacks', methods=['GET'])
+def list_callbacks():
+    """Alınan callback'ler ve job başına deneme sayıları"""
+    with lock:
+        return jsonify({"received": list(received), "attempts": dict(attempts)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub callback server for async Swarm mode")
+    parser.add_argument('--port', type=int, default=3011, help='Listen port')
+    parser.add_argument('--fail-first', type=int, default=0, help='Return 503 for the first N attempts per job')
+    args = parser.parse_args()
+
+    settings["fail_first"] = args.fail_first
+    settings["token"] = os.getenv('SWARM_CALLBACK_TOKEN', '')
+
+    print(f"Stub callback server: http://localhost:{args.port}/swarm-callback (fail first {args.fail_first})")
+    app.run(host="127.0.0.1", port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())